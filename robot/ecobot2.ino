@@ -1,5 +1,6 @@
 #include <WiFi.h>
 #include <WebServer.h>
+#include <WiFiUdp.h>
 #include <ArduinoJson.h>
 
 // Configuración WiFi
@@ -26,8 +27,29 @@ const char* password = "DARTHNEO_PASSWORD";
 
 WebServer server(80);
 
+// Canal de control UDP (ver UdpTransport en server/command_sender.py)
+// Paquete de 9 bytes: 'E' 'B' | versión | tipo | secuencia (uint32 LE) | comando
+#define UDP_PORT        4210
+#define UDP_VERSION     1
+#define UDP_PACKET_SIZE 9
+#define UDP_TYPE_COMMAND   0
+#define UDP_TYPE_HEARTBEAT 1
+#define UDP_TYPE_ACK       2
+#define UDP_WATCHDOG_MS 600  // sin paquetes UDP durante este tiempo = detener
+
+WiFiUDP udp;
+uint32_t lastUdpSeq = 0;
+unsigned long lastUdpPacket = 0;
+bool udpActive = false;  // el watchdog sólo se arma si el servidor usa UDP
+String currentCommand = "STOP";
+
+const char* UDP_COMMANDS[] = {"STOP", "FORWARD", "LEFT", "RIGHT", "COLLECT"};
+const uint8_t UDP_COMMAND_COUNT = 5;
+
 // Prototipos
 void handleCommand();
+void handleUdp();
+void checkUdpWatchdog();
 void executeMovement(String command);
 void stopMotors();
 void moveForward();
@@ -68,10 +90,58 @@ void setup() {
   // Servidor web
   server.on("/command", HTTP_POST, handleCommand);
   server.begin();
+
+  udp.begin(UDP_PORT);
+  Serial.print("Control UDP en puerto ");
+  Serial.println(UDP_PORT);
 }
 
 void loop() {
   server.handleClient();
+  handleUdp();
+  checkUdpWatchdog();
+}
+
+void handleUdp() {
+  int size = udp.parsePacket();
+  while (size > 0) {
+    uint8_t packet[UDP_PACKET_SIZE];
+    int len = udp.read(packet, UDP_PACKET_SIZE);
+    if (len == UDP_PACKET_SIZE && packet[0] == 'E' && packet[1] == 'B' && packet[2] == UDP_VERSION) {
+      uint8_t type = packet[3];
+      uint32_t seq = (uint32_t)packet[4] | ((uint32_t)packet[5] << 8) |
+                     ((uint32_t)packet[6] << 16) | ((uint32_t)packet[7] << 24);
+      uint8_t code = packet[8];
+
+      // Responder siempre con ack para que el servidor mida el RTT
+      packet[3] = UDP_TYPE_ACK;
+      udp.beginPacket(udp.remoteIP(), udp.remotePort());
+      udp.write(packet, UDP_PACKET_SIZE);
+      udp.endPacket();
+
+      // Descartar paquetes viejos o repetidos (resta con signo tolera el desborde)
+      bool isNew = !udpActive || (int32_t)(seq - lastUdpSeq) > 0;
+      if (isNew && code < UDP_COMMAND_COUNT) {
+        lastUdpSeq = seq;
+        lastUdpPacket = millis();
+        udpActive = true;
+        String command = UDP_COMMANDS[code];
+        // Un heartbeat sólo refresca el watchdog, salvo que se haya perdido el comando
+        if (type == UDP_TYPE_COMMAND || command != currentCommand) {
+          executeMovement(command);
+        }
+      }
+    }
+    size = udp.parsePacket();
+  }
+}
+
+void checkUdpWatchdog() {
+  if (udpActive && millis() - lastUdpPacket > UDP_WATCHDOG_MS) {
+    Serial.println("Watchdog UDP - Deteniendo robot");
+    udpActive = false;
+    executeMovement("STOP");
+  }
 }
 
 void handleCommand() {
@@ -92,6 +162,7 @@ void handleCommand() {
 }
 
 void executeMovement(String command) {
+  currentCommand = command;
   if (command == "FORWARD") {
     moveForward();
     activateCollector(false);
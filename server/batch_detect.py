@@ -0,0 +1,284 @@
+import argparse
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from recording import REC_DROPPED, REC_FRAME, detections_to_json, read_recording
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mkv", ".mov", ".mjpeg", ".mjpg", ".webm")
+
+# Mismo preprocesamiento que WasteDetectionSystem.detect_waste (serverIA2)
+FRAME_WIDTH = 640
+FRAME_HEIGHT = 480
+CONFIDENCE_THRESHOLD = 0.3
+
+
+def find_sources(paths):
+    """Expande las rutas: videos, grabaciones .ecorec y carpetas de imágenes (cada carpeta es una fuente)"""
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            entries = sorted(os.listdir(path))
+            if any(e.lower().endswith(IMAGE_EXTENSIONS) for e in entries):
+                sources.append(path)
+            sources.extend(find_sources([os.path.join(path, e) for e in entries
+                                         if os.path.isdir(os.path.join(path, e))
+                                         or e.lower().endswith(VIDEO_EXTENSIONS + (".ecorec",))]))
+        elif os.path.isfile(path):
+            sources.append(path)
+        else:
+            print(f"No existe: {path}")
+    return sources
+
+
+def iter_frames(source, start=0, stride=1):
+    """
+    Generador de (índice, timestamp, frame BGR) desde `start`, tomando uno de cada `stride`.
+    El timestamp es el de grabación (.ecorec), la posición en el video, o None en imágenes.
+    """
+    if os.path.isdir(source):
+        files = sorted(e for e in os.listdir(source) if e.lower().endswith(IMAGE_EXTENSIONS))
+        for index in range(start, len(files), stride):
+            frame = cv2.imread(os.path.join(source, files[index]))
+            if frame is not None:
+                yield index, None, frame
+    elif source.endswith(".ecorec"):
+        index = -1
+        for rec_type, timestamp, data in read_recording(source):
+            if rec_type == REC_DROPPED:
+                index += data  # frames descartados al grabar: los índices siguen a los eventos
+                continue
+            if rec_type != REC_FRAME:
+                continue
+            index += 1
+            if index < start or (index - start) % stride:
+                continue
+            frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if frame is not None:
+                yield index, timestamp, frame
+    else:
+        cap = cv2.VideoCapture(source)
+        try:
+            fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+            if start:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+            index = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+            while index < start:  # contenedores sin búsqueda por frame
+                if not cap.grab():
+                    return
+                index += 1
+            while True:
+                if (index - start) % stride:
+                    # grab() sin retrieve(): se evita la conversión de color de los frames salteados
+                    if not cap.grab():
+                        return
+                else:
+                    ret, frame = cap.read()
+                    if not ret:
+                        return
+                    yield index, index / fps, frame
+                index += 1
+        finally:
+            cap.release()
+
+
+def resized(frames, width=FRAME_WIDTH, height=FRAME_HEIGHT):
+    for index, timestamp, frame in frames:
+        if frame.shape[1] != width or frame.shape[0] != height:
+            frame = cv2.resize(frame, (width, height))
+        yield index, timestamp, frame
+
+
+def batched(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def prefetch(items, depth=4):
+    """
+    Consume `items` en un hilo propio, hasta `depth` elementos por delante: la decodificación
+    (que libera el GIL en cv2) se superpone con la inferencia del lote anterior.
+    """
+    q = queue.Queue(maxsize=depth)
+    done = object()
+    errors = []
+
+    def producer():
+        try:
+            for item in items:
+                q.put(item)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            q.put(done)
+
+    threading.Thread(target=producer, name="prefetch", daemon=True).start()
+    while True:
+        item = q.get()
+        if item is done:
+            break
+        yield item
+    if errors:
+        raise errors[0]
+
+
+class Checkpoint:
+    """
+    Avance de una fuente: frames ya escritos y largo del JSONL en ese punto. Al reanudar se
+    trunca el JSONL a ese largo (descarta un lote escrito a medias) y se sigue desde el frame.
+    Se reemplaza de forma atómica (archivo temporal + os.replace).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.next_frame = 0
+        self.offset = 0
+        self.finished = False
+        if os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            self.next_frame = state['next_frame']
+            self.offset = state['offset']
+            self.finished = state.get('finished', False)
+
+    def save(self, next_frame, offset, finished=False):
+        self.next_frame, self.offset, self.finished = next_frame, offset, finished
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({'next_frame': next_frame, 'offset': offset, 'finished': finished}, f)
+        os.replace(tmp, self.path)
+
+
+def output_name(source):
+    """Nombre de salida estable por fuente: nombre base + hash corto de la ruta absoluta"""
+    base = os.path.basename(os.path.normpath(source))
+    digest = hashlib.sha1(os.path.abspath(source).encode()).hexdigest()[:8]
+    return f"{base}-{digest}"
+
+
+def process_source(backend, source, output_dir, batch_size=8, stride=1, only_hits=False,
+                   confidence_threshold=CONFIDENCE_THRESHOLD):
+    """
+    Detecta sobre todos los frames de `source` y agrega una línea JSON por frame a
+    <output_dir>/<nombre>.jsonl, guardando el checkpoint después de cada lote.
+    Devuelve la cantidad de frames procesados en esta corrida.
+    """
+    name = output_name(source)
+    jsonl_path = os.path.join(output_dir, name + ".jsonl")
+    checkpoint = Checkpoint(os.path.join(output_dir, name + ".ckpt"))
+    if checkpoint.finished:
+        print(f"{source}: ya procesado")
+        return 0
+
+    frames = prefetch(batched(resized(iter_frames(source, checkpoint.next_frame, stride)), batch_size))
+    processed = 0
+    with open(jsonl_path, "ab") as out:
+        out.truncate(checkpoint.offset)
+        out.seek(checkpoint.offset)
+        for batch in frames:
+            results = backend.detect_batch([frame for _, _, frame in batch], confidence_threshold)
+            lines = []
+            for (index, timestamp, _), detections in zip(batch, results):
+                if only_hits and not len(detections):
+                    continue
+                lines.append(json.dumps({
+                    'source': source,
+                    'frame': index,
+                    'timestamp': timestamp,
+                    'detections': detections_to_json(detections, backend.names),
+                }, separators=(",", ":")))
+            if lines:
+                out.write(("\n".join(lines) + "\n").encode())
+            out.flush()
+            processed += len(batch)
+            checkpoint.save(batch[-1][0] + stride, out.tell())
+        checkpoint.save(checkpoint.next_frame, out.tell(), finished=True)
+    return processed
+
+
+_backend = None
+
+
+def _init_job(weights, runtime, precision, threads, batch_size):
+    global _backend
+    # Repartir los núcleos entre procesos en lugar de que cada uno use todos
+    os.environ.setdefault("OMP_NUM_THREADS", str(threads))
+    from inference_backend import load_backend
+    # Con --batch > 1 el modelo exportado necesita lote dinámico; con lote fijo de 1
+    # detect_batch recorre los frames de a uno y --batch no acelera nada
+    _backend = load_backend(weights, runtime=runtime, precision=precision, dynamic_batch=batch_size > 1)
+    if batch_size > 1 and not _backend.batched:
+        print(f"Aviso: {_backend} no admite lotes; --batch {batch_size} se infiere de a un frame")
+
+
+def _run_job(args):
+    source, output_dir, batch_size, stride, only_hits = args
+    start = time.perf_counter()
+    frames = process_source(_backend, source, output_dir, batch_size, stride, only_hits)
+    return source, frames, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Detección offline sobre videos, grabaciones .ecorec o carpetas de imágenes")
+    parser.add_argument("inputs", nargs="+", help="archivos o carpetas (se recorren recursivamente)")
+    parser.add_argument("--output", default="detecciones", help="carpeta de salida (JSONL + checkpoints)")
+    parser.add_argument("--batch", type=int, default=8, help="frames por lote de inferencia")
+    parser.add_argument("--stride", type=int, default=1, help="procesar uno de cada N frames")
+    parser.add_argument("--jobs", type=int, default=1, help="procesos en paralelo (uno por fuente a la vez)")
+    parser.add_argument("--only-hits", action="store_true", help="escribir sólo frames con detecciones")
+    parser.add_argument("--weights", default="last.pt")
+    parser.add_argument("--runtime", default="auto")
+    parser.add_argument("--precision", default="fp32", choices=("fp32", "fp16", "int8"))
+    args = parser.parse_args()
+
+    sources = find_sources(args.inputs)
+    if not sources:
+        print("No hay fuentes para procesar")
+        return
+    os.makedirs(args.output, exist_ok=True)
+    jobs = max(1, min(args.jobs, len(sources)))
+    threads = max(1, (os.cpu_count() or 1) // jobs)
+    tasks = [(source, args.output, args.batch, args.stride, args.only_hits) for source in sources]
+
+    start = time.perf_counter()
+    total = 0
+    if jobs == 1:
+        _init_job(args.weights, args.runtime, args.precision, threads, args.batch)
+        results = map(_run_job, tasks)
+        pool = None
+    else:
+        pool = mp.get_context("spawn").Pool(jobs, initializer=_init_job,
+                                            initargs=(args.weights, args.runtime, args.precision, threads,
+                                                      args.batch))
+        results = pool.imap_unordered(_run_job, tasks)
+    try:
+        for source, frames, elapsed in results:
+            total += frames
+            fps = frames / elapsed if elapsed > 0 else 0.0
+            print(f"{source}: {frames} frames en {elapsed:.1f} s ({fps:.1f} FPS)")
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    elapsed = time.perf_counter() - start
+    print(f"Total: {total} frames de {len(sources)} fuentes en {elapsed:.1f} s "
+          f"({total / elapsed if elapsed > 0 else 0.0:.1f} FPS)")
+
+
+if __name__ == "__main__":
+    main()
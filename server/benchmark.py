@@ -0,0 +1,313 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from esp32_sim import Esp32Simulator
+from recording import FrameRecorder, open_replay
+
+try:
+    import resource  # sólo Unix
+except ImportError:
+    resource = None
+
+VARIANTS = ("server", "serverIA", "serverIA2")
+STAGES = ("decode", "inference", "postprocess", "command")
+SERVER_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class StageLatencies:
+    """Muestras de latencia por etapa y sus percentiles"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {stage: [] for stage in STAGES}
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            self.samples[stage].append(seconds)
+
+    def wrap(self, stage, fn):
+        """Devuelve `fn` envuelta para medir cada llamada en la etapa `stage`"""
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.observe(stage, time.perf_counter() - start)
+        return timed
+
+    def summary(self):
+        result = {}
+        with self._lock:
+            for stage, samples in self.samples.items():
+                if not samples:
+                    result[stage] = {'count': 0}
+                    continue
+                ms = np.array(samples) * 1000
+                p50, p95, p99 = np.percentile(ms, (50, 95, 99))
+                result[stage] = {
+                    'count': len(samples),
+                    'mean_ms': round(float(ms.mean()), 3),
+                    'p50_ms': round(float(p50), 3),
+                    'p95_ms': round(float(p95), 3),
+                    'p99_ms': round(float(p99), 3),
+                }
+        return result
+
+
+def synthetic_recording(path, frames=300, fps=30, size=(640, 480), seed=0):
+    """
+    Graba en `path` una secuencia sintética: suelo gris con ruido, un papel blanco que
+    se acerca desde el horizonte y un objeto de color que cruza el frame.
+    """
+    rng = np.random.default_rng(seed)
+    width, height = size
+    floor = np.full((height, width, 3), 90, np.uint8)
+    floor += rng.integers(0, 20, floor.shape, dtype=np.uint8)
+    recorder = FrameRecorder(path)
+    start = time.time()
+    for i in range(frames):
+        frame = floor.copy()
+        t = i / max(1, frames - 1)
+        px = int(width * (0.3 + 0.4 * np.sin(2 * np.pi * t)))
+        py = int(height * (0.2 + 0.7 * t))
+        side = int(30 + 70 * t)
+        cv2.rectangle(frame, (px - side // 2, py - side // 2), (px + side // 2, py + side // 2), (250, 250, 250), -1)
+        bx = int(width * t)
+        cv2.circle(frame, (bx, height // 3), 25, (40, 60, 200), -1)
+        recorder.write_frame(frame, timestamp=start + i / fps, block=True)
+    recorder.close()
+    return path
+
+
+def measure_decode(source, stats):
+    """Latencia de lectura + decodificación de cada frame de la fuente (fuera del pipeline)"""
+    cap = open_replay(source, speed=None)
+    while True:
+        start = time.perf_counter()
+        ret, _ = cap.read()
+        if not ret:
+            break
+        stats.observe("decode", time.perf_counter() - start)
+    cap.release()
+
+
+def build_system(variant, source, speed, esp32_port, transport="http", udp_port=4210):
+    if variant == "server":
+        import server
+        system = server.WasteDetectionSystem(esp32_ip="127.0.0.1", headless=True,
+                                             replay_path=source, replay_speed=speed)
+    elif variant == "serverIA":
+        import serverIA
+        system = serverIA.WasteDetectionSystem(esp32_ip="127.0.0.1", esp32_port=esp32_port, headless=True,
+                                               replay_path=source, replay_speed=speed)
+    else:
+        import serverIA2
+        system = serverIA2.WasteDetectionSystem(esp32_ip="127.0.0.1", esp32_port=esp32_port, headless=True,
+                                                transport=transport, udp_port=udp_port,
+                                                replay_path=source, replay_speed=speed)
+    return system
+
+
+def instrument(variant, system, stats):
+    """Envuelve los puntos de entrada de cada etapa; las llamadas internas los buscan en la instancia"""
+    if variant == "server":
+        system.segmenter.detect = stats.wrap("inference", system.segmenter.detect)
+        system.calculate_movement_command = stats.wrap("postprocess", system.calculate_movement_command)
+        # server.py sólo imprime el comando: se mide el costo local del envío
+        system.send_command_to_esp32 = stats.wrap("command", system.send_command_to_esp32)
+    elif variant == "serverIA":
+        system.backend.detect = stats.wrap("inference", system.backend.detect)
+        system.calculate_movement_direction = stats.wrap("postprocess", system.calculate_movement_direction)
+        system.send_command_to_esp32 = stats.wrap("command", system.send_command_to_esp32)
+    else:
+        system.backend.detect = stats.wrap("inference", system.backend.detect)
+        system.calculate_movement_command = stats.wrap("postprocess", system.calculate_movement_command)
+        # Ida y vuelta real (HTTP o UDP + ack) contra el simulador del ESP32, en el hilo de envío
+        transport = system.command_sender.transport
+        transport.send = stats.wrap("command", transport.send)
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_variant(variant, source, speed, esp32_port, transport="http", udp_port=4210):
+    """Corre una variante completa sobre `source` y devuelve sus métricas"""
+    stats = StageLatencies()
+    measure_decode(source, stats)
+    system = build_system(variant, source, speed, esp32_port, transport, udp_port)
+    instrument(variant, system, stats)
+
+    start = time.perf_counter()
+    if variant == "server":
+        system.start_detection()
+    else:
+        system.run()
+    elapsed = time.perf_counter() - start
+
+    frames = system.grabber.stats() if hasattr(system, 'grabber') else {}
+    result = {
+        'variant': variant,
+        'elapsed_s': round(elapsed, 3),
+        'frames': frames,
+        'fps': round(frames.get('consumed', 0) / elapsed, 2) if elapsed else 0.0,
+        'stages': stats.summary(),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+    if hasattr(system, 'command_sender'):
+        result['command_sender'] = system.command_sender.stats()
+    return result
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SERVER_DIR,
+                             capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_isolated(variant, source, speed, esp32, transport="http", verbose=False):
+    """Corre la variante en un proceso propio (RSS pico y estado de módulos aislados)"""
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        result_path = f.name
+    cmd = [sys.executable, os.path.abspath(__file__), "--worker", variant, "--source", source,
+           "--esp32-port", str(esp32.port), "--udp-port", str(esp32.udp_port),
+           "--transport", transport, "--result", result_path]
+    if speed is not None:
+        cmd += ["--speed", str(speed)]
+    before = esp32.stats()
+    proc = subprocess.run(cmd, cwd=SERVER_DIR, text=True,
+                          stdout=None if verbose else subprocess.DEVNULL, stderr=subprocess.PIPE)
+    try:
+        if proc.returncode != 0:
+            return {'variant': variant, 'error': proc.stderr.strip().splitlines()[-1:]}
+        with open(result_path) as f:
+            result = json.load(f)
+    finally:
+        os.unlink(result_path)
+    after = esp32.stats()
+    result['commands_received'] = after['commands'] - before['commands']
+    result['esp32'] = {key: after[key] - before[key] for key in ('http_requests', 'udp_packets', 'lost')}
+    return result
+
+
+def compare(results, baseline, tolerance):
+    """Lista de regresiones respecto a un resultado anterior (FPS o p95 por etapa)"""
+    regressions = []
+    for variant, result in results.items():
+        base = baseline.get('results', {}).get(variant)
+        if not base or 'error' in result or 'error' in base:
+            continue
+        if base['fps'] and result['fps'] < base['fps'] * (1 - tolerance):
+            regressions.append(f"{variant}: FPS {base['fps']} -> {result['fps']}")
+        for stage, summary in result['stages'].items():
+            before = base['stages'].get(stage, {}).get('p95_ms')
+            after = summary.get('p95_ms')
+            if before and after and after > before * (1 + tolerance):
+                regressions.append(f"{variant}/{stage}: p95 {before} ms -> {after} ms")
+    return regressions
+
+
+def print_report(results):
+    for variant, result in results.items():
+        if 'error' in result:
+            print(f"{variant}: ERROR {result['error']}")
+            continue
+        print(f"{variant}: {result['fps']} FPS, {result['frames'].get('consumed', 0)} frames "
+              f"({result['frames'].get('dropped', 0)} descartados), RSS pico {result['peak_rss_mb']} MB, "
+              f"{result['commands_received']} comandos recibidos ({result['esp32']['lost']} perdidos)")
+        for stage, summary in result['stages'].items():
+            if summary['count']:
+                print(f"  {stage:<12} n={summary['count']:<5} p50={summary['p50_ms']:.2f} ms "
+                      f"p95={summary['p95_ms']:.2f} ms p99={summary['p99_ms']:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de extremo a extremo de los servidores de detección")
+    parser.add_argument("--variants", nargs="+", default=list(VARIANTS), choices=VARIANTS)
+    parser.add_argument("--source", help="video local o grabación .ecorec (por defecto, frames sintéticos)")
+    parser.add_argument("--frames", type=int, default=300, help="frames sintéticos a generar")
+    parser.add_argument("--speed", type=float, default=None,
+                        help="velocidad de reproducción (1.0 = tiempo real); sin valor, lo más rápido posible")
+    parser.add_argument("--transport", default="http", choices=("http", "udp"), help="canal de control de serverIA2")
+    parser.add_argument("--esp32-delay", type=float, default=0.0, help="demora por pedido del ESP32 simulado (s)")
+    parser.add_argument("--esp32-jitter", type=float, default=0.0, help="demora aleatoria adicional máxima (s)")
+    parser.add_argument("--esp32-loss", type=float, default=0.0, help="probabilidad de perder un pedido")
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--baseline", help="resultado anterior contra el que comparar")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="regresión tolerada (fracción)")
+    parser.add_argument("--verbose", action="store_true", help="muestra la salida de los servidores")
+    # Modo interno: una sola variante en este proceso
+    parser.add_argument("--worker", choices=VARIANTS, help=argparse.SUPPRESS)
+    parser.add_argument("--esp32-port", type=int, default=80, help=argparse.SUPPRESS)
+    parser.add_argument("--udp-port", type=int, default=4210, help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        result = run_variant(args.worker, args.source, args.speed, args.esp32_port, args.transport, args.udp_port)
+        with open(args.result, "w") as f:
+            json.dump(result, f)
+        return
+
+    tmpdir = tempfile.TemporaryDirectory()
+    source = args.source
+    if source is None:
+        source = synthetic_recording(os.path.join(tmpdir.name, "synthetic.ecorec"), frames=args.frames)
+    source = os.path.abspath(source)
+
+    esp32 = Esp32Simulator(udp_port=0, response_delay=args.esp32_delay, jitter=args.esp32_jitter,
+                           loss=args.esp32_loss, seed=0).start()
+    results = {}
+    try:
+        for variant in args.variants:
+            print(f"Midiendo {variant}...")
+            results[variant] = run_isolated(variant, source, args.speed, esp32, args.transport, args.verbose)
+    finally:
+        esp32.stop()
+        tmpdir.cleanup()
+
+    report = {
+        'timestamp': datetime.now().isoformat(timespec="seconds"),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'opencv': cv2.__version__,
+        'source': args.source or f"sintético ({args.frames} frames)",
+        'speed': args.speed,
+        'transport': args.transport,
+        'esp32': {'delay': args.esp32_delay, 'jitter': args.esp32_jitter, 'loss': args.esp32_loss},
+        'results': results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print_report(results)
+    print(f"Resultados guardados en {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESIÓN {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import cv2
+import numpy as np
+
+
+class BufferPool:
+    """
+    Arreglos reutilizables por nombre para pasar como dst= a OpenCV en el bucle de visión.
+
+    get() devuelve siempre el mismo arreglo para un nombre mientras no cambie la forma ni el
+    tipo; sólo entonces se vuelve a asignar. Cada buffer pertenece a un único hilo/etapa y
+    su contenido vale hasta el próximo uso del mismo nombre: no se debe guardar ni pasar a
+    otro hilo (para eso hay que copiarlo).
+    """
+
+    def __init__(self):
+        self._buffers = {}
+        # Estadísticas
+        self.allocations = 0
+        self.reuses = 0
+
+    def get(self, name, shape, dtype=np.uint8):
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.shape != tuple(shape) or buffer.dtype != dtype:
+            buffer = np.empty(shape, dtype=dtype)
+            self._buffers[name] = buffer
+            self.allocations += 1
+        else:
+            self.reuses += 1
+        return buffer
+
+    def resize(self, name, frame, size, interpolation=cv2.INTER_LINEAR):
+        """cv2.resize de `frame` a `size` (ancho, alto) sobre el buffer `name`"""
+        width, height = size
+        dst = self.get(name, (height, width) + frame.shape[2:], frame.dtype)
+        return cv2.resize(frame, (width, height), dst=dst, interpolation=interpolation)
+
+    def copy(self, name, frame):
+        """Copia de `frame` sobre el buffer `name` (en lugar de frame.copy())"""
+        dst = self.get(name, frame.shape, frame.dtype)
+        np.copyto(dst, frame)
+        return dst
+
+    def stats(self):
+        return {
+            'buffers': len(self._buffers),
+            'bytes': sum(b.nbytes for b in self._buffers.values()),
+            'allocations': self.allocations,
+            'reuses': self.reuses,
+        }
+
@@ -0,0 +1,130 @@
+import cv2
+import numpy as np
+
+from detections import DETECTION_DTYPE
+
+
+class ColorSegmenter:
+    """
+    Detector clásico por color (HSV) optimizado.
+
+    Trabaja sobre una versión reducida (y opcionalmente recortada a una ROI) del frame,
+    reutiliza los buffers de HSV y máscaras entre frames, cachea el elemento estructurante
+    y obtiene centroides, cajas y áreas de todos los objetos en una sola pasada con
+    connectedComponentsWithStats. Los resultados se devuelven en coordenadas del frame completo,
+    como arreglo estructurado (DETECTION_DTYPE) escrito sobre un buffer propio que también se reutiliza.
+    """
+
+    def __init__(self, color_classes, scale=0.5, roi=None, min_area=500, max_area=50000, kernel_size=5):
+        """
+        Args:
+            color_classes: lista de (nombre, hsv_lower, hsv_upper)
+            scale: factor de reducción del frame antes de segmentar (1.0 = resolución completa)
+            roi: (x, y, w, h) en coordenadas del frame completo, o None para usar todo el frame
+            min_area: área mínima en píxeles del frame completo
+            max_area: área máxima en píxeles del frame completo
+            kernel_size: tamaño del kernel morfológico a resolución completa
+        """
+        self.color_classes = [(name, np.asarray(lower, np.uint8), np.asarray(upper, np.uint8))
+                              for name, lower, upper in color_classes]
+        self.class_names = [name for name, _, _ in self.color_classes]
+        self.scale = scale
+        self.roi = roi
+        self.min_area = min_area
+        self.max_area = max_area
+
+        # El kernel se escala junto con el frame (mínimo 3x3)
+        k = max(3, int(round(kernel_size * scale)) | 1)
+        self.kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (k, k))
+
+        # Buffers reutilizados; se (re)crean cuando cambia el tamaño de entrada
+        self._input_shape = None
+        self._small = None
+        self._hsv = None
+        self._mask = None
+        self._tmp = None
+        self._labels = None
+        self._detections = np.zeros(32, dtype=DETECTION_DTYPE)
+
+    def _allocate(self, shape):
+        h, w = shape[:2]
+        sw, sh = max(1, int(w * self.scale)), max(1, int(h * self.scale))
+        self._input_shape = shape
+        self._small_size = (sw, sh)
+        self._small = np.empty((sh, sw, 3), np.uint8)
+        self._hsv = np.empty((sh, sw, 3), np.uint8)
+        self._mask = np.empty((sh, sw), np.uint8)
+        self._tmp = np.empty((sh, sw), np.uint8)
+        self._labels = np.empty((sh, sw), np.int32)
+
+    def detect(self, frame):
+        """
+        Returns: arreglo estructurado (DETECTION_DTYPE) en coordenadas del frame completo, con
+        class_id = índice en class_names y confidence = 1. Es una vista del buffer interno:
+        vale hasta la próxima llamada a detect().
+        """
+        ox = oy = 0
+        if self.roi is not None:
+            ox, oy, rw, rh = self.roi
+            frame = frame[oy:oy + rh, ox:ox + rw]
+        if frame.shape != self._input_shape:
+            self._allocate(frame.shape)
+
+        if self.scale != 1.0:
+            cv2.resize(frame, self._small_size, dst=self._small, interpolation=cv2.INTER_AREA)
+            small = self._small
+        else:
+            small = frame
+        cv2.cvtColor(small, cv2.COLOR_BGR2HSV, dst=self._hsv)
+
+        # Escala de coordenadas y áreas de vuelta al frame completo
+        fx = frame.shape[1] / self._small_size[0]
+        fy = frame.shape[0] / self._small_size[1]
+        area_factor = fx * fy
+
+        count = 0
+        for class_id, (_, lower, upper) in enumerate(self.color_classes):
+            cv2.inRange(self._hsv, lower, upper, dst=self._mask)
+            cv2.morphologyEx(self._mask, cv2.MORPH_OPEN, self.kernel, dst=self._tmp)
+            cv2.morphologyEx(self._tmp, cv2.MORPH_CLOSE, self.kernel, dst=self._mask)
+
+            n, _, stats, centroids = cv2.connectedComponentsWithStats(
+                self._mask, labels=self._labels, connectivity=8, ltype=cv2.CV_32S)
+            if n <= 1:
+                continue
+            # La etiqueta 0 es el fondo
+            stats = stats[1:]
+            centroids = centroids[1:]
+            areas = stats[:, cv2.CC_STAT_AREA] * area_factor
+            keep = (areas > self.min_area) & (areas < self.max_area)
+            if not keep.any():
+                continue
+
+            stats = stats[keep]
+            areas = areas[keep]
+            cx = (centroids[keep, 0] * fx).astype(np.int32) + ox
+            cy = (centroids[keep, 1] * fy).astype(np.int32) + oy
+            bx = (stats[:, cv2.CC_STAT_LEFT] * fx).astype(np.int32) + ox
+            by = (stats[:, cv2.CC_STAT_TOP] * fy).astype(np.int32) + oy
+            bw = (stats[:, cv2.CC_STAT_WIDTH] * fx).astype(np.int32)
+            bh = (stats[:, cv2.CC_STAT_HEIGHT] * fy).astype(np.int32)
+            end = count + len(areas)
+            if end > len(self._detections):
+                grown = np.zeros(max(end, 2 * len(self._detections)), dtype=DETECTION_DTYPE)
+                grown[:count] = self._detections[:count]
+                self._detections = grown
+            out = self._detections[count:end]
+            out['x1'] = bx
+            out['y1'] = by
+            out['x2'] = bx + bw
+            out['y2'] = by + bh
+            out['center_x'] = cx
+            out['center_y'] = cy
+            out['width'] = bw
+            out['height'] = bh
+            out['area'] = areas
+            out['confidence'] = 1.0
+            out['class_id'] = class_id
+            out['track_id'] = -1
+            count = end
+        return self._detections[:count]
@@ -0,0 +1,326 @@
+import logging
+import socket
+import struct
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger("ecobot.command")
+
+
+class HttpTransport:
+    """Transporte original: POST JSON a /command del ESP32 sobre una sesión keep-alive"""
+
+    name = "http"
+
+    def __init__(self, command_url, timeout=2.0):
+        self.command_url = command_url
+        self.timeout = timeout
+        self.session = requests.Session()
+        # Una única conexión reutilizada: el ESP32 atiende un cliente a la vez
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=0)
+        self.session.mount("http://", adapter)
+
+    def send(self, command, heartbeat=False):
+        payload = {"command": command, "timestamp": datetime.now().isoformat()}
+        response = self.session.post(self.command_url, json=payload, timeout=self.timeout)
+        if response.status_code != 200:
+            raise IOError(f"HTTP {response.status_code}")
+
+    def close(self):
+        self.session.close()
+
+
+class UdpTransport:
+    """
+    Canal de control por datagramas UDP (ver handleUdp() en robot/ecobot2.ino).
+
+    Paquete de 9 bytes, little-endian:
+        magic  'EB'   (2 bytes)
+        versión       (uint8)
+        tipo          (uint8)  0 = comando, 1 = heartbeat, 2 = ack
+        secuencia     (uint32) creciente; el ESP32 descarta paquetes viejos o repetidos
+        comando       (uint8)  ver COMMAND_CODES
+
+    El ESP32 responde cada paquete con un ack que repite la secuencia, lo que permite
+    medir el RTT. Si el ESP32 deja de recibir paquetes durante su watchdog, detiene los motores.
+    """
+
+    name = "udp"
+    MAGIC = b"EB"
+    VERSION = 1
+    TYPE_COMMAND = 0
+    TYPE_HEARTBEAT = 1
+    TYPE_ACK = 2
+    PACKET = struct.Struct("<2sBBIB")
+    COMMAND_CODES = {"STOP": 0, "FORWARD": 1, "LEFT": 2, "RIGHT": 3, "COLLECT": 4}
+
+    def __init__(self, esp32_ip, port=4210, ack_timeout=0.1):
+        """
+        Args:
+            esp32_ip: IP del ESP32
+            port: puerto UDP de control del ESP32
+            ack_timeout: tiempo máximo de espera por el ack (segundos)
+        """
+        self.address = (esp32_ip, port)
+        self.ack_timeout = ack_timeout
+        self.seq = 0
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.connect(self.address)
+
+    def encode(self, command, heartbeat=False):
+        self.seq = (self.seq + 1) & 0xFFFFFFFF
+        packet_type = self.TYPE_HEARTBEAT if heartbeat else self.TYPE_COMMAND
+        code = self.COMMAND_CODES.get(command, self.COMMAND_CODES["STOP"])
+        return self.PACKET.pack(self.MAGIC, self.VERSION, packet_type, self.seq, code)
+
+    def send(self, command, heartbeat=False):
+        packet = self.encode(command, heartbeat)
+        self.sock.send(packet)
+        deadline = time.perf_counter() + self.ack_timeout
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                raise TimeoutError(f"Sin ack para secuencia {self.seq}")
+            self.sock.settimeout(remaining)
+            try:
+                data = self.sock.recv(64)
+            except socket.timeout:
+                continue
+            if len(data) < self.PACKET.size:
+                continue
+            magic, _, packet_type, seq, _ = self.PACKET.unpack_from(data)
+            # Acks de paquetes anteriores que llegaron tarde se ignoran
+            if magic == self.MAGIC and packet_type == self.TYPE_ACK and seq == self.seq:
+                return
+
+    def close(self):
+        self.sock.close()
+
+
+class FrameDeadline:
+    """
+    Presupuesto de latencia entre la captura de un frame y el envío del comando calculado
+    con él: un comando cuyo frame es más viejo que `max_age` se descarta (policy="drop") o
+    se reemplaza por el comando de parada (policy="stop"), para que el robot no gire hacia donde estaba el
+    desecho hace un segundo. Los tiempos son de time.monotonic() (ver LatestFrameGrabber.frame_time).
+    """
+
+    POLICIES = ("drop", "stop")
+
+    def __init__(self, max_age=None, policy="stop", metrics=None, stop_command="STOP"):
+        """
+        Args:
+            max_age: antigüedad máxima del frame en segundos (None sólo mide, no descarta)
+            policy: "drop" descarta el comando viejo, "stop" lo reemplaza por `stop_command`
+            metrics: Metrics opcional: histograma frame_age_seconds y contadores de comandos viejos
+            stop_command: comando de parada en el vocabulario del robot ("STOP" o "stop" en ecobot_ia)
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(f"Política desconocida: {policy}")
+        self.max_age = max_age
+        self.policy = policy
+        self.stop_command = stop_command
+        self._ages = metrics.histogram("frame_age_seconds") if metrics is not None else None
+        self._dropped_counter = metrics.counter("stale_commands_dropped_total") if metrics is not None else None
+        self._stopped_counter = metrics.counter("stale_commands_stopped_total") if metrics is not None else None
+        self.dropped = 0
+        self.stopped = 0
+
+    def check(self, command, captured_at, heartbeat=False):
+        """
+        Devuelve el comando a enviar: `command`, stop_command, o None si hay que descartarlo.
+        Los heartbeats no se miden ni se cuentan, pero también respetan el presupuesto.
+        """
+        if captured_at is None:
+            return command
+        age = time.monotonic() - captured_at
+        if not heartbeat and self._ages is not None:
+            self._ages.observe(age)
+        if self.max_age is None or age <= self.max_age:
+            return command
+        if self.policy == "drop":
+            if not heartbeat:
+                self.dropped += 1
+                if self._dropped_counter is not None:
+                    self._dropped_counter.inc()
+            return None
+        if command != self.stop_command and not heartbeat:
+            self.stopped += 1
+            if self._stopped_counter is not None:
+                self._stopped_counter.inc()
+        return self.stop_command
+
+    def stats(self):
+        return {'max_age': self.max_age, 'policy': self.policy, 'dropped': self.dropped, 'stopped': self.stopped}
+
+
+class CommandSender:
+    """
+    Envía comandos al ESP32 desde un hilo dedicado a través de un transporte (HTTP o UDP).
+
+    Sólo hay un comando pendiente a la vez: si llega uno nuevo antes de que se envíe el
+    anterior, el nuevo lo reemplaza (latest-wins). Así el bucle de visión nunca espera al
+    ESP32 y el robot siempre recibe la orden más reciente. Con `heartbeat_interval` el
+    último comando se repite periódicamente para alimentar el watchdog del ESP32.
+
+    Cada comando viaja con el instante de captura de su frame; justo antes de enviarlo,
+    `deadline` (FrameDeadline) decide si todavía vale o si se descarta o se cambia por STOP.
+    Así cuenta también la espera detrás de un envío lento al ESP32.
+    """
+
+    def __init__(self, transport, heartbeat_interval=None, history_size=500, metrics=None, deadline=None):
+        """
+        Args:
+            transport: HttpTransport o UdpTransport
+            heartbeat_interval: segundos entre heartbeats (None desactiva el heartbeat)
+            history_size: cantidad de latencias recientes que se guardan para estadísticas
+            metrics: Metrics opcional donde registrar el RTT y los envíos fallidos
+            deadline: FrameDeadline opcional con el presupuesto de antigüedad de los frames
+        """
+        self.transport = transport
+        self.heartbeat_interval = heartbeat_interval
+        self._rtt_histogram = metrics.histogram("command_rtt_seconds") if metrics is not None else None
+        self._failures = metrics.counter("command_failures_total") if metrics is not None else None
+        self.deadline = deadline
+
+        self._cond = threading.Condition()
+        self._pending = None          # (comando, captured_at)
+        self._in_flight = False
+        self._last_sent = None        # (comando, captured_at) del último comando despachado
+        self._thread = None
+        self.running = False
+
+        # Estadísticas
+        self.rtt_history = deque(maxlen=history_size)
+        self.sent = 0
+        self.heartbeats = 0
+        self.failed = 0
+        self.coalesced = 0
+        self.last_error = None
+
+    def start(self):
+        self.running = True
+        self._thread = threading.Thread(target=self._send_loop, name="envio-esp32", daemon=True)
+        self._thread.start()
+        return self
+
+    def send(self, command, captured_at=None):
+        """
+        Programa el envío de `command` sin bloquear; reemplaza cualquier comando aún no enviado.
+        `captured_at` es el time.monotonic() de captura del frame del que salió el comando.
+        """
+        with self._cond:
+            if self._pending is not None:
+                self.coalesced += 1
+            self._pending = (command, captured_at)
+            self._cond.notify_all()
+
+    def confirm(self, command, captured_at):
+        """
+        El bucle de visión sigue pidiendo `command` (que no se reenvía) con un frame más nuevo:
+        renueva su antigüedad para que los heartbeats no lo den por viejo.
+        """
+        with self._cond:
+            if self._pending is not None and self._pending[0] == command:
+                self._pending = (command, captured_at)
+            elif self._pending is None and self._last_sent is not None and self._last_sent[0] == command:
+                self._last_sent = (command, captured_at)
+
+    @property
+    def last_command(self):
+        """Comando pendiente o, si no hay, el último despachado (STOP si el presupuesto lo reemplazó)"""
+        with self._cond:
+            current = self._pending or self._last_sent
+            return current[0] if current is not None else None
+
+    def _send_loop(self):
+        while True:
+            with self._cond:
+                ready = self._cond.wait_for(lambda: self._pending is not None or not self.running,
+                                            self.heartbeat_interval)
+                if not ready:
+                    if self._last_sent is None:
+                        continue
+                    (command, captured_at), heartbeat = self._last_sent, True
+                elif self._pending is None:
+                    break
+                else:
+                    (command, captured_at), heartbeat = self._pending, False
+                    self._pending = None
+                if self.deadline is not None:
+                    checked = self.deadline.check(command, captured_at, heartbeat)
+                    if checked is None:
+                        # Descartado por viejo: sin heartbeat, el watchdog del ESP32 detiene el robot
+                        self._cond.notify_all()
+                        continue
+                    command = checked
+                if not heartbeat:
+                    # El heartbeat repite el último comando pedido, aunque su envío haya fallado
+                    self._last_sent = (command, captured_at)
+                self._in_flight = True
+            self._deliver(command, heartbeat)
+            with self._cond:
+                self._in_flight = False
+                self._cond.notify_all()
+
+    def _deliver(self, command, heartbeat=False):
+        t0 = time.perf_counter()
+        try:
+            self.transport.send(command, heartbeat=heartbeat)
+            rtt = time.perf_counter() - t0
+            self.rtt_history.append(1000.0 * rtt)
+            if self._rtt_histogram is not None:
+                self._rtt_histogram.observe(rtt)
+            if heartbeat:
+                self.heartbeats += 1
+            else:
+                self.sent += 1
+                logger.debug("Comando %s enviado correctamente (%.1f ms)", command, 1000.0 * rtt)
+        except Exception as e:
+            self.failed += 1
+            self.last_error = str(e)
+            if self._failures is not None:
+                self._failures.inc()
+            if not heartbeat:
+                logger.warning("Error comunicando con ESP32: %s", e)
+
+    def flush(self, timeout=None):
+        """Espera a que se envíe el comando pendiente; devuelve False si vence `timeout`"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._pending is None and not self._in_flight, timeout)
+
+    def stats(self):
+        rtts = sorted(self.rtt_history)
+
+        def percentile(p):
+            if not rtts:
+                return None
+            return round(rtts[min(len(rtts) - 1, int(p / 100.0 * len(rtts)))], 1)
+
+        return {
+            'transport': self.transport.name,
+            'sent': self.sent,
+            'heartbeats': self.heartbeats,
+            'failed': self.failed,
+            'coalesced': self.coalesced,
+            'stale_dropped': self.deadline.dropped if self.deadline is not None else 0,
+            'stale_stopped': self.deadline.stopped if self.deadline is not None else 0,
+            'rtt_p50_ms': percentile(50),
+            'rtt_p95_ms': percentile(95),
+            'last_error': self.last_error,
+        }
+
+    def stop(self, timeout=3.0):
+        """Envía lo pendiente y detiene el hilo de envío"""
+        self.flush(timeout)
+        with self._cond:
+            self.running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+        self.transport.close()
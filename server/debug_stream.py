@@ -0,0 +1,100 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+
+
+class MjpegDebugServer:
+    """
+    Stream MJPEG de depuración con las detecciones dibujadas, en http://<host>:<port>/debug.
+
+    Sólo se dibuja y codifica cuando hay al menos un cliente conectado y como máximo
+    `max_fps` veces por segundo: sin nadie mirando, el costo es un par de comparaciones.
+    """
+
+    BOUNDARY = "frame"
+
+    def __init__(self, host="127.0.0.1", port=8090, max_fps=5, jpeg_quality=70):
+        self.host = host
+        self.port = port
+        self.min_interval = 1.0 / max_fps
+        self.encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), jpeg_quality]
+
+        self._cond = threading.Condition()
+        self._jpeg = None
+        self._jpeg_id = 0
+        self._last_publish = 0.0
+        self.clients = 0
+        self.running = False
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        stream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/debug":
+                    self.send_error(404, "Usar /debug")
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={stream.BOUNDARY}")
+                self.send_header("Cache-Control", "no-cache")
+                self.end_headers()
+                stream._serve_client(self.wfile)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.running = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="debug-mjpeg", daemon=True)
+        self._thread.start()
+        print(f"Stream de depuración en http://{self.host}:{self.port}/debug")
+        return self
+
+    def _serve_client(self, wfile):
+        with self._cond:
+            self.clients += 1
+        last_id = 0
+        try:
+            while self.running:
+                with self._cond:
+                    self._cond.wait_for(lambda: self._jpeg_id != last_id or not self.running, timeout=1.0)
+                    if self._jpeg_id == last_id:
+                        continue
+                    jpeg, last_id = self._jpeg, self._jpeg_id
+                wfile.write(f"--{self.BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                            f"Content-Length: {len(jpeg)}\r\n\r\n".encode())
+                wfile.write(jpeg)
+                wfile.write(b"\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            with self._cond:
+                self.clients -= 1
+
+    def wants_frame(self):
+        """True si hay clientes y ya pasó el intervalo mínimo desde el último frame publicado"""
+        return self.clients > 0 and time.monotonic() - self._last_publish >= self.min_interval
+
+    def publish(self, frame):
+        """Codifica `frame` a JPEG y lo envía a los clientes conectados"""
+        self._last_publish = time.monotonic()
+        ok, jpeg = cv2.imencode(".jpg", frame, self.encode_params)
+        if not ok:
+            return
+        with self._cond:
+            self._jpeg = jpeg.tobytes()
+            self._jpeg_id += 1
+            self._cond.notify_all()
+
+    def stop(self):
+        with self._cond:
+            self.running = False
+            self._cond.notify_all()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
@@ -0,0 +1,118 @@
+import numpy as np
+
+# Una fila por detección; todas las etapas (filtrado, ranking, dibujo) trabajan sobre este arreglo
+DETECTION_DTYPE = np.dtype([
+    ('x1', np.int32),
+    ('y1', np.int32),
+    ('x2', np.int32),
+    ('y2', np.int32),
+    ('center_x', np.int32),
+    ('center_y', np.int32),
+    ('width', np.int32),
+    ('height', np.int32),
+    ('area', np.int32),
+    ('confidence', np.float32),
+    ('class_id', np.int16),
+    ('track_id', np.int32),  # -1 si la detección no pasó por el tracker
+])
+
+
+def empty_detections():
+    return np.empty(0, dtype=DETECTION_DTYPE)
+
+
+def detections_from_arrays(xyxy, confidence, class_id):
+    """
+    Construye el arreglo estructurado a partir de cajas (N, 4), confianzas (N,) y clases (N,).
+    Las coordenadas se truncan a enteros igual que antes hacía int() por caja.
+    """
+    xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+    detections = np.empty(len(xyxy), dtype=DETECTION_DTYPE)
+    x1, y1, x2, y2 = xyxy.T
+    detections['x1'] = x1
+    detections['y1'] = y1
+    detections['x2'] = x2
+    detections['y2'] = y2
+    detections['center_x'] = (x1 + x2) / 2
+    detections['center_y'] = (y1 + y2) / 2
+    detections['width'] = x2 - x1
+    detections['height'] = y2 - y1
+    detections['area'] = detections['width'] * detections['height']
+    detections['confidence'] = confidence
+    detections['class_id'] = class_id
+    detections['track_id'] = -1
+    return detections
+
+
+def offset_detections(detections, dx, dy):
+    """Desplaza (en el lugar) las coordenadas de las detecciones, p. ej. de un recorte al frame completo"""
+    if dx:
+        for key in ('x1', 'x2', 'center_x'):
+            detections[key] += dx
+    if dy:
+        for key in ('y1', 'y2', 'center_y'):
+            detections[key] += dy
+    return detections
+
+
+def detections_from_results(results, confidence_threshold):
+    """
+    Convierte los resultados de YOLO en un único arreglo estructurado por frame.
+    Cada tensor se copia a CPU una sola vez por resultado en lugar de una vez por caja.
+    """
+    parts = []
+    for result in results:
+        boxes = result.boxes
+        if boxes is None or len(boxes) == 0:
+            continue
+        xyxy = boxes.xyxy.cpu().numpy()
+        confidence = boxes.conf.cpu().numpy()
+        class_id = boxes.cls.cpu().numpy()
+        keep = confidence > confidence_threshold
+        parts.append(detections_from_arrays(xyxy[keep], confidence[keep], class_id[keep]))
+    if not parts:
+        return empty_detections()
+    if len(parts) == 1:
+        return parts[0]
+    return np.concatenate(parts)
+
+
+def target_priority(detections, frame_height):
+    """Prioridad por área y cercanía al fondo del frame (objetos más cercanos)"""
+    area = detections['area'].astype(np.float32)
+    return area * (1 + (frame_height - detections['center_y']) / frame_height)
+
+
+def best_target(detections, frame_height):
+    """Devuelve la detección con mayor prioridad, o None si no hay detecciones"""
+    if len(detections) == 0:
+        return None
+    return detections[np.argmax(target_priority(detections, frame_height))]
+
+
+def largest_detection(detections):
+    """Devuelve la detección de mayor área, o None si no hay detecciones"""
+    if len(detections) == 0:
+        return None
+    return detections[np.argmax(detections['area'])]
+
+
+def detection_boxes(detections):
+    """Cajas como arreglo (N, 4) float32 en formato x1, y1, x2, y2"""
+    boxes = np.empty((len(detections), 4), dtype=np.float32)
+    boxes[:, 0] = detections['x1']
+    boxes[:, 1] = detections['y1']
+    boxes[:, 2] = detections['x2']
+    boxes[:, 3] = detections['y2']
+    return boxes
+
+
+def iou_matrix(a, b):
+    """IoU entre cada caja de `a` (N, 4) y cada una de `b` (M, 4); devuelve una matriz N x M"""
+    inter_w = np.clip(np.minimum(a[:, None, 2], b[None, :, 2]) - np.maximum(a[:, None, 0], b[None, :, 0]), 0, None)
+    inter_h = np.clip(np.minimum(a[:, None, 3], b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1]), 0, None)
+    inter = inter_w * inter_h
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return inter / np.maximum(union, 1e-6)
@@ -0,0 +1,383 @@
+import argparse
+import json
+import math
+import random
+import selectors
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from command_sender import UdpTransport
+
+# Estados de robot/ecobot_ia.ino; los comandos de ecobot2.ino se mapean a los mismos
+DETENIDO = "DETENIDO"
+AVANZANDO = "AVANZANDO"
+RETROCEDIENDO = "RETROCEDIENDO"
+GIRANDO_IZQUIERDA = "GIRANDO_IZQUIERDA"
+GIRANDO_DERECHA = "GIRANDO_DERECHA"
+BUSCANDO = "BUSCANDO"
+RECOLECTANDO = "RECOLECTANDO"
+
+GET_ROUTES = {
+    "/move_forward": (AVANZANDO, "Avanzando"),
+    "/move_backward": (RETROCEDIENDO, "Retrocediendo"),
+    "/turn_left": (GIRANDO_IZQUIERDA, "Girando izquierda"),
+    "/turn_right": (GIRANDO_DERECHA, "Girando derecha"),
+    "/stop": (DETENIDO, "Detenido"),
+    "/search": (BUSCANDO, "Buscando"),
+}
+COMMAND_STATES = {
+    "FORWARD": AVANZANDO,
+    "LEFT": GIRANDO_IZQUIERDA,
+    "RIGHT": GIRANDO_DERECHA,
+    "STOP": DETENIDO,
+    "COLLECT": RECOLECTANDO,
+}
+UDP_COMMANDS = {code: command for command, code in UdpTransport.COMMAND_CODES.items()}
+
+
+class RobotState:
+    """
+    Estado simulado del robot: máquina de estados del firmware más una pose (x, y, rumbo)
+    integrada en el tiempo según las velocidades PWM configuradas.
+    """
+
+    def __init__(self, max_speed=0.5, max_turn_rate=2.0, command_timeout=2.0, search_period=2.0):
+        """
+        Args:
+            max_speed: velocidad lineal (m/s) con PWM 255
+            max_turn_rate: velocidad de giro (rad/s) con PWM 255
+            command_timeout: segundos sin comandos HTTP antes de detenerse (None lo desactiva)
+            search_period: segundos entre cambios de sentido al buscar
+        """
+        self.max_speed = max_speed
+        self.max_turn_rate = max_turn_rate
+        self.command_timeout = command_timeout
+        self.search_period = search_period
+
+        self.velocidad_base = 150
+        self.velocidad_giro = 120
+        self.state = DETENIDO
+        self.x = self.y = self.heading = 0.0
+        self.collected = 0
+        self.commands = 0
+        self.started = time.monotonic()
+        self.last_command = self.started
+        self._last_tick = self.started
+        self._search_start = self.started
+        self._search_right = True
+        self.history = [(0.0, DETENIDO, 0.0, 0.0, 0.0)]
+
+    def _velocities(self):
+        base = self.max_speed * self.velocidad_base / 255
+        turn = self.max_turn_rate * self.velocidad_giro / 255
+        if self.state == AVANZANDO:
+            return base, 0.0
+        if self.state == RETROCEDIENDO:
+            return -base, 0.0
+        if self.state == GIRANDO_IZQUIERDA:
+            return 0.0, turn
+        if self.state == GIRANDO_DERECHA:
+            return 0.0, -turn
+        if self.state == BUSCANDO:
+            return 0.0, -turn / 2 if self._search_right else turn / 2
+        return 0.0, 0.0
+
+    def tick(self, now=None):
+        """Integra la pose hasta `now` y aplica el timeout de comandos y la búsqueda automática"""
+        now = time.monotonic() if now is None else now
+        dt = now - self._last_tick
+        self._last_tick = now
+        linear, angular = self._velocities()
+        if angular:
+            self.heading = (self.heading + angular * dt) % (2 * math.pi)
+        if linear:
+            self.x += linear * dt * math.cos(self.heading)
+            self.y += linear * dt * math.sin(self.heading)
+        if self.state == BUSCANDO and now - self._search_start > self.search_period:
+            self._search_right = not self._search_right
+            self._search_start = now
+        if (self.command_timeout is not None and self.state != DETENIDO
+                and now - self.last_command > self.command_timeout):
+            self.set_state(DETENIDO, command=False)
+
+    def set_state(self, state, command=True):
+        now = time.monotonic()
+        self.tick(now)
+        if command:
+            self.commands += 1
+            self.last_command = now
+        if state == RECOLECTANDO:
+            self.collected += 1
+        if state != self.state:
+            self.state = state
+            if state == BUSCANDO:
+                self._search_start = now
+            self.history.append((round(now - self.started, 3), state,
+                                 round(self.x, 3), round(self.y, 3), round(self.heading, 3)))
+
+    def status(self):
+        return {
+            "estado": self.state,
+            "velocidad_base": self.velocidad_base,
+            "velocidad_giro": self.velocidad_giro,
+            "wifi_signal": -50,
+            "uptime": int((time.monotonic() - self.started) * 1000),
+            "ip": "127.0.0.1",
+            # Campos sólo del simulador
+            "x": round(self.x, 3),
+            "y": round(self.y, 3),
+            "heading": round(self.heading, 3),
+            "comandos": self.commands,
+            "recolectados": self.collected,
+        }
+
+    def configure(self, config):
+        if "velocidad_base" in config:
+            self.velocidad_base = min(max(int(config["velocidad_base"]), 50), 255)
+        if "velocidad_giro" in config:
+            self.velocidad_giro = min(max(int(config["velocidad_giro"]), 50), 255)
+
+
+class Esp32Simulator:
+    """
+    Reemplazo local del ESP32 para pruebas de carga y latencia del canal de control.
+
+    Implementa las rutas HTTP de robot/ecobot_ia.ino (/move_forward, /turn_left, /turn_right,
+    /stop, /search, /status, /config), el POST /command y el canal UDP de robot/ecobot2.ino.
+    Como la placa, atiende todo desde un único hilo: un pedido lento (o un COLLECT, que
+    bloquea `collect_time` segundos) retrasa a todos los demás. Cada conexión HTTP se cierra
+    después de responder.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, udp_port=None, response_delay=0.0, jitter=0.0,
+                 loss=0.0, loop_delay=0.0, collect_time=1.0, udp_watchdog=0.6, robot=None, seed=None):
+        """
+        Args:
+            host: dirección donde escuchar
+            port: puerto HTTP (0 = uno libre)
+            udp_port: puerto UDP de control (None lo desactiva, 0 = uno libre)
+            response_delay: demora fija por pedido (segundos)
+            jitter: demora adicional aleatoria uniforme en [0, jitter] (segundos)
+            loss: probabilidad de perder un pedido (HTTP: se cierra sin responder; UDP: sin ack)
+            loop_delay: pausa al final de cada vuelta del loop (ecobot_ia.ino usa 50 ms)
+            collect_time: segundos que el COLLECT bloquea la placa (delay(1000) en ecobot2.ino)
+            udp_watchdog: segundos sin paquetes UDP antes de detenerse
+            robot: RobotState a usar (por defecto uno nuevo)
+            seed: semilla para la demora aleatoria y las pérdidas
+        """
+        self.response_delay = response_delay
+        self.jitter = jitter
+        self.loss = loss
+        self.loop_delay = loop_delay
+        self.collect_time = collect_time
+        self.udp_watchdog = udp_watchdog
+        self.robot = robot or RobotState()
+        self.random = random.Random(seed)
+
+        self._httpd = HTTPServer((host, port), self._make_handler())
+        self._httpd.timeout = 0
+        self.host, self.port = self._httpd.server_address[:2]
+        self._udp = None
+        self.udp_port = None
+        if udp_port is not None:
+            self._udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._udp.bind((host, udp_port))
+            self.udp_port = self._udp.getsockname()[1]
+        self._udp_seq = None
+        self._udp_last = None
+        self._udp_command = None
+
+        self.running = False
+        self._thread = None
+
+        # Estadísticas
+        self.http_requests = 0
+        self.udp_packets = 0
+        self.lost = 0
+        self.busy_time = 0.0
+
+    def _make_handler(self):
+        sim = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _handle(self):
+                sim.http_requests += 1
+                if sim._lose():
+                    self.close_connection = True
+                    return
+                sim._delay()
+                body = None
+                length = int(self.headers.get("Content-Length", 0))
+                if length:
+                    body = self.rfile.read(length)
+                code, content_type, payload = sim.route(self.command, self.path, body)
+                data = payload.encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = _handle
+            do_POST = _handle
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def _lose(self):
+        if self.loss and self.random.random() < self.loss:
+            self.lost += 1
+            return True
+        return False
+
+    def _delay(self):
+        delay = self.response_delay + (self.random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+    def _execute(self, command):
+        state = COMMAND_STATES.get(command, DETENIDO)
+        self.robot.set_state(state)
+        if state == RECOLECTANDO:
+            # Bloquea el loop, igual que delay(1000) en executeMovement()
+            time.sleep(self.collect_time)
+            self.robot.set_state(DETENIDO, command=False)
+
+    def route(self, method, path, body=None):
+        """Devuelve (código, content-type, cuerpo) para un pedido HTTP, como el firmware"""
+        path = path.split("?", 1)[0]
+        if method == "GET" and path in GET_ROUTES:
+            state, message = GET_ROUTES[path]
+            self.robot.set_state(state)
+            return 200, "text/plain", message
+        if method == "GET" and path == "/status":
+            self.robot.tick()
+            return 200, "application/json", json.dumps(self.robot.status())
+        if method == "POST" and path == "/config":
+            if not body:
+                return 400, "text/plain", "Sin datos"
+            try:
+                self.robot.configure(json.loads(body))
+            except (ValueError, TypeError):
+                return 400, "text/plain", "JSON inválido"
+            return 200, "text/plain", "Configuración actualizada"
+        if method == "POST" and path == "/command":
+            if not body:
+                return 400, "application/json", '{"status":"error","msg":"Sin datos"}'
+            try:
+                command = json.loads(body)["command"]
+            except (ValueError, KeyError, TypeError):
+                return 400, "application/json", '{"status":"error","msg":"JSON inválido"}'
+            self._execute(command)
+            return 200, "application/json", '{"status":"ok"}'
+        return 404, "text/plain", "Ruta no encontrada\n"
+
+    def _handle_udp(self):
+        packet, address = self._udp.recvfrom(64)
+        self.udp_packets += 1
+        if len(packet) != UdpTransport.PACKET.size or self._lose():
+            return
+        magic, version, packet_type, seq, code = UdpTransport.PACKET.unpack(packet)
+        if magic != UdpTransport.MAGIC or version != UdpTransport.VERSION:
+            return
+        self._delay()
+        self._udp.sendto(UdpTransport.PACKET.pack(magic, version, UdpTransport.TYPE_ACK, seq, code), address)
+        # Descarta paquetes viejos o repetidos (resta con signo de 32 bits, como el firmware)
+        diff = (seq - self._udp_seq) & 0xFFFFFFFF if self._udp_seq is not None else 1
+        if 0 < diff < 0x80000000 and code in UDP_COMMANDS:
+            self._udp_seq = seq
+            self._udp_last = time.monotonic()
+            command = UDP_COMMANDS[code]
+            if packet_type == UdpTransport.TYPE_COMMAND or command != self._udp_command:
+                self._udp_command = command
+                self._execute(command)
+
+    def _loop(self):
+        selector = selectors.DefaultSelector()
+        selector.register(self._httpd.socket, selectors.EVENT_READ, "http")
+        if self._udp is not None:
+            selector.register(self._udp, selectors.EVENT_READ, "udp")
+        while self.running:
+            # Un pedido por vuelta, como server.handleClient() + handleUdp() en loop()
+            for key, _ in selector.select(timeout=0.02):
+                start = time.perf_counter()
+                if key.data == "http":
+                    self._httpd.handle_request()
+                else:
+                    self._handle_udp()
+                self.busy_time += time.perf_counter() - start
+            if self._udp_last is not None and time.monotonic() - self._udp_last > self.udp_watchdog:
+                self._udp_last = None
+                self._udp_seq = None
+                self._udp_command = None
+                self.robot.set_state(DETENIDO, command=False)
+            self.robot.tick()
+            if self.loop_delay:
+                time.sleep(self.loop_delay)
+        selector.close()
+
+    def start(self):
+        self.running = True
+        self._thread = threading.Thread(target=self._loop, name="esp32-sim", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        if self._thread is not None:
+            self._thread.join(timeout=2.0 + self.collect_time)
+        self._httpd.server_close()
+        if self._udp is not None:
+            self._udp.close()
+
+    def stats(self):
+        uptime = time.monotonic() - self.robot.started
+        return {
+            'http_requests': self.http_requests,
+            'udp_packets': self.udp_packets,
+            'lost': self.lost,
+            'commands': self.robot.commands,
+            'collected': self.robot.collected,
+            'utilization': round(self.busy_time / uptime, 3) if uptime else 0.0,
+            'state': self.robot.state,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulador local del ESP32 (ecobot_ia.ino / ecobot2.ino)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--udp-port", type=int, default=4210, help="-1 desactiva el canal UDP")
+    parser.add_argument("--delay", type=float, default=0.0, help="demora por pedido (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="demora aleatoria adicional máxima (s)")
+    parser.add_argument("--loss", type=float, default=0.0, help="probabilidad de perder un pedido")
+    parser.add_argument("--loop-delay", type=float, default=0.0, help="pausa del loop (ecobot_ia.ino: 0.05)")
+    parser.add_argument("--trace", help="archivo JSONL donde guardar los cambios de estado del robot")
+    args = parser.parse_args()
+
+    sim = Esp32Simulator(args.host, args.port, None if args.udp_port < 0 else args.udp_port,
+                         response_delay=args.delay, jitter=args.jitter, loss=args.loss,
+                         loop_delay=args.loop_delay).start()
+    print(f"Simulador ESP32 en http://{sim.host}:{sim.port}"
+          + (f" (UDP {sim.udp_port})" if args.udp_port >= 0 else ""))
+    try:
+        while True:
+            time.sleep(5)
+            print(f"Estado: {sim.robot.status()} | {sim.stats()}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sim.stop()
+        if args.trace:
+            with open(args.trace, "w") as f:
+                for t, state, x, y, heading in sim.robot.history:
+                    f.write(json.dumps({"t": t, "estado": state, "x": x, "y": y, "heading": heading}) + "\n")
+        print(f"Simulador detenido: {sim.stats()}")
+
+
+if __name__ == "__main__":
+    main()
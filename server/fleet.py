@@ -0,0 +1,257 @@
+import argparse
+import json
+import threading
+import time
+from collections import deque
+
+from detections import empty_detections
+from inference_backend import load_backend
+from metrics import configure_logging
+from serverIA2 import WasteDetectionSystem
+
+
+class _Request:
+    __slots__ = ("robot_id", "frame", "confidence", "imgsz", "done", "result")
+
+    def __init__(self, robot_id, frame, confidence, imgsz):
+        self.robot_id = robot_id
+        self.frame = frame
+        self.confidence = confidence
+        self.imgsz = imgsz
+        self.done = threading.Event()
+        self.result = None
+
+
+class SharedInferenceEngine:
+    """
+    Un único modelo YOLO para toda la flota.
+
+    Cada robot tiene a lo sumo un frame pendiente. El hilo de inferencia arma lotes de hasta
+    `max_batch` frames con el mismo tamaño de entrada, tomando a los robots en turno rotativo
+    (round-robin): con más robots que lugares en el lote, los que quedaron afuera van primero
+    en el siguiente. Espera hasta `max_wait` segundos a que se llene el lote antes de inferir.
+    """
+
+    def __init__(self, backend, max_batch=4, max_wait=0.005):
+        """
+        Args:
+            backend: YoloBackend compartido
+            max_batch: frames máximos por lote
+            max_wait: espera máxima (segundos) para completar un lote
+        """
+        self.backend = backend
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+
+        self._cond = threading.Condition()
+        self._pending = {}       # robot_id -> _Request
+        self._turn = deque()     # orden rotativo de robots
+        self._thread = None
+        self.running = False
+
+        # Estadísticas
+        self.batches = 0
+        self.frames = 0
+        self.served = {}
+
+    def register(self, robot_id):
+        with self._cond:
+            if robot_id not in self.served:
+                self._turn.append(robot_id)
+                self.served[robot_id] = 0
+
+    def start(self):
+        self.running = True
+        self._thread = threading.Thread(target=self._loop, name="inferencia-flota", daemon=True)
+        self._thread.start()
+        return self
+
+    def detect(self, robot_id, frame, confidence_threshold, imgsz=None, timeout=5.0):
+        """Encola el frame del robot y espera sus detecciones (vacías si el motor se detiene)"""
+        request = _Request(robot_id, frame, confidence_threshold, imgsz)
+        with self._cond:
+            if not self.running:
+                return empty_detections()
+            self._pending[robot_id] = request
+            self._cond.notify_all()
+        if not request.done.wait(timeout):
+            with self._cond:
+                if self._pending.get(robot_id) is request:
+                    del self._pending[robot_id]
+            return empty_detections()
+        return request.result
+
+    def _next_batch(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self._pending or not self.running)
+            if not self.running:
+                return None
+            # Un poco de espera para juntar frames de otros robots
+            deadline = time.monotonic() + self.max_wait
+            while len(self._pending) < min(self.max_batch, len(self._turn)):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    break
+            batch = []
+            imgsz = None
+            for _ in range(len(self._turn)):
+                robot_id = self._turn[0]
+                self._turn.rotate(-1)
+                request = self._pending.get(robot_id)
+                if request is None:
+                    continue
+                if not batch:
+                    imgsz = request.imgsz
+                elif request.imgsz != imgsz:
+                    continue  # otro tamaño de entrada: va en el próximo lote
+                del self._pending[robot_id]
+                batch.append(request)
+                if len(batch) >= self.max_batch:
+                    break
+            return batch
+
+    def _loop(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                break
+            if not batch:
+                continue
+            confidence = min(r.confidence for r in batch)
+            try:
+                results = self.backend.detect_batch([r.frame for r in batch], confidence, batch[0].imgsz)
+            except Exception as e:
+                print(f"Error en inferencia de la flota: {e}")
+                results = [empty_detections()] * len(batch)
+            self.batches += 1
+            self.frames += len(batch)
+            for request, detections in zip(batch, results):
+                if request.confidence > confidence:
+                    detections = detections[detections['confidence'] > request.confidence]
+                request.result = detections
+                self.served[request.robot_id] += 1
+                request.done.set()
+
+    def stats(self):
+        return {
+            'max_batch': self.max_batch,
+            'batches': self.batches,
+            'frames': self.frames,
+            'avg_batch': round(self.frames / self.batches, 2) if self.batches else 0.0,
+            'served': dict(self.served),
+        }
+
+    def stop(self):
+        with self._cond:
+            self.running = False
+            pending = list(self._pending.values())
+            self._pending.clear()
+            self._cond.notify_all()
+        for request in pending:
+            request.result = empty_detections()
+            request.done.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+
+
+class EngineClient:
+    """Vista de SharedInferenceEngine para un robot, con la interfaz de YoloBackend que usa serverIA2"""
+
+    def __init__(self, engine, robot_id):
+        self.engine = engine
+        self.robot_id = robot_id
+        engine.register(robot_id)
+
+    @property
+    def names(self):
+        return self.engine.backend.names
+
+    @property
+    def dynamic_input(self):
+        return self.engine.backend.dynamic_input
+
+    def detect(self, frame, confidence_threshold, imgsz=None):
+        return self.engine.detect(self.robot_id, frame, confidence_threshold, imgsz)
+
+    def warmup(self, passes=2, frame_shape=(480, 640, 3)):
+        pass  # el motor compartido se calienta una sola vez
+
+
+class FleetServer:
+    """
+    Modo flota: un WasteDetectionSystem (serverIA2) por robot, cada uno con su propia captura,
+    tracker y control, y un único SharedInferenceEngine para todos.
+
+    Configuración (JSON), una entrada por par teléfono/ESP32:
+        [{"name": "robot1", "phone_ip": "192.168.0.101", "esp32_ip": "192.168.1.101"},
+         {"name": "robot2", "phone_ip": "192.168.0.102", "esp32_ip": "192.168.1.102",
+          "transport": "udp", "debug_port": 8091}]
+    Las claves aparte de "name" son argumentos de WasteDetectionSystem.
+    """
+
+    def __init__(self, robots, runtime="auto", precision="fp32", max_batch=4, max_wait=0.005,
+                 warmup_passes=2):
+        print("Cargando modelo YOLO compartido...")
+        max_batch = min(max_batch, len(robots))
+        # Los modelos exportados con lote fijo de 1 no arman lotes: se exportan con lote dinámico
+        # y con una variante por cada resolución de búsqueda de la ROI (320 por defecto en serverIA2)
+        search_sizes = {config.get("search_imgsz", 320) for config in robots}
+        self.backend = load_backend('last.pt', runtime=runtime, precision=precision,
+                                    dynamic_batch=max_batch > 1, extra_imgsz=search_sizes)
+        self.backend.warmup(warmup_passes)
+        if not self.backend.batched:
+            print("El modelo no admite lotes: los frames de la flota se infieren de a uno")
+            max_batch = 1
+        print(f"Lote efectivo del motor compartido: {max_batch}")
+        self.engine = SharedInferenceEngine(self.backend, max_batch=max_batch, max_wait=max_wait)
+        self.systems = {}
+        for i, config in enumerate(robots):
+            config = dict(config)
+            name = config.pop("name", f"robot{i + 1}")
+            # Sin ventanas: cv2.imshow sólo funciona desde el hilo principal
+            config["headless"] = True
+            self.systems[name] = WasteDetectionSystem(backend=EngineClient(self.engine, name), **config)
+        self._threads = []
+
+    def run(self):
+        self.engine.start()
+        for name, system in self.systems.items():
+            thread = threading.Thread(target=system.run, name=f"robot-{name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"Flota iniciada: {', '.join(self.systems)}")
+        try:
+            while any(thread.is_alive() for thread in self._threads):
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            print("Deteniendo flota...")
+        finally:
+            self.stop()
+
+    def stop(self):
+        for system in self.systems.values():
+            system.running = False
+        for thread in self._threads:
+            thread.join(timeout=5.0)
+        self.engine.stop()
+        print(f"Motor compartido: {self.engine.stats()}")
+
+
+def main():
+    configure_logging()
+    parser = argparse.ArgumentParser(description="Varios robots con un único modelo compartido")
+    parser.add_argument("config", help="JSON con la lista de robots (ver FleetServer)")
+    parser.add_argument("--runtime", default="auto")
+    parser.add_argument("--precision", default="fp32", choices=("fp32", "fp16", "int8"))
+    parser.add_argument("--max-batch", type=int, default=4)
+    parser.add_argument("--max-wait", type=float, default=0.005, help="espera máxima para llenar un lote (s)")
+    args = parser.parse_args()
+
+    with open(args.config) as f:
+        robots = json.load(f)
+    FleetServer(robots, runtime=args.runtime, precision=args.precision,
+                max_batch=args.max_batch, max_wait=args.max_wait).run()
+
+
+if __name__ == "__main__":
+    main()
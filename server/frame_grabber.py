@@ -0,0 +1,126 @@
+import threading
+import time
+
+
+class LatestFrameGrabber:
+    """
+    Lee frames de un stream de video en un hilo propio y conserva sólo el más reciente.
+
+    El bucle de detección llama a read() y siempre recibe el último frame decodificado;
+    los frames que llegaron mientras se procesaba el anterior se descartan (drop-oldest)
+    y se cuentan en frames_dropped.
+    """
+
+    def __init__(self, cap, max_failures=30, name="captura-video", drop_frames=True, recorder=None,
+                 metrics=None):
+        """
+        Args:
+            cap: objeto con read()/release() (por ejemplo cv2.VideoCapture o ReplaySource)
+            max_failures: lecturas fallidas consecutivas antes de dar el stream por terminado
+            name: nombre del hilo de captura
+            drop_frames: si es False, la captura espera a que se consuma cada frame
+                (reproducciones deterministas sin descartes)
+            recorder: FrameRecorder opcional que graba cada frame capturado
+            metrics: Metrics opcional; mide cada cap.read() en la etapa "read"
+        """
+        self.cap = cap
+        self.max_failures = max_failures
+        self.name = name
+        self.drop_frames = drop_frames
+        self.recorder = recorder
+        # Índice (desde 0) del último frame entregado por read(); si la fuente tiene su propio
+        # frame_index (ReplaySource) se usa ése, para coincidir con los eventos grabados
+        self.frame_index = -1
+        self.frame_time = None  # time.monotonic() de captura del último frame entregado por read()
+        self._read_histogram = metrics.stage("read") if metrics is not None else None
+
+        self._cond = threading.Condition()
+        self._frame = None
+        self._frame_time = None
+        self._source_index = None
+        self._frame_id = 0
+        self._consumed_id = 0
+        self._thread = None
+
+        # Estadísticas
+        self.frames_captured = 0
+        self.frames_consumed = 0
+        self.frames_dropped = 0
+        self.read_failures = 0
+
+        self.running = False
+
+    def start(self):
+        """Inicia el hilo de captura"""
+        self.running = True
+        self._thread = threading.Thread(target=self._capture_loop, name=self.name, daemon=True)
+        self._thread.start()
+        return self
+
+    def _capture_loop(self):
+        consecutive_failures = 0
+        while self.running:
+            start = time.perf_counter()
+            ret, frame = self.cap.read()
+            captured_at = time.monotonic()
+            if self._read_histogram is not None:
+                self._read_histogram.observe(time.perf_counter() - start)
+            if not ret:
+                consecutive_failures += 1
+                self.read_failures += 1
+                if consecutive_failures >= self.max_failures:
+                    print("Error leyendo frame: stream terminado")
+                    break
+                continue
+            consecutive_failures = 0
+            source_index = getattr(self.cap, "frame_index", None)
+            if self.recorder is not None:
+                self.recorder.write_frame(frame)
+            with self._cond:
+                if not self.drop_frames:
+                    self._cond.wait_for(lambda: self._consumed_id == self._frame_id or not self.running)
+                self._frame = frame
+                self._frame_time = captured_at
+                self._source_index = source_index
+                self._frame_id += 1
+                self.frames_captured += 1
+                self._cond.notify_all()
+        with self._cond:
+            self.running = False
+            self._cond.notify_all()
+
+    def read(self, timeout=2.0):
+        """
+        Devuelve (ret, frame) con el frame más reciente que aún no se ha consumido.
+        Espera hasta `timeout` segundos si todavía no llegó un frame nuevo.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._frame_id != self._consumed_id or not self.running, timeout)
+            if self._frame_id == self._consumed_id:
+                return False, None
+            self.frames_dropped += self._frame_id - self._consumed_id - 1
+            self._consumed_id = self._frame_id
+            self.frame_index = self._frame_id - 1 if self._source_index is None else self._source_index
+            self.frame_time = self._frame_time
+            self.frames_consumed += 1
+            self._cond.notify_all()
+            return True, self._frame
+
+    def stats(self):
+        """Contadores de captura"""
+        with self._cond:
+            return {
+                'captured': self.frames_captured,
+                'consumed': self.frames_consumed,
+                'dropped': self.frames_dropped,
+                'read_failures': self.read_failures,
+            }
+
+    def stop(self):
+        """Detiene el hilo de captura y libera el stream"""
+        with self._cond:
+            self.running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+        self.cap.release()
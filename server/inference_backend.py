@@ -0,0 +1,299 @@
+import argparse
+import hashlib
+import importlib.util
+import os
+import shutil
+
+import cv2
+import numpy as np
+
+from detections import detection_boxes, detections_from_results, iou_matrix
+
+# Directorio donde se guardan los modelos exportados (se reutilizan entre ejecuciones)
+MODEL_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_cache")
+
+# Orden de preferencia en CPU, del más rápido al más lento
+RUNTIME_PREFERENCE = ("openvino", "onnx", "torch")
+
+# Precisiones soportadas por cada runtime
+SUPPORTED_PRECISIONS = {
+    "torch": {"fp32"},
+    "onnx": {"fp32", "int8"},
+    "openvino": {"fp32", "fp16", "int8"},
+}
+
+# Módulo de Python que necesita cada runtime para ejecutar el modelo exportado
+RUNTIME_MODULES = {
+    "torch": "torch",
+    "onnx": "onnxruntime",
+    "openvino": "openvino",
+}
+
+
+def _yolo(path, **kwargs):
+    # ultralytics (y torch) se importan sólo cuando hace falta: tardan segundos en cargar
+    from ultralytics import YOLO
+    return YOLO(path, **kwargs)
+
+
+def available_runtimes():
+    """Runtimes instalados, en orden de preferencia"""
+    return [r for r in RUNTIME_PREFERENCE if importlib.util.find_spec(RUNTIME_MODULES[r]) is not None]
+
+
+def _weights_digest(weights):
+    sha = hashlib.sha1()
+    with open(weights, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha.update(chunk)
+    return sha.hexdigest()[:12]
+
+
+def cached_model_path(weights, runtime, precision, imgsz, cache_dir=MODEL_CACHE_DIR, dynamic=False):
+    """
+    Ruta del artefacto exportado en la caché. Incluye un hash de los pesos para que
+    un last.pt reentrenado no reutilice una exportación vieja.
+    """
+    stem = os.path.splitext(os.path.basename(weights))[0]
+    name = f"{stem}-{_weights_digest(weights)}-{runtime}-{precision}-{imgsz}"
+    if dynamic:
+        name += "-dynamic"
+    if runtime == "onnx":
+        return os.path.join(cache_dir, name + ".onnx")
+    return os.path.join(cache_dir, name + "_openvino_model")
+
+
+def export_model(weights, runtime, precision="fp32", imgsz=640, cache_dir=MODEL_CACHE_DIR, data=None,
+                 dynamic=False):
+    """
+    Exporta `weights` a ONNX u OpenVINO y lo guarda en la caché; si ya existe no se vuelve a exportar.
+
+    Args:
+        weights: ruta del modelo PyTorch (.pt)
+        runtime: 'onnx' u 'openvino'
+        precision: 'fp32', 'fp16' o 'int8'
+        imgsz: tamaño de entrada del modelo exportado
+        cache_dir: directorio de la caché
+        data: yaml del dataset para calibrar INT8 en OpenVINO (opcional)
+        dynamic: exportar con lote dinámico (para detect_batch); si no, el lote es fijo de 1
+    Returns:
+        ruta del modelo exportado
+    """
+    if precision not in SUPPORTED_PRECISIONS[runtime]:
+        raise ValueError(f"El runtime {runtime} no soporta precisión {precision}")
+    target = cached_model_path(weights, runtime, precision, imgsz, cache_dir, dynamic)
+    if os.path.exists(target):
+        return target
+
+    os.makedirs(cache_dir, exist_ok=True)
+    print(f"Exportando {weights} a {runtime} ({precision})...")
+    model = _yolo(weights)
+    if runtime == "onnx":
+        exported = model.export(format="onnx", imgsz=imgsz, simplify=True, dynamic=dynamic)
+        if precision == "int8":
+            # Ultralytics no cuantiza ONNX; se usa cuantización dinámica de onnxruntime
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            quantize_dynamic(exported, target, weight_type=QuantType.QUInt8)
+            os.remove(exported)
+            return target
+    else:
+        kwargs = {"format": "openvino", "imgsz": imgsz,
+                  "half": precision == "fp16", "int8": precision == "int8", "dynamic": dynamic}
+        if data is not None:
+            kwargs["data"] = data
+        exported = model.export(**kwargs)
+    shutil.move(exported, target)
+    return target
+
+
+class YoloBackend:
+    """
+    Motor de inferencia detrás de WasteDetectionSystem.detect_waste.
+
+    Envuelve un modelo YOLO en PyTorch, ONNX u OpenVINO y siempre devuelve el mismo
+    arreglo de detecciones (ver detections.DETECTION_DTYPE), así el resto del
+    pipeline no depende del runtime.
+
+    Los modelos exportados tienen tamaño de entrada fijo: para inferir a otro tamaño
+    (p. ej. la resolución de búsqueda de AdaptiveRoi) hace falta una variante exportada
+    a ese tamaño en `variants` ({imgsz: ruta}); sin ella se usa `imgsz` y se avisa una vez.
+    """
+
+    def __init__(self, model_path, runtime="torch", precision="fp32", imgsz=640, dynamic_batch=False,
+                 variants=None):
+        self.model_path = model_path
+        self.runtime = runtime
+        self.precision = precision
+        self.imgsz = imgsz
+        self.dynamic_batch = dynamic_batch
+        self.model = _yolo(model_path, task="detect")
+        self.variants = {size: _yolo(path, task="detect") for size, path in (variants or {}).items()}
+        self._ignored_imgsz = set()
+
+    @property
+    def names(self):
+        return self.model.names
+
+    @property
+    def dynamic_input(self):
+        """Los modelos exportados tienen tamaño de entrada fijo; PyTorch acepta cualquiera"""
+        return self.runtime == "torch"
+
+    @property
+    def batched(self):
+        """True si detect_batch infiere el lote completo en una sola llamada"""
+        return self.runtime == "torch" or self.dynamic_batch
+
+    def predict(self, frame, confidence_threshold, imgsz=None):
+        """Resultados crudos de ultralytics"""
+        model = self.model
+        if imgsz is None or imgsz == self.imgsz:
+            imgsz = self.imgsz
+        elif imgsz in self.variants:
+            model = self.variants[imgsz]
+        elif not self.dynamic_input:
+            if imgsz not in self._ignored_imgsz:
+                self._ignored_imgsz.add(imgsz)
+                print(f"Aviso: {self} no tiene variante de {imgsz} px; se infiere a {self.imgsz}")
+            imgsz = self.imgsz
+        return model(frame, conf=confidence_threshold, imgsz=imgsz, verbose=False)
+
+    def detect(self, frame, confidence_threshold, imgsz=None):
+        """Detecciones como arreglo estructurado"""
+        return detections_from_results(self.predict(frame, confidence_threshold, imgsz), confidence_threshold)
+
+    def detect_batch(self, frames, confidence_threshold, imgsz=None):
+        """
+        Detecciones de varios frames, una por frame. PyTorch y los modelos exportados con
+        lote dinámico los procesan en un solo lote; los exportados con lote fijo de 1 se
+        recorren de a uno.
+        """
+        if not self.batched:
+            return [self.detect(frame, confidence_threshold) for frame in frames]
+        results = self.predict(list(frames), confidence_threshold, imgsz)
+        return [detections_from_results([result], confidence_threshold) for result in results]
+
+    def warmup(self, passes=2, frame_shape=(480, 640, 3)):
+        """
+        Ejecuta `passes` inferencias sobre un frame negro para pagar la inicialización perezosa
+        (reserva de memoria, compilación del grafo) antes de recibir frames reales.
+        """
+        dummy = np.zeros(frame_shape, dtype=np.uint8)
+        for _ in range(passes):
+            self.predict(dummy, 0.99)
+            for size in self.variants:
+                self.predict(dummy, 0.99, size)
+
+    def __repr__(self):
+        batch = ", lote dinámico" if self.dynamic_batch else ""
+        sizes = f", variantes {sorted(self.variants)}" if self.variants else ""
+        return f"YoloBackend({self.runtime}, {self.precision}{batch}{sizes}, {self.model_path})"
+
+
+def load_backend(weights="last.pt", runtime="auto", precision="fp32", imgsz=640,
+                 cache_dir=MODEL_CACHE_DIR, dynamic_batch=False, extra_imgsz=()):
+    """
+    Carga el backend de inferencia.
+
+    Con runtime='auto' se usa el runtime más rápido disponible (OpenVINO > ONNX > PyTorch)
+    que soporte la precisión pedida. Si la exportación falla se vuelve a PyTorch.
+    Con dynamic_batch=True el modelo se exporta con lote dinámico, para quien use detect_batch.
+    `extra_imgsz` son otros tamaños de entrada que se van a pedir (p. ej. search_imgsz de
+    AdaptiveRoi): con un runtime exportado se exporta también una variante a cada tamaño.
+    """
+    if runtime == "auto":
+        candidates = [r for r in available_runtimes() if precision in SUPPORTED_PRECISIONS[r]]
+    else:
+        candidates = [runtime]
+    for candidate in candidates:
+        if candidate == "torch":
+            break
+        try:
+            path = export_model(weights, candidate, precision, imgsz, cache_dir, dynamic=dynamic_batch)
+            variants = {}
+            for size in set(extra_imgsz) - {imgsz}:
+                try:
+                    variants[size] = export_model(weights, candidate, precision, size, cache_dir,
+                                                  dynamic=dynamic_batch)
+                except Exception as e:
+                    print(f"No se pudo exportar la variante de {size} px: {e}")
+            backend = YoloBackend(path, candidate, precision, imgsz, dynamic_batch, variants)
+            print(f"Backend de inferencia: {backend}")
+            return backend
+        except Exception as e:
+            print(f"No se pudo usar {candidate} ({precision}): {e}")
+    backend = YoloBackend(weights, "torch", "fp32", imgsz)
+    print(f"Backend de inferencia: {backend}")
+    return backend
+
+
+def parity_check(reference, candidate, frames, confidence_threshold=0.3, iou_threshold=0.5):
+    """
+    Compara las detecciones de `candidate` contra las de `reference` (normalmente PyTorch).
+
+    Cada detección de referencia se empareja con la de mayor IoU de la misma clase.
+    Returns:
+        dict con detecciones totales, emparejadas, IoU medio y diferencia máxima de confianza
+    """
+    total = matched = 0
+    ious = []
+    max_conf_diff = 0.0
+    extra = 0
+    for frame in frames:
+        ref = reference.detect(frame, confidence_threshold)
+        cand = candidate.detect(frame, confidence_threshold)
+        total += len(ref)
+        extra += max(0, len(cand) - len(ref))
+        if len(ref) == 0 or len(cand) == 0:
+            continue
+        iou = iou_matrix(detection_boxes(ref), detection_boxes(cand))
+        iou[ref['class_id'][:, None] != cand['class_id'][None, :]] = 0
+        best = iou.argmax(axis=1)
+        best_iou = iou[np.arange(len(ref)), best]
+        ok = best_iou >= iou_threshold
+        matched += int(ok.sum())
+        ious.extend(best_iou[ok].tolist())
+        if ok.any():
+            conf_diff = np.abs(ref['confidence'][ok] - cand['confidence'][best[ok]])
+            max_conf_diff = max(max_conf_diff, float(conf_diff.max()))
+    return {
+        'reference_detections': total,
+        'matched': matched,
+        'recall': round(matched / total, 3) if total else 1.0,
+        'extra_detections': extra,
+        'mean_iou': round(float(np.mean(ious)), 3) if ious else None,
+        'max_confidence_diff': round(max_conf_diff, 3),
+    }
+
+
+def _read_frames(source, limit):
+    cap = cv2.VideoCapture(source)
+    frames = []
+    while len(frames) < limit:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta last.pt y verifica paridad contra PyTorch")
+    parser.add_argument("--weights", default="last.pt")
+    parser.add_argument("--runtime", default="auto", choices=("auto",) + RUNTIME_PREFERENCE)
+    parser.add_argument("--precision", default="fp32", choices=("fp32", "fp16", "int8"))
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--video", help="video o imagen para la prueba de paridad")
+    parser.add_argument("--frames", type=int, default=50)
+    args = parser.parse_args()
+
+    backend = load_backend(args.weights, args.runtime, args.precision, args.imgsz)
+    if args.video and backend.runtime != "torch":
+        reference = YoloBackend(args.weights, "torch", "fp32", args.imgsz)
+        frames = _read_frames(args.video, args.frames)
+        print(f"Paridad ({len(frames)} frames): {parity_check(reference, backend, frames)}")
+
+
+if __name__ == "__main__":
+    main()
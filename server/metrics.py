@@ -0,0 +1,291 @@
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Límites superiores (segundos) de los buckets de latencia
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+logger = logging.getLogger("ecobot.metrics")
+
+
+def configure_logging(level="INFO"):
+    """Logging de los servidores: nivel por argumento o variable ECOBOT_LOG_LEVEL (DEBUG muestra cada frame)"""
+    level = os.environ.get("ECOBOT_LOG_LEVEL", level).upper()
+    logging.basicConfig(level=level, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+
+class Histogram:
+    """Histograma de buckets fijos: observe() es una búsqueda binaria y dos sumas"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # el último es +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        return _Timer(self)
+
+    def quantile(self, q):
+        """Cuantil aproximado por interpolación lineal dentro del bucket"""
+        with self._lock:
+            counts, total = list(self.counts), self.count
+        if not total:
+            return None
+        rank = q * total
+        cumulative = 0
+        for i, count in enumerate(counts):
+            if cumulative + count >= rank and count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Metrics:
+    """
+    Registro de métricas del proceso: latencia por etapa (histogramas con la etiqueta `stage`),
+    contadores, y colectores que leen estadísticas existentes (grabber, colas, envío) al exportar.
+    """
+
+    def __init__(self, prefix="ecobot"):
+        self.prefix = prefix
+        self.stages = {}
+        self.histograms = {}
+        self.counters = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def stage(self, name):
+        """Histograma de latencia de la etapa `name` (ecobot_stage_seconds{stage="name"})"""
+        histogram = self.stages.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.stages.setdefault(name, Histogram())
+        return histogram
+
+    def time(self, stage):
+        """Context manager que mide la duración del bloque en la etapa `stage`"""
+        return _Timer(self.stage(stage))
+
+    def timed(self, stage, fn):
+        """Devuelve `fn` envuelta para medir cada llamada en la etapa `stage`"""
+        histogram = self.stage(stage)
+
+        def wrapper(*args, **kwargs):
+            with _Timer(histogram):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    def histogram(self, name, buckets=LATENCY_BUCKETS):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(name, Histogram(buckets))
+        return histogram
+
+    def counter(self, name):
+        counter = self.counters.get(name)
+        if counter is None:
+            with self._lock:
+                counter = self.counters.setdefault(name, Counter())
+        return counter
+
+    def add_collector(self, collector):
+        """`collector()` devuelve {nombre: valor}; los nombres terminados en _total se exportan como counter"""
+        self._collectors.append(collector)
+
+    def collect(self):
+        values = {name: counter.value for name, counter in self.counters.items()}
+        for collector in self._collectors:
+            try:
+                values.update(collector())
+            except Exception as e:
+                logger.debug("Colector de métricas falló: %s", e)
+        return values
+
+    def render(self):
+        """Métricas en formato de texto de Prometheus"""
+        lines = []
+
+        def histogram_lines(name, histogram, labels=""):
+            with histogram._lock:
+                counts, total, sum_ = list(histogram.counts), histogram.count, histogram.sum
+            cumulative = 0
+            sep = "," if labels else ""
+            for bound, count in zip(histogram.buckets, counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{labels}{sep}le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{labels}{sep}le="+Inf"}} {total}')
+            suffix = f"{{{labels}}}" if labels else ""
+            lines.append(f"{name}_sum{suffix} {sum_}")
+            lines.append(f"{name}_count{suffix} {total}")
+
+        if self.stages:
+            name = f"{self.prefix}_stage_seconds"
+            lines.append(f"# TYPE {name} histogram")
+            for stage, histogram in sorted(self.stages.items()):
+                histogram_lines(name, histogram, f'stage="{stage}"')
+        for key, histogram in sorted(self.histograms.items()):
+            name = f"{self.prefix}_{key}"
+            lines.append(f"# TYPE {name} histogram")
+            histogram_lines(name, histogram)
+        for key, value in sorted(self.collect().items()):
+            if value is None:
+                continue
+            name = f"{self.prefix}_{key}"
+            lines.append(f"# TYPE {name} {'counter' if key.endswith('_total') else 'gauge'}")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """Resumen compacto (p50/p95 en ms por etapa, contadores y gauges) para el log periódico"""
+        def summary(histogram):
+            p50, p95 = histogram.quantile(0.5), histogram.quantile(0.95)
+            return {'n': histogram.count,
+                    'p50_ms': round(p50 * 1000, 2) if p50 is not None else None,
+                    'p95_ms': round(p95 * 1000, 2) if p95 is not None else None}
+
+        snapshot = {stage: summary(h) for stage, h in sorted(self.stages.items())}
+        snapshot.update({key: summary(h) for key, h in sorted(self.histograms.items())})
+        snapshot.update(self.collect())
+        return snapshot
+
+
+class MetricsServer:
+    """
+    Endpoint local de métricas estilo Prometheus en http://<host>:<port>/metrics.
+    Con un SamplingProfiler, /profile?seconds=N corre un perfil de N segundos y responde
+    con el informe JSON (que incluye la ruta del archivo .folded).
+    """
+
+    def __init__(self, metrics, host="127.0.0.1", port=9100, profiler=None):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self.profiler = profiler
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        metrics = self.metrics
+        profiler = self.profiler
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlsplit(self.path)
+                if url.path == "/profile" and profiler is not None:
+                    self._profile(parse_qs(url.query))
+                    return
+                if url.path != "/metrics":
+                    self.send_error(404, "Usar /metrics")
+                    return
+                self._reply(metrics.render().encode(), "text/plain; version=0.0.4")
+
+            def _profile(self, query):
+                try:
+                    seconds = min(float(query.get("seconds", ["10"])[0]), 300.0)
+                except ValueError:
+                    self.send_error(400, "seconds inválido")
+                    return
+                report = profiler.profile(seconds)
+                if report is None:
+                    self.send_error(409, "Ya hay un perfil en curso")
+                    return
+                self._reply(json.dumps(report, indent=2).encode(), "application/json")
+
+            def _reply(self, body, content_type):
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metricas", daemon=True)
+        self._thread.start()
+        logger.info("Métricas en http://%s:%d/metrics", self.host, self.port)
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+class PeriodicMetricsLog:
+    """
+    Escribe cada `interval` segundos una línea JSON con el resumen de métricas y los FPS
+    de inferencia, calculados sobre el contador `frames_counter` desde la línea anterior.
+    """
+
+    def __init__(self, metrics, interval=10.0, frames_counter="frames_processed_total"):
+        self.metrics = metrics
+        self.interval = interval
+        self.frames_counter = frames_counter
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="log-metricas", daemon=True)
+        self._thread.start()
+        return self
+
+    def _loop(self):
+        last_frames = self.metrics.counter(self.frames_counter).value
+        last_time = time.monotonic()
+        while not self._stop.wait(self.interval):
+            now = time.monotonic()
+            snapshot = self.metrics.snapshot()
+            frames = snapshot.get(self.frames_counter, 0)
+            snapshot['fps'] = round((frames - last_frames) / (now - last_time), 2)
+            last_frames, last_time = frames, now
+            logger.info("metrics %s", json.dumps(snapshot, separators=(",", ":")))
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
@@ -0,0 +1,296 @@
+import select
+import socket
+import time
+from urllib.parse import urlsplit
+
+import cv2
+import numpy as np
+
+try:
+    # libjpeg-turbo directo (opcional): decodificación escalada sin pasar por cv2
+    from turbojpeg import TJPF_BGR, TurboJPEG
+except ImportError:
+    TurboJPEG = None
+
+# Factor de reducción -> flag de cv2.imdecode (el DCT de libjpeg decodifica directo al tamaño reducido)
+REDUCED_DECODE_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+RECV_SIZE = 65536
+
+
+class JpegDecoder:
+    """Decodifica JPEG a BGR a 1/scale del tamaño original (PyTurboJPEG si está instalado, si no cv2)"""
+
+    def __init__(self, use_turbojpeg=True):
+        self.turbo = None
+        if use_turbojpeg and TurboJPEG is not None:
+            try:
+                self.turbo = TurboJPEG()
+            except Exception:
+                self.turbo = None  # el paquete está pero falta la librería nativa
+
+    @property
+    def name(self):
+        return "turbojpeg" if self.turbo is not None else "opencv"
+
+    def decode(self, data, scale=1):
+        if self.turbo is not None:
+            try:
+                return self.turbo.decode(data, pixel_format=TJPF_BGR, scaling_factor=(1, scale))
+            except Exception:
+                return None
+        return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), REDUCED_DECODE_FLAGS[scale])
+
+
+class MjpegStream:
+    """
+    Cliente multipart-MJPEG (IP Webcam /video) sobre una conexión HTTP persistente, con la
+    interfaz de cv2.VideoCapture que usan los servidores (isOpened/read/set/get/release).
+
+    - Cada read() decodifica sólo la parte más reciente ya recibida: las partes completas
+      que quedaron en el buffer detrás de ella se descartan sin decodificar (stale_skipped).
+    - set(CAP_PROP_FRAME_WIDTH) elige la mayor reducción 1/2, 1/4 u 1/8 que no quede por debajo
+      de ese ancho, y el JPEG se decodifica directo a ese tamaño (sin decodificar completo y
+      luego cv2.resize). El alto puede quedar distinto al pedido si el aspecto de la cámara difiere.
+    - Si la conexión se cae, el siguiente read() reconecta (como mucho una vez cada
+      `reconnect_delay` segundos) y devuelve (False, None) mientras tanto.
+    """
+
+    def __init__(self, url, scale=None, timeout=5.0, reconnect_delay=1.0, use_turbojpeg=True,
+                 max_buffer=8 * 1024 * 1024):
+        """
+        Args:
+            url: URL http:// del stream MJPEG
+            scale: reducción fija (1, 2, 4 u 8); None la elige según set(CAP_PROP_FRAME_WIDTH)
+            timeout: segundos máximos esperando datos antes de dar la conexión por caída
+            reconnect_delay: espera mínima entre intentos de reconexión
+            use_turbojpeg: usar PyTurboJPEG si está instalado
+            max_buffer: bytes máximos sin encontrar una parte completa antes de reconectar
+        """
+        parts = urlsplit(url)
+        self.url = url
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        self.scale = scale
+        self.timeout = timeout
+        self.reconnect_delay = reconnect_delay
+        self.max_buffer = max_buffer
+        self.decoder = JpegDecoder(use_turbojpeg)
+
+        self.target_width = None
+        self.frame_size = None  # (ancho, alto) del último frame decodificado
+        self._decoded_scale = None
+        self._sock = None
+        self._buffer = bytearray()
+        self._boundary = None
+        self._last_attempt = 0.0
+        self._released = False
+
+        # Estadísticas
+        self.parts = 0
+        self.frames_decoded = 0
+        self.stale_skipped = 0
+        self.decode_failures = 0
+        self.reconnects = 0
+        self.bytes_received = 0
+
+        self._connect()
+
+    def _connect(self):
+        self._close_socket()
+        self._last_attempt = time.monotonic()
+        try:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            # HTTP/1.0: sin transfer-encoding chunked, el cuerpo es el multipart tal cual
+            request = f"GET {self.path} HTTP/1.0\r\nHost: {self.host}\r\nUser-Agent: ecobot\r\n\r\n"
+            sock.sendall(request.encode())
+            buffer = bytearray()
+            while b"\r\n\r\n" not in buffer:
+                chunk = sock.recv(4096)
+                if not chunk or len(buffer) > 65536:
+                    raise ConnectionError("respuesta HTTP incompleta")
+                buffer += chunk
+            head, _, rest = bytes(buffer).partition(b"\r\n\r\n")
+            lines = head.decode("latin-1").split("\r\n")
+            status = lines[0].split()
+            if len(status) < 2 or status[1] != "200":
+                raise ConnectionError(f"respuesta HTTP {lines[0]!r}")
+            boundary = None
+            for line in lines[1:]:
+                name, _, value = line.partition(":")
+                if name.strip().lower() == "content-type":
+                    for param in value.split(";"):
+                        key, _, val = param.strip().partition("=")
+                        if key.lower() == "boundary":
+                            boundary = val.strip().strip('"')
+            if not boundary:
+                raise ConnectionError("el stream no es multipart")
+            # Algunos servidores declaran el boundary con los "--" incluidos
+            self._boundary = boundary.lstrip("-").encode("latin-1")
+            self._buffer = bytearray(rest)
+            self._sock = sock
+            return True
+        except OSError as e:
+            print(f"Error conectando al stream MJPEG {self.url}: {e}")
+            return False
+
+    def _close_socket(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+
+    def _next_part(self):
+        """Extrae la próxima parte completa del buffer (bytes del JPEG) o None si falta recibir"""
+        buffer = self._buffer
+        start = buffer.find(self._boundary)
+        if start < 0:
+            # Nada útil todavía: conservar sólo lo que podría ser el comienzo de un boundary
+            if len(buffer) > len(self._boundary):
+                del buffer[:len(buffer) - len(self._boundary)]
+            return None
+        headers_end = buffer.find(b"\r\n\r\n", start)
+        if headers_end < 0:
+            return None
+        length = None
+        for line in bytes(buffer[start:headers_end]).split(b"\r\n")[1:]:
+            name, _, value = line.partition(b":")
+            if name.strip().lower() == b"content-length":
+                try:
+                    length = int(value)
+                except ValueError:
+                    pass
+        body_start = headers_end + 4
+        if length is not None:
+            end = body_start + length
+            if len(buffer) < end:
+                return None
+            data = bytes(buffer[body_start:end])
+            del buffer[:end]
+        else:
+            # Sin Content-Length: la parte termina donde empieza el siguiente boundary
+            end = buffer.find(self._boundary, body_start)
+            if end < 0:
+                return None
+            data = bytes(buffer[body_start:end]).rstrip(b"-").rstrip(b"\r\n")
+            del buffer[:end]
+        self.parts += 1
+        return data
+
+    def _receive(self, wait):
+        """Agrega al buffer lo recibido; con wait=False sólo lo que ya llegó al socket"""
+        if not wait and not select.select([self._sock], [], [], 0)[0]:
+            return False
+        chunk = self._sock.recv(RECV_SIZE)
+        if not chunk:
+            raise ConnectionError("el servidor cerró el stream")
+        self._buffer += chunk
+        self.bytes_received += len(chunk)
+        if len(self._buffer) > self.max_buffer:
+            raise ConnectionError("parte MJPEG demasiado grande o boundary perdido")
+        return True
+
+    def _latest_part(self):
+        data = self._next_part()
+        while data is None:
+            self._receive(wait=True)
+            data = self._next_part()
+        # Vaciar lo que ya llegó y quedarse con la parte completa más nueva
+        while self._receive(wait=False):
+            pass
+        while True:
+            newer = self._next_part()
+            if newer is None:
+                return data
+            self.stale_skipped += 1
+            data = newer
+
+    def _choose_scale(self):
+        if self.scale is not None:
+            return self.scale
+        if not self.target_width:
+            return 1
+        if self.frame_size is None:
+            # El primer frame se decodifica completo para conocer la resolución de la cámara
+            return 1
+        full_width = self.frame_size[0] * self._decoded_scale
+        scale = 1
+        for candidate in (2, 4, 8):
+            if full_width // candidate >= self.target_width:
+                scale = candidate
+        return scale
+
+    def isOpened(self):
+        return self._sock is not None
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            self.target_width = int(value)
+            return True
+        return False
+
+    def get(self, prop):
+        if self.frame_size is not None:
+            if prop == cv2.CAP_PROP_FRAME_WIDTH:
+                return float(self.frame_size[0])
+            if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+                return float(self.frame_size[1])
+        return 0.0
+
+    def read(self):
+        if self._released:
+            return False, None
+        if self._sock is None:
+            wait = self.reconnect_delay - (time.monotonic() - self._last_attempt)
+            if wait > 0:
+                time.sleep(wait)
+            if not self._connect():
+                return False, None
+            self.reconnects += 1
+            print(f"Stream MJPEG reconectado ({self.reconnects})")
+        try:
+            data = self._latest_part()
+        except (OSError, ConnectionError) as e:
+            print(f"Stream MJPEG interrumpido: {e}")
+            self._close_socket()
+            return False, None
+        scale = self._choose_scale()
+        frame = self.decoder.decode(data, scale)
+        if frame is None:
+            self.decode_failures += 1
+            return False, None
+        self._decoded_scale = scale
+        self.frame_size = (frame.shape[1], frame.shape[0])
+        self.frames_decoded += 1
+        return True, frame
+
+    def release(self):
+        self._released = True
+        self._close_socket()
+
+    def stats(self):
+        return {
+            'decoder': self.decoder.name,
+            'scale': self._decoded_scale,
+            'parts': self.parts,
+            'decoded': self.frames_decoded,
+            'stale_skipped': self.stale_skipped,
+            'decode_failures': self.decode_failures,
+            'reconnects': self.reconnects,
+        }
+
+
+def open_stream(url, client="mjpeg"):
+    """Fuente de frames para el stream en vivo: MjpegStream o cv2.VideoCapture (FFmpeg) con client="opencv" """
+    if client == "mjpeg":
+        return MjpegStream(url)
+    return cv2.VideoCapture(url)
@@ -0,0 +1,77 @@
+import cv2
+
+
+class SceneChangeGate:
+    """
+    Filtro barato de cambio de escena delante del detector.
+
+    Compara una miniatura en escala de grises del frame con la del último frame que
+    sí pasó por el detector; si la diferencia media es menor que `threshold` la escena
+    se considera igual y se reutilizan las detecciones anteriores.
+    """
+
+    def __init__(self, threshold=6.0, size=(64, 48), max_skip=30):
+        """
+        Args:
+            threshold: diferencia absoluta media (0-255) a partir de la cual hay cambio de escena
+            size: tamaño de la miniatura usada para comparar (ancho, alto)
+            max_skip: frames seguidos que se pueden saltar antes de forzar una inferencia
+        """
+        self.threshold = threshold
+        self.size = size
+        self.max_skip = max_skip
+        self._reference = None
+        self._skipped = 0
+
+        # Estadísticas
+        self.hits = 0    # frames que reutilizaron detecciones
+        self.misses = 0  # frames que pasaron al detector
+        self.last_score = 0.0
+
+    def _thumbnail(self, frame):
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return small
+
+    def changed(self, frame):
+        """True si el frame debe pasar por el detector"""
+        thumb = self._thumbnail(frame)
+        if self._reference is not None and self._skipped < self.max_skip:
+            self.last_score = float(cv2.absdiff(thumb, self._reference).mean())
+            if self.last_score < self.threshold:
+                self._skipped += 1
+                self.hits += 1
+                return False
+        self._reference = thumb
+        self._skipped = 0
+        self.misses += 1
+        return True
+
+    def reset(self):
+        self._reference = None
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'skip_ratio': round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+class GatedDetector:
+    """Envuelve una función de detección y la salta cuando la escena no cambió"""
+
+    def __init__(self, detect_fn, gate=None):
+        self.detect_fn = detect_fn
+        self.gate = gate if gate is not None else SceneChangeGate()
+        self._last = None
+
+    def __call__(self, frame):
+        if self.gate.changed(frame) or self._last is None:
+            self._last = self.detect_fn(frame)
+        return self._last
+
+    def stats(self):
+        return self.gate.stats()
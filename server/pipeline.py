@@ -0,0 +1,199 @@
+import threading
+import time
+from collections import deque
+
+
+class QueueClosed(Exception):
+    """La cola fue cerrada y ya no entregará más elementos"""
+
+
+class StopPipeline(Exception):
+    """Lanzada por una etapa para terminar el pipeline completo"""
+
+
+class BoundedQueue:
+    """
+    Cola acotada entre etapas con política de descarte explícita.
+
+    Políticas:
+        'drop_oldest': si está llena se descarta el elemento más viejo (siempre gana el más reciente)
+        'drop_newest': si está llena se descarta el elemento nuevo
+        'block': el productor espera a que haya espacio
+    """
+
+    POLICIES = {'drop_oldest', 'drop_newest', 'block'}
+
+    def __init__(self, maxsize=1, policy='drop_oldest', name="cola"):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Política de descarte inválida: {policy}")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.name = name
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self.put_count = 0
+        self.dropped = 0
+
+    def put(self, item):
+        """Encola un elemento; devuelve False si se descartó"""
+        with self._cond:
+            if self._closed:
+                return False
+            if len(self._items) >= self.maxsize:
+                if self.policy == 'drop_newest':
+                    self.dropped += 1
+                    return False
+                if self.policy == 'drop_oldest':
+                    self._items.popleft()
+                    self.dropped += 1
+                else:
+                    self._cond.wait_for(lambda: len(self._items) < self.maxsize or self._closed)
+                    if self._closed:
+                        return False
+            self._items.append(item)
+            self.put_count += 1
+            self._cond.notify_all()
+            return True
+
+    def get(self, timeout=None):
+        """
+        Extrae el siguiente elemento. Devuelve None si vence `timeout`
+        y lanza QueueClosed si la cola fue cerrada y está vacía.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._items or self._closed, timeout)
+            if self._items:
+                item = self._items.popleft()
+                self._cond.notify_all()
+                return item
+            if self._closed:
+                raise QueueClosed(self.name)
+            return None
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class PipelineStage:
+    """
+    Etapa del pipeline que corre en su propio hilo.
+
+    Si `inbox` es None la etapa es una fuente y `func()` se llama sin argumentos;
+    si no, `func(item)` se llama con cada elemento de la cola de entrada. Los
+    resultados distintos de None se envían a todas las colas de `outboxes`.
+    Si `func` lanza una excepción se llama a `on_error(etapa)` (ver Pipeline).
+    """
+
+    def __init__(self, name, func, inbox=None, outboxes=(), poll_timeout=0.5):
+        self.name = name
+        self.func = func
+        self.inbox = inbox
+        self.outboxes = list(outboxes)
+        self.poll_timeout = poll_timeout
+        self.running = False
+        self.error = None
+        self.on_error = None
+        self._thread = None
+
+        # Estadísticas
+        self.processed = 0
+        self.busy_time = 0.0
+
+    def start(self):
+        self.running = True
+        self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+        self._thread.start()
+        return self
+
+    def _loop(self):
+        try:
+            while self.running:
+                if self.inbox is None:
+                    t0 = time.perf_counter()
+                    result = self.func()
+                else:
+                    item = self.inbox.get(timeout=self.poll_timeout)
+                    if item is None:
+                        continue
+                    t0 = time.perf_counter()
+                    result = self.func(item)
+                self.busy_time += time.perf_counter() - t0
+                self.processed += 1
+                if result is not None:
+                    for outbox in self.outboxes:
+                        outbox.put(result)
+        except (QueueClosed, StopPipeline):
+            pass
+        except Exception as e:
+            self.error = e
+            print(f"Error en etapa {self.name}: {e}")
+            if self.on_error is not None:
+                self.on_error(self)
+        finally:
+            self.running = False
+            for outbox in self.outboxes:
+                outbox.close()
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def stop(self, timeout=2.0):
+        self.running = False
+        if self.inbox is not None:
+            self.inbox.close()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=timeout)
+
+    def stats(self):
+        avg_ms = 1000.0 * self.busy_time / self.processed if self.processed else 0.0
+        return {'processed': self.processed, 'avg_ms': round(avg_ms, 2)}
+
+
+class Pipeline:
+    """
+    Agrupa etapas y colas para arrancarlas, detenerlas y reportar estadísticas juntas.
+
+    El error de cualquier etapa es fatal para todo el pipeline: se cierran las colas y se
+    detienen las demás etapas, así quien consume la salida (el bucle de visualización)
+    termina y envía STOP. Si no, una falla en el control dejaría al robot con su último
+    comando mientras la inferencia sigue corriendo.
+    """
+
+    def __init__(self, stages, queues=()):
+        self.stages = list(stages)
+        self.queues = list(queues)
+        self.failed_stage = None
+        for stage in self.stages:
+            stage.on_error = self._stage_failed
+
+    def _stage_failed(self, stage):
+        self.failed_stage = stage.name
+        for s in self.stages:
+            s.running = False
+        for q in self.queues:
+            q.close()
+
+    def start(self):
+        for stage in self.stages:
+            stage.start()
+        return self
+
+    def is_alive(self):
+        return all(stage.is_alive() for stage in self.stages)
+
+    def stop(self):
+        for q in self.queues:
+            q.close()
+        for stage in self.stages:
+            stage.stop()
+
+    def stats(self):
+        stats = {stage.name: stage.stats() for stage in self.stages}
+        for q in self.queues:
+            stats[q.name] = {'dropped': q.dropped}
+        if self.failed_stage is not None:
+            stats['failed_stage'] = self.failed_stage
+        return stats
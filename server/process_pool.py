@@ -0,0 +1,290 @@
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from collections import deque
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from detections import DETECTION_DTYPE
+
+
+def _worker_main(worker_id, shm_name, ring_shape, tasks, results, weights, runtime, precision, imgsz,
+                 confidence_threshold, threads):
+    # Repartir los núcleos entre procesos en lugar de que cada uno use todos
+    os.environ.setdefault("OMP_NUM_THREADS", str(threads))
+    from inference_backend import load_backend
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        ring = np.ndarray(ring_shape, dtype=np.uint8, buffer=shm.buf)
+        backend = load_backend(weights, runtime=runtime, precision=precision, imgsz=imgsz)
+        backend.warmup(1, ring_shape[1:])
+        results.put(("ready", worker_id, dict(backend.names)))
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            seq, slot = task
+            t0 = time.perf_counter()
+            try:
+                # El modelo lee el frame directamente de la memoria compartida, sin copiarlo
+                detections = backend.detect(ring[slot], confidence_threshold)
+                data, error = detections.tobytes(), None
+            except Exception as e:
+                # Un frame que falla no mata al proceso: se responde igual para liberar la ranura
+                data, error = b"", str(e)
+            results.put(("result", worker_id, seq, slot, data, time.perf_counter() - t0, error))
+        del ring
+    except Exception as e:
+        results.put(("error", worker_id, str(e)))
+    finally:
+        shm.close()
+
+
+class ProcessInferencePool:
+    """
+    Inferencia en N procesos, cada uno con su propio modelo, para escalar en CPUs de muchos
+    núcleos sin competir por el GIL con la captura, el control y el dibujo.
+
+    Los frames se escriben en un anillo de `multiprocessing.shared_memory`; a los procesos
+    sólo se les envía (secuencia, ranura) y devuelven las detecciones como bytes del arreglo
+    estructurado (DETECTION_DTYPE). Sólo se despachan frames a procesos libres: si todos están
+    ocupados, el frame pendiente se reemplaza por el más nuevo (latest-frame-wins). Los
+    resultados se entregan en orden de secuencia; uno que termina después de otro más nuevo
+    se descarta por viejo, y uno cuya inferencia falló no se entrega.
+
+    Si un proceso muere, su frame en vuelo se libera y el pool sigue con los demás; cuando
+    no queda ninguno, `broken` pasa a True, get() y submit() dejan de esperar y quien use el
+    pool debe detenerse.
+    """
+
+    def __init__(self, weights="last.pt", runtime="auto", precision="fp32", workers=2,
+                 frame_shape=(480, 640, 3), confidence_threshold=0.3, imgsz=640, startup_timeout=300):
+        """
+        Args:
+            weights: modelo YOLO (.pt); cada proceso carga su copia (exportada/cacheada según runtime)
+            runtime: runtime de inferencia de cada proceso (ver inference_backend.load_backend)
+            precision: precisión del modelo exportado
+            workers: cantidad de procesos de inferencia
+            frame_shape: forma fija (alto, ancho, 3) de los frames del anillo
+            confidence_threshold: confianza mínima de las detecciones
+            imgsz: tamaño de entrada del modelo
+            startup_timeout: segundos máximos para que cada proceso cargue el modelo
+        """
+        self.workers = workers
+        self.frame_shape = tuple(frame_shape)
+        # Una ranura por proceso en vuelo más el frame pendiente y una de holgura
+        slots = workers + 2
+        self.ring_shape = (slots,) + self.frame_shape
+        self._shm = shared_memory.SharedMemory(create=True, size=int(np.prod(self.ring_shape)))
+        self.ring = np.ndarray(self.ring_shape, dtype=np.uint8, buffer=self._shm.buf)
+
+        ctx = mp.get_context("spawn")
+        self._results = ctx.Queue()
+        self._tasks = [ctx.Queue() for _ in range(workers)]
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        self._processes = []
+        self.names = None
+        for worker_id in range(workers):
+            process = ctx.Process(
+                target=_worker_main, name=f"inferencia-{worker_id}", daemon=True,
+                args=(worker_id, self._shm.name, self.ring_shape, self._tasks[worker_id], self._results,
+                      weights, runtime, precision, imgsz, confidence_threshold, threads))
+            process.start()
+            self._processes.append(process)
+            # De a uno: el primero exporta el modelo a la caché y los demás lo reutilizan
+            message = self._results.get(timeout=startup_timeout)
+            if message[0] != "ready":
+                self.stop()
+                raise RuntimeError(f"El proceso de inferencia {worker_id} falló: {message[2]}")
+            self.names = message[2]
+
+        self._cond = threading.Condition()
+        self._free_slots = list(range(slots))
+        self._idle = deque(range(workers))
+        self._busy = {}               # proceso -> (seq, slot) en vuelo
+        self._dead = set()
+        self._pending = None          # (seq, slot) esperando un proceso libre
+        self._frames = {}             # seq -> (frame original, índice, instante de captura)
+        self._output = deque()
+        self._in_flight = 0
+        self._next_seq = 0
+        self._last_delivered = -1
+        self._input_closed = False
+        self.running = True
+
+        # Estadísticas
+        self.submitted = 0
+        self.completed = 0
+        self.replaced = 0
+        self.stale = 0
+        self.failed = 0
+        self.busy_time = 0.0
+
+        self._collector = threading.Thread(target=self._collect_loop, name="resultados-pool", daemon=True)
+        self._collector.start()
+
+    @property
+    def broken(self):
+        """True si ya no queda ningún proceso de inferencia vivo"""
+        return len(self._dead) == self.workers
+
+    def _dispatch(self, seq, slot):
+        worker_id = self._idle.popleft()
+        self._in_flight += 1
+        self._busy[worker_id] = (seq, slot)
+        self._tasks[worker_id].put((seq, slot))
+
+    def submit(self, frame, block=False, frame_index=None, captured_at=None):
+        """
+        Copia `frame` al anillo y lo despacha (o lo deja pendiente); devuelve su secuencia.
+        `frame_index` y `captured_at` viajan con el frame y se devuelven en get().
+        Con block=True espera a que haya un proceso libre en lugar de reemplazar el pendiente
+        (reproducción de grabaciones sin descartar frames). Devuelve None si el pool está roto.
+        """
+        with self._cond:
+            if block:
+                self._cond.wait_for(lambda: self._idle or not self.running or self.broken)
+            if self.broken:
+                return None
+            seq = self._next_seq
+            self._next_seq += 1
+            if self._pending is not None:
+                # Latest-frame-wins: el pendiente todavía no se despachó, se reemplaza
+                old_seq, slot = self._pending
+                self._frames.pop(old_seq, None)
+                self._pending = None
+                self.replaced += 1
+            else:
+                slot = self._free_slots.pop()
+            np.copyto(self.ring[slot], frame)
+            self._frames[seq] = (frame, frame_index, captured_at)
+            self.submitted += 1
+            if self._idle:
+                self._dispatch(seq, slot)
+            else:
+                self._pending = (seq, slot)
+            return seq
+
+    def _release(self, worker_id):
+        """Libera la ranura y el contador del frame en vuelo de `worker_id` (con _cond tomado)"""
+        seq, slot = self._busy.pop(worker_id)
+        self._in_flight -= 1
+        self._free_slots.append(slot)
+        return seq
+
+    def _check_workers(self):
+        """Da de baja los procesos que murieron y libera lo que tenían en vuelo"""
+        with self._cond:
+            for worker_id, process in enumerate(self._processes):
+                if worker_id in self._dead or process.is_alive():
+                    continue
+                print(f"El proceso de inferencia {worker_id} terminó (código {process.exitcode})")
+                self._dead.add(worker_id)
+                if worker_id in self._idle:
+                    self._idle.remove(worker_id)
+                if worker_id in self._busy:
+                    self._frames.pop(self._release(worker_id), None)
+                    self.failed += 1
+                if self._pending is not None and self._idle:
+                    self._dispatch(*self._pending)
+                    self._pending = None
+                if self.broken:
+                    print("No quedan procesos de inferencia")
+                    if self._pending is not None:
+                        self._free_slots.append(self._pending[1])
+                        self._frames.pop(self._pending[0], None)
+                        self._pending = None
+                self._cond.notify_all()
+
+    def _collect_loop(self):
+        while self.running:
+            self._check_workers()
+            try:
+                message = self._results.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            if message[0] == "error":
+                # Falla fuera de una inferencia: el proceso termina y lo da de baja _check_workers
+                print(f"Error en proceso de inferencia {message[1]}: {message[2]}")
+                continue
+            _, worker_id, seq, slot, data, elapsed, error = message
+            detections = np.frombuffer(data, dtype=DETECTION_DTYPE).copy()
+            with self._cond:
+                if worker_id not in self._busy:
+                    continue  # el proceso murió después de responder y su frame ya se liberó
+                self._release(worker_id)
+                self.busy_time += elapsed
+                self._idle.append(worker_id)
+                if self._pending is not None:
+                    self._dispatch(*self._pending)
+                    self._pending = None
+                entry = self._frames.pop(seq, None)
+                if error is not None:
+                    self.failed += 1
+                    print(f"Error de inferencia en el proceso {worker_id}: {error}")
+                elif seq > self._last_delivered and entry is not None:
+                    self.completed += 1
+                    self._last_delivered = seq
+                    frame, frame_index, captured_at = entry
+                    self._output.append((seq, frame, detections, frame_index, captured_at))
+                else:
+                    self.completed += 1
+                    self.stale += 1
+                # Frames más viejos que el entregado ya no se van a mostrar
+                for old in [s for s in self._frames if s < self._last_delivered]:
+                    del self._frames[old]
+                self._cond.notify_all()
+
+    def get(self, timeout=0.5):
+        """
+        Devuelve (seq, frame, detecciones, índice, instante de captura) en orden de secuencia,
+        o None si vence `timeout`
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._output or self.finished() or self.broken, timeout)
+            if self._output:
+                return self._output.popleft()
+            return None
+
+    def close_input(self):
+        """Marca el fin de los frames: finished() será True cuando termine lo que está en vuelo"""
+        with self._cond:
+            self._input_closed = True
+            self._cond.notify_all()
+
+    def finished(self):
+        return (self._input_closed and self._in_flight == 0 and self._pending is None
+                and not self._output)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'workers': self.workers,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'replaced': self.replaced,
+                'stale': self.stale,
+                'failed': self.failed,
+                'alive': self.workers - len(self._dead),
+                'avg_inference_ms': round(1000 * self.busy_time / self.completed, 2) if self.completed else None,
+            }
+
+    def stop(self):
+        self.running = False
+        for tasks in self._tasks:
+            tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=5.0)
+            if process.is_alive():
+                process.terminate()
+        if getattr(self, "_collector", None) is not None:
+            self._collector.join(timeout=1.0)
+        self.ring = None
+        self._shm.close()
+        self._shm.unlink()
@@ -0,0 +1,158 @@
+import json
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+
+logger = logging.getLogger("ecobot.profiler")
+
+# Funciones del bucle de visión con tiempo propio en el informe (prefijos de co_name)
+WATCHED_FUNCTIONS = ("detect_waste", "get_smoothed_detections", "calculate_movement_", "draw_")
+
+
+class SamplingProfiler:
+    """
+    Perfilador por muestreo que se activa en caliente, sin reiniciar el proceso.
+
+    Mientras no hay un perfil en curso no existe ningún hilo ni envoltura: el costo es cero.
+    Al activarlo, un hilo toma cada `interval` segundos la pila de todos los hilos
+    (sys._current_frames) durante `duration` segundos y escribe en `output_dir`:
+      - <nombre>.folded: pilas colapsadas ("hilo;archivo:función;... muestras"), entrada de
+        flamegraph.pl, speedscope o inferno para ver el flamegraph
+      - <nombre>.json: tiempo inclusivo estimado de WATCHED_FUNCTIONS y las funciones con más
+        tiempo propio
+    Los tiempos son de pared (incluyen esperas), como los ve el bucle de visión.
+    """
+
+    def __init__(self, output_dir="perfiles", interval=0.005, watched=WATCHED_FUNCTIONS):
+        """
+        Args:
+            output_dir: carpeta donde se escriben los perfiles
+            interval: segundos entre muestras (0.005 = 200 Hz)
+            watched: prefijos de nombres de función con tiempo propio en el informe
+        """
+        self.output_dir = output_dir
+        self.interval = interval
+        self.watched = tuple(watched)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._done = threading.Event()
+        self._count = 0
+        self.last_result = None
+
+    @property
+    def active(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration=10.0):
+        """Inicia un perfil de `duration` segundos en segundo plano; False si ya hay uno en curso"""
+        with self._lock:
+            if self.active:
+                return False
+            self._stop.clear()
+            self._done.clear()
+            self._thread = threading.Thread(target=self._run, args=(duration,), name="perfilador", daemon=True)
+            self._thread.start()
+        logger.info("Perfil por muestreo iniciado (%.0f s)", duration)
+        return True
+
+    def stop(self):
+        """Termina antes de tiempo el perfil en curso (igual escribe los archivos)"""
+        self._stop.set()
+
+    def wait(self, timeout=None):
+        """Espera a que termine el perfil en curso; devuelve last_result"""
+        self._done.wait(timeout)
+        return self.last_result
+
+    def profile(self, duration=10.0):
+        """Perfil bloqueante (p. ej. desde un pedido HTTP); None si ya había uno en curso"""
+        if not self.start(duration):
+            return None
+        return self.wait(duration + 5.0)
+
+    def _run(self, duration):
+        own = threading.get_ident()
+        stacks = Counter()
+        self_time = Counter()
+        watched = Counter()
+        rounds = 0
+        start = time.perf_counter()
+        deadline = start + duration
+        try:
+            while not self._stop.is_set() and time.perf_counter() < deadline:
+                names = {t.ident: t.name for t in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident == own:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                        frame = frame.f_back
+                    if not stack:
+                        continue
+                    self_time[stack[0]] += 1
+                    for name in {entry.rpartition(":")[2] for entry in stack}:
+                        if name.startswith(self.watched):
+                            watched[name] += 1
+                    stack.append(names.get(ident, str(ident)))
+                    stacks[";".join(reversed(stack))] += 1
+                rounds += 1
+                self._stop.wait(self.interval)
+            elapsed = time.perf_counter() - start
+            self.last_result = self._write(stacks, self_time, watched, rounds, elapsed)
+            logger.info("Perfil escrito en %s", self.last_result['folded'])
+        except Exception as e:
+            logger.warning("El perfil falló: %s", e)
+            self.last_result = None
+        finally:
+            self._done.set()
+
+    def _write(self, stacks, self_time, watched, rounds, elapsed):
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._count += 1
+        base = os.path.join(self.output_dir, f"perfil-{time.strftime('%Y%m%d-%H%M%S')}-{self._count:03d}")
+        with open(base + ".folded", "w") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        # Cada ronda representa elapsed / rounds segundos de cada hilo
+        period = elapsed / rounds if rounds else 0.0
+
+        def timing(count):
+            return {'samples': count, 'seconds': round(count * period, 4),
+                    'percent': round(100.0 * count / rounds, 1) if rounds else 0.0}
+
+        report = {
+            'duration': round(elapsed, 3),
+            'rounds': rounds,
+            'interval': self.interval,
+            'watched': {name: timing(count) for name, count in watched.most_common()},
+            'top_self': {name: timing(count) for name, count in self_time.most_common(20)},
+        }
+        with open(base + ".json", "w") as f:
+            json.dump(report, f, indent=2)
+        report['folded'] = base + ".folded"
+        return report
+
+
+def install_signal_trigger(profiler, duration=10.0, signum=None):
+    """
+    Activa un perfil de `duration` segundos al recibir `signum` (por defecto SIGUSR2:
+    `kill -USR2 <pid>`). Sólo desde el hilo principal y en sistemas con SIGUSR2; devuelve
+    False si no se pudo instalar.
+    """
+    signum = signum if signum is not None else getattr(signal, "SIGUSR2", None)
+    if signum is None or threading.current_thread() is not threading.main_thread():
+        return False
+
+    def handler(signo, frame):
+        if not profiler.start(duration):
+            logger.info("Ya hay un perfil en curso")
+
+    signal.signal(signum, handler)
+    return True
@@ -0,0 +1,299 @@
+import argparse
+import json
+import struct
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+# Formato .ecorec:
+#   cabecera: MAGIC
+#   registros: RECORD_HEADER (tipo, timestamp, largo) + payload
+#     REC_FRAME: JPEG del frame crudo
+#     REC_EVENT: JSON utf-8 con {"kind": ..., "frame": índice, ...} (detecciones, comandos)
+#     REC_DROPPED: uint32 con la cantidad de frames capturados que no se grabaron (cola llena)
+# El índice de un frame es su posición contando los REC_FRAME y los descartados por REC_DROPPED,
+# así los eventos siguen apuntando al frame correcto aunque se hayan perdido frames.
+MAGIC = b"ECOREC1\n"
+RECORD_HEADER = struct.Struct("<BdI")
+DROPPED_COUNT = struct.Struct("<I")
+REC_FRAME = 0
+REC_EVENT = 1
+REC_DROPPED = 2
+
+
+def detections_to_json(detections, class_names=None):
+    """Detecciones (arreglo estructurado) como lista serializable a JSON"""
+    rows = []
+    for row in detections.tolist():
+        item = dict(zip(detections.dtype.names, row))
+        if class_names is not None:
+            item['class_name'] = class_names[item['class_id']]
+        rows.append(item)
+    return rows
+
+
+class FrameRecorder:
+    """
+    Graba frames crudos con su timestamp, más las detecciones y comandos emitidos,
+    en un único archivo .ecorec. La codificación JPEG y la escritura ocurren en un
+    hilo propio para no frenar la captura.
+    """
+
+    def __init__(self, path, jpeg_quality=90, max_pending=64):
+        """
+        Args:
+            path: archivo .ecorec a crear
+            jpeg_quality: calidad de la codificación JPEG de los frames
+            max_pending: frames esperando codificación antes de empezar a descartar (los
+                eventos no cuentan: son pocos y no se descartan)
+        """
+        self.path = path
+        self.encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), jpeg_quality]
+        self.max_pending = max_pending
+        self._file = open(path, "wb")
+        self._file.write(MAGIC)
+        self._cond = threading.Condition()
+        self._pending = deque()
+        self._pending_frames = 0
+        self.frame_count = 0
+        self.dropped = 0
+        self.running = True
+        self._thread = threading.Thread(target=self._write_loop, name="grabador", daemon=True)
+        self._thread.start()
+
+    def write_frame(self, frame, timestamp=None, block=False):
+        """
+        Encola un frame para grabar; devuelve su índice en la grabación.
+        Si la cola está llena el frame se descarta, salvo con block=True (grabaciones offline),
+        y en su lugar se graba un REC_DROPPED para no correr los índices de los frames siguientes.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._cond:
+            index = self.frame_count
+            self.frame_count += 1
+            if block:
+                self._cond.wait_for(lambda: self._pending_frames < self.max_pending)
+            if self._pending_frames >= self.max_pending:
+                self.dropped += 1
+                last = self._pending[-1] if self._pending else None
+                if last is not None and last[0] == REC_DROPPED:
+                    # Descartes seguidos se acumulan en un solo registro
+                    self._pending[-1] = (REC_DROPPED, last[1], last[2] + 1)
+                else:
+                    self._pending.append((REC_DROPPED, timestamp, 1))
+            else:
+                # Copia: la codificación es diferida y el llamador puede dibujar sobre el frame
+                self._pending.append((REC_FRAME, timestamp, frame.copy()))
+                self._pending_frames += 1
+            self._cond.notify()
+            return index
+
+    def write_event(self, kind, frame_index=None, **data):
+        """Graba un evento (p. ej. 'detections' o 'command') asociado a un índice de frame"""
+        data.update(kind=kind, frame=frame_index)
+        with self._cond:
+            self._pending.append((REC_EVENT, time.time(), data))
+            self._cond.notify()
+
+    def _write_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or not self.running)
+                if not self._pending:
+                    break
+                rec_type, timestamp, payload = self._pending.popleft()
+                if rec_type == REC_FRAME:
+                    self._pending_frames -= 1
+                self._cond.notify_all()
+            if rec_type == REC_FRAME:
+                ok, jpeg = cv2.imencode(".jpg", payload, self.encode_params)
+                if not ok:
+                    # Se conserva la posición del frame para no correr los índices
+                    rec_type, data = REC_DROPPED, DROPPED_COUNT.pack(1)
+                else:
+                    data = jpeg.tobytes()
+            elif rec_type == REC_DROPPED:
+                data = DROPPED_COUNT.pack(payload)
+            else:
+                data = json.dumps(payload, default=float).encode("utf-8")
+            self._file.write(RECORD_HEADER.pack(rec_type, timestamp, len(data)))
+            self._file.write(data)
+
+    def close(self):
+        with self._cond:
+            self.running = False
+            self._cond.notify()
+        self._thread.join()
+        self._file.close()
+        print(f"Grabación guardada en {self.path}: {self.frame_count} frames ({self.dropped} descartados)")
+
+
+def read_recording(path):
+    """
+    Itera (tipo, timestamp, payload) sobre un archivo .ecorec; los frames se devuelven como
+    bytes JPEG, los eventos como dict y los REC_DROPPED como la cantidad de frames descartados
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} no es una grabación .ecorec")
+        while True:
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return
+            rec_type, timestamp, length = RECORD_HEADER.unpack(header)
+            data = f.read(length)
+            if rec_type == REC_EVENT:
+                yield rec_type, timestamp, json.loads(data)
+            elif rec_type == REC_DROPPED:
+                yield rec_type, timestamp, DROPPED_COUNT.unpack(data)[0]
+            else:
+                yield rec_type, timestamp, data
+
+
+def read_events(path, kind=None):
+    """Eventos de una grabación (opcionalmente sólo los de tipo `kind`)"""
+    return [event for rec_type, _, event in read_recording(path)
+            if rec_type == REC_EVENT and (kind is None or event['kind'] == kind)]
+
+
+class ReplaySource:
+    """
+    Fuente de frames que reproduce una grabación .ecorec con la misma interfaz que
+    cv2.VideoCapture (isOpened/read/set/release), para alimentar WasteDetectionSystem
+    sin cámara ni red.
+
+    speed=1.0 reproduce en tiempo real según los timestamps grabados; speed=None
+    entrega los frames tan rápido como se lean. `frame_index` es el índice grabado del
+    último frame leído (cuenta los descartados al grabar), el mismo de los eventos.
+    """
+
+    def __init__(self, path, speed=1.0, loop=False):
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+        self._records = None
+        self._start_wall = None
+        self._start_ts = None
+        self.frames_read = 0
+        self.frame_index = -1
+        self._open()
+
+    def _open(self):
+        self._records = read_recording(self.path)
+        self._start_wall = None
+        self.frame_index = -1
+
+    def isOpened(self):
+        return self._records is not None
+
+    def set(self, prop, value):
+        return False
+
+    def read(self):
+        if self._records is None:
+            return False, None
+        for rec_type, timestamp, data in self._records:
+            if rec_type == REC_DROPPED:
+                self.frame_index += data
+                continue
+            if rec_type != REC_FRAME:
+                continue
+            self.frame_index += 1
+            if self.speed:
+                if self._start_wall is None:
+                    self._start_wall, self._start_ts = time.monotonic(), timestamp
+                delay = (timestamp - self._start_ts) / self.speed - (time.monotonic() - self._start_wall)
+                if delay > 0:
+                    time.sleep(delay)
+            frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+            self.frames_read += 1
+            return True, frame
+        if self.loop:
+            self._open()
+            return self.read()
+        return False, None
+
+    def release(self):
+        self._records = None
+
+
+class VideoFileSource:
+    """
+    Archivo de video local (cv2.VideoCapture) con la misma semántica de velocidad que
+    ReplaySource: speed=1.0 respeta los FPS del archivo, speed=None no espera.
+    """
+
+    def __init__(self, path, speed=1.0):
+        self.path = path
+        self.speed = speed
+        self.cap = cv2.VideoCapture(path)
+        fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.frame_interval = 1.0 / fps
+        self._start_wall = None
+        self.frames_read = 0
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def set(self, prop, value):
+        return False
+
+    def read(self):
+        if self.speed:
+            if self._start_wall is None:
+                self._start_wall = time.monotonic()
+            delay = self.frames_read * self.frame_interval / self.speed - (time.monotonic() - self._start_wall)
+            if delay > 0:
+                time.sleep(delay)
+        ret, frame = self.cap.read()
+        if ret:
+            self.frames_read += 1
+        return ret, frame
+
+    def release(self):
+        self.cap.release()
+
+
+def open_replay(path, speed=1.0):
+    """Fuente de frames para reproducir `path`: una grabación .ecorec o un archivo de video"""
+    if path.endswith(".ecorec"):
+        return ReplaySource(path, speed=speed)
+    return VideoFileSource(path, speed=speed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resumen de una grabación .ecorec")
+    parser.add_argument("path")
+    parser.add_argument("--commands", action="store_true", help="lista los comandos con su frame")
+    args = parser.parse_args()
+
+    frames = 0
+    dropped = 0
+    first = last = None
+    kinds = {}
+    commands = []
+    for rec_type, timestamp, data in read_recording(args.path):
+        if rec_type == REC_FRAME:
+            frames += 1
+            first = timestamp if first is None else first
+            last = timestamp
+        elif rec_type == REC_DROPPED:
+            dropped += data
+        else:
+            kinds[data['kind']] = kinds.get(data['kind'], 0) + 1
+            if data['kind'] == "command":
+                commands.append((data['frame'], data['command']))
+    duration = (last - first) if frames > 1 else 0.0
+    fps = (frames - 1) / duration if duration else 0.0
+    print(f"{args.path}: {frames} frames ({dropped} descartados al grabar), {duration:.1f} s "
+          f"({fps:.1f} FPS), eventos: {kinds}")
+    if args.commands:
+        for frame_index, command in commands:
+            print(f"  frame {frame_index}: {command}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+from detections import offset_detections
+
+
+class AdaptiveRoi:
+    """
+    Decide qué región del frame y con qué resolución se corre la inferencia.
+
+    Mientras busca, infiere sobre la ROI del suelo a baja resolución (`search_imgsz`).
+    Cuando hay un objetivo (acercamiento y COLLECT), infiere sobre un recorte alrededor
+    del objetivo a resolución completa (`approach_imgsz`). Las cajas siempre se devuelven
+    en coordenadas del frame, así la lógica de tolerancias del control no cambia.
+    """
+
+    def __init__(self, floor_roi=None, search_imgsz=320, approach_imgsz=640, margin=1.0,
+                 min_crop=(320, 240)):
+        """
+        Args:
+            floor_roi: (x, y, w, h) de la zona del suelo, o None para usar todo el frame
+            search_imgsz: tamaño de entrada del modelo mientras se busca
+            approach_imgsz: tamaño de entrada del modelo con un objetivo fijado
+            margin: margen alrededor del objetivo, en múltiplos de su tamaño
+            min_crop: tamaño mínimo (ancho, alto) del recorte alrededor del objetivo
+        """
+        self.floor_roi = floor_roi
+        self.search_imgsz = search_imgsz
+        self.approach_imgsz = approach_imgsz
+        self.margin = margin
+        self.min_crop = min_crop
+        self.target_box = None  # (x1, y1, x2, y2) del objetivo fijado, o None
+
+        # Estadísticas
+        self.search_frames = 0
+        self.approach_frames = 0
+
+    def set_target(self, box):
+        """Fija (o libera con None) el objetivo alrededor del cual se recorta"""
+        self.target_box = box
+
+    def plan(self, frame_shape):
+        """Devuelve ((x, y, w, h), imgsz) para el próximo frame"""
+        frame_h, frame_w = frame_shape[:2]
+        if self.target_box is None:
+            self.search_frames += 1
+            if self.floor_roi is None:
+                return (0, 0, frame_w, frame_h), self.search_imgsz
+            return self._clamp(self.floor_roi, frame_w, frame_h), self.search_imgsz
+
+        self.approach_frames += 1
+        x1, y1, x2, y2 = self.target_box
+        w = max(self.min_crop[0], int((x2 - x1) * (1 + 2 * self.margin)))
+        h = max(self.min_crop[1], int((y2 - y1) * (1 + 2 * self.margin)))
+        cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
+        return self._clamp((cx - w // 2, cy - h // 2, w, h), frame_w, frame_h), self.approach_imgsz
+
+    @staticmethod
+    def _clamp(roi, frame_w, frame_h):
+        x, y, w, h = roi
+        w, h = min(w, frame_w), min(h, frame_h)
+        x = min(max(0, x), frame_w - w)
+        y = min(max(0, y), frame_h - h)
+        return x, y, w, h
+
+    def detect(self, detect_fn, frame):
+        """Corre `detect_fn(crop, imgsz)` sobre la región planificada y devuelve cajas en coordenadas del frame"""
+        (x, y, w, h), imgsz = self.plan(frame.shape)
+        detections = detect_fn(frame[y:y + h, x:x + w], imgsz)
+        return offset_detections(detections, x, y)
+
+    def stats(self):
+        return {'search_frames': self.search_frames, 'approach_frames': self.approach_frames}
@@ -1,4 +1,5 @@
 import cv2
+import logging
 import numpy as np
 import requests
 import threading
@@ -6,18 +7,60 @@ import time
 import json
 from datetime import datetime
 
+from color_segmentation import ColorSegmenter
+from command_sender import FrameDeadline
+from debug_stream import MjpegDebugServer
+from frame_grabber import LatestFrameGrabber
+from metrics import Metrics, MetricsServer, PeriodicMetricsLog, configure_logging
+from mjpeg_stream import open_stream
+from profiler import SamplingProfiler, install_signal_trigger
+from recording import FrameRecorder, open_replay
+
+logger = logging.getLogger("ecobot.server")
+
 class WasteDetectionSystem:
-    def __init__(self, phone_ip="192.168.1.13", esp32_ip="192.168.1.101"):
+    def __init__(self, phone_ip="192.168.1.13", esp32_ip="192.168.1.101", headless=False, debug_port=None,
+                 record_path=None, replay_path=None, replay_speed=1.0, metrics_port=None, metrics_log_interval=10.0,
+                 stream_client="mjpeg", latency_budget=0.5, stale_policy="stop", profile_dir="perfiles"):
         """
         Sistema de detección de desechos sólidos
         Args:
             phone_ip: IP del teléfono Android
             esp32_ip: IP del ESP32
+            headless: no abrir ventana ni dibujar (modo producción)
+            debug_port: puerto del stream MJPEG de depuración (None lo desactiva)
+            record_path: archivo .ecorec donde grabar los frames y comandos
+            replay_path: grabación .ecorec (o archivo de video) a reproducir en lugar del teléfono
+            replay_speed: velocidad de reproducción (1.0 = tiempo real, None = lo más rápido posible)
+            metrics_port: puerto del endpoint /metrics estilo Prometheus (None lo desactiva)
+            metrics_log_interval: segundos entre líneas de log con el resumen de métricas (None lo desactiva)
+            stream_client: "mjpeg" (cliente propio con reconexión) u "opencv" (cv2.VideoCapture/FFmpeg)
+            latency_budget: antigüedad máxima (s) del frame al emitir su comando (None sólo la mide)
+            stale_policy: "stop" reemplaza por STOP los comandos de frames viejos, "drop" los descarta
+            profile_dir: carpeta de los perfiles por muestreo (ver profiler.SamplingProfiler)
         """
         self.phone_ip = phone_ip
         self.esp32_ip = esp32_ip
         self.phone_stream_url = f"http://{phone_ip}:8080/video"
+        self.stream_client = stream_client
         self.esp32_command_url = f"http://{esp32_ip}/command"
+        self.record_path = record_path
+        self.replay_path = replay_path
+        self.replay_speed = replay_speed
+        self.recorder = None
+        
+        # Instrumentación: latencia por etapa, frames descartados y FPS de detección
+        self.metrics = Metrics()
+        # Perfil por muestreo a pedido (kill -USR2 <pid> o /profile?seconds=N en el puerto de métricas)
+        self.profiler = SamplingProfiler(profile_dir)
+        self.metrics_server = (MetricsServer(self.metrics, port=metrics_port, profiler=self.profiler)
+                               if metrics_port else None)
+        self.metrics_log = PeriodicMetricsLog(self.metrics, metrics_log_interval) if metrics_log_interval else None
+        self.frames_processed = self.metrics.counter("frames_processed_total")
+        self.metrics.add_collector(self._collect_metrics)
+        # Presupuesto de antigüedad del frame al emitir su comando (al reproducir lo más rápido posible sólo se mide)
+        as_fast_replay = replay_path is not None and replay_speed is None
+        self.deadline = FrameDeadline(None if as_fast_replay else latency_budget, stale_policy, self.metrics)
         
         # Variables de control
         self.is_running = False
@@ -25,6 +68,10 @@ class WasteDetectionSystem:
         self.waste_detected = False
         self.waste_position = None
         
+        # Visualización: ventana local y/o stream MJPEG que sólo codifica con clientes conectados
+        self.headless = headless
+        self.debug_stream = MjpegDebugServer(port=debug_port) if debug_port else None
+        
         # Configuración de detección
         self.setup_detection_parameters()
         
@@ -36,21 +83,48 @@ class WasteDetectionSystem:
         self.white_paper_upper = np.array([180, 30, 255])
         
         # Envolturas coloridas (ajustar según necesidad)
-        # self.colorful_lower = np.array([0, 50, 50])
-        # self.colorful_upper = np.array([180, 255, 255])
+        self.colorful_lower = np.array([0, 50, 50])
+        self.colorful_upper = np.array([180, 255, 255])
+        
+        # Clases de color activas; agregar ("envoltura", self.colorful_lower, self.colorful_upper)
+        # para detectar también envolturas coloridas
+        self.color_classes = [
+            ("papel_blanco", self.white_paper_lower, self.white_paper_upper),
+        ]
         
         # Parámetros de filtrado
         self.min_contour_area = 500  # Área mínima para considerar un objeto
         self.max_contour_area = 50000  # Área máxima
         
+        # Segmentación a media resolución; roi=(x, y, w, h) limita la búsqueda al suelo
+        self.segmenter = ColorSegmenter(
+            self.color_classes,
+            scale=0.5,
+            roi=None,
+            min_area=self.min_contour_area,
+            max_area=self.max_contour_area
+        )
+        
     def connect_to_phone_stream(self):
         """Establece conexión con el stream de video del teléfono"""
         try:
-            self.cap = cv2.VideoCapture(self.phone_stream_url)
+            source = self.replay_path or self.phone_stream_url
+            if self.replay_path:
+                self.cap = open_replay(self.replay_path, self.replay_speed)
+            else:
+                self.cap = open_stream(self.phone_stream_url, self.stream_client)
             if not self.cap.isOpened():
-                print(f"Error: No se pudo conectar al stream del teléfono en {self.phone_stream_url}")
+                print(f"Error: No se pudo conectar al stream del teléfono en {source}")
                 return False
-            print("Conexión establecida con el teléfono Android")
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            if self.record_path:
+                self.recorder = FrameRecorder(self.record_path)
+            # Captura en segundo plano: siempre procesamos el frame más reciente
+            # (salvo al reproducir lo más rápido posible, donde no se descarta ninguno)
+            drop_frames = not (self.replay_path and self.replay_speed is None)
+            self.grabber = LatestFrameGrabber(self.cap, drop_frames=drop_frames, recorder=self.recorder,
+                                              metrics=self.metrics).start()
+            print(f"Conexión establecida con {source}")
             return True
         except Exception as e:
             print(f"Error conectando al teléfono: {e}")
@@ -59,89 +133,28 @@ class WasteDetectionSystem:
     def detect_waste_objects(self, frame):
         """
         Detecta objetos de desecho en el frame
-        Returns: lista de objetos detectados con sus posiciones
+        Returns: arreglo estructurado (ver detections.DETECTION_DTYPE) con los objetos detectados
         """
-        detected_objects = []
-        
-        # Convertir a HSV para mejor detección de colores
-        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-        
-        # Crear máscaras para diferentes tipos de desechos
-        masks = []
-        
-        # Máscara para papeles blancos
-        white_mask = cv2.inRange(hsv, self.white_paper_lower, self.white_paper_upper)
-        masks.append(("papel_blanco", white_mask))
-        
-        # Máscara para objetos coloridos (envolturas)
-        # colorful_mask = cv2.inRange(hsv, self.colorful_lower, self.colorful_upper)
-        # masks.append(("envoltura", colorful_mask))
-        
-        # Procesar cada máscara
-        for waste_type, mask in masks:
-            # Aplicar operaciones morfológicas para limpiar la máscara
-            kernel = np.ones((5,5), np.uint8)
-            mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
-            mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
-            
-            # Encontrar contornos
-            contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            
-            for contour in contours:
-                area = cv2.contourArea(contour)
-                
-                # Filtrar por área
-                if self.min_contour_area < area < self.max_contour_area:
-                    # Calcular centro del objeto
-                    M = cv2.moments(contour)
-                    if M["m00"] != 0:
-                        cx = int(M["m10"] / M["m00"])
-                        cy = int(M["m01"] / M["m00"])
-                        
-                        # Calcular bounding box
-                        x, y, w, h = cv2.boundingRect(contour)
-                        
-                        detected_objects.append({
-                            'type': waste_type,
-                            'center': (cx, cy),
-                            'bbox': (x, y, w, h),
-                            'area': area,
-                            'contour': contour
-                        })
-        
-        return detected_objects
+        # Máscaras HSV, limpieza morfológica y componentes conexas (ver ColorSegmenter)
+        return self.segmenter.detect(frame)
     
     def calculate_movement_command(self, waste_objects, frame_shape):
         """
         Calcula el comando de movimiento basado en los objetos detectados
         """
-        if not waste_objects:
+        if not len(waste_objects):
             return "STOP"
         
         frame_height, frame_width = frame_shape[:2]
         frame_center_x = frame_width // 2
         frame_center_y = frame_height // 2
         
-        # Encontrar el objeto más cercano (más grande en el frame inferior)
-        closest_object = None
-        max_priority = 0
-        
-        for obj in waste_objects:
-            cx, cy = obj['center']
-            area = obj['area']
-            
-            # Priorizar objetos en la parte inferior del frame (más cercanos)
-            distance_from_bottom = frame_height - cy
-            priority = area * (1 + (frame_height - distance_from_bottom) / frame_height)
-            
-            if priority > max_priority:
-                max_priority = priority
-                closest_object = obj
-        
-        if not closest_object:
-            return "STOP"
+        # Encontrar el objeto más cercano (más grande en el frame inferior):
+        # se priorizan los objetos en la parte inferior del frame (más cercanos)
+        priority = waste_objects['area'] * (1 + waste_objects['center_y'] / frame_height)
+        closest_object = waste_objects[np.argmax(priority)]
         
-        cx, cy = closest_object['center']
+        cx, cy = int(closest_object['center_x']), int(closest_object['center_y'])
         
         # Calcular comando basado en la posición del objeto
         tolerance_x = 50  # Tolerancia horizontal
@@ -159,9 +172,14 @@ class WasteDetectionSystem:
         else:
             return "FORWARD"
     
-    def send_command_to_esp32(self, command):
+    def send_command_to_esp32(self, command, captured_at=None):
         """Envía comando al ESP32"""
-        print(f"Comando enviado: {command}")
+        command = self.deadline.check(command, captured_at)
+        if command is None:
+            return  # el frame ya es demasiado viejo
+        logger.info("Comando enviado: %s", command)
+        if self.recorder is not None:
+            self.recorder.write_event("command", self.grabber.frame_index, command=command)
         # try:
         #     payload = {"command": command, "timestamp": datetime.now().isoformat()}
         #     response = requests.post(self.esp32_command_url, 
@@ -179,17 +197,19 @@ class WasteDetectionSystem:
     
     def draw_detection_info(self, frame, waste_objects):
         """Dibuja información de detección en el frame"""
-        for obj in waste_objects:
+        for x, y, x2, y2, cx, cy, area, class_id in zip(
+                waste_objects['x1'].tolist(), waste_objects['y1'].tolist(),
+                waste_objects['x2'].tolist(), waste_objects['y2'].tolist(),
+                waste_objects['center_x'].tolist(), waste_objects['center_y'].tolist(),
+                waste_objects['area'].tolist(), waste_objects['class_id'].tolist()):
             # Dibujar bounding box
-            x, y, w, h = obj['bbox']
-            cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+            cv2.rectangle(frame, (x, y), (x2, y2), (0, 255, 0), 2)
             
             # Dibujar centro
-            cx, cy = obj['center']
             cv2.circle(frame, (cx, cy), 5, (0, 0, 255), -1)
             
             # Etiqueta
-            label = f"{obj['type']}: {obj['area']:.0f}px²"
+            label = f"{self.segmenter.class_names[class_id]}: {area:.0f}px²"
             cv2.putText(frame, label, (x, y-10), 
                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
         
@@ -206,45 +226,80 @@ class WasteDetectionSystem:
         command_interval = 1.0  # Enviar comandos cada segundo
         
         while self.is_running:
-            ret, frame = self.cap.read()
+            ret, frame = self.grabber.read()
             if not ret:
-                print("Error leyendo frame del stream")
+                if not self.grabber.running:
+                    print("Stream del teléfono terminado")
+                    break
+                logger.warning("Error leyendo frame del stream")
                 continue
             
             # Detectar objetos de desecho
-            waste_objects = self.detect_waste_objects(frame)
+            with self.metrics.time("detect"):
+                waste_objects = self.detect_waste_objects(frame)
+            self.frames_processed.inc()
             
             # Calcular comando de movimiento
-            command = self.calculate_movement_command(waste_objects, frame.shape)
+            with self.metrics.time("control"):
+                command = self.calculate_movement_command(waste_objects, frame.shape)
             
             # Enviar comando al ESP32 (con limitación de frecuencia)
             current_time = time.time()
             if current_time - last_command_time > command_interval:
-                self.send_command_to_esp32(command)
+                with self.metrics.time("command"):
+                    self.send_command_to_esp32(command, self.grabber.frame_time)
                 last_command_time = current_time
             
+            # Información en consola (nivel DEBUG: una línea por frame)
+            if len(waste_objects):
+                logger.debug("Objetos detectados: %d | Comando: %s", len(waste_objects), command)
+            
+            # Dibujar sólo si hay ventana o alguien mirando el stream de depuración
+            publish = self.debug_stream is not None and self.debug_stream.wants_frame()
+            if self.headless and not publish:
+                continue
+            
             # Dibujar información de detección
             frame_with_info = self.draw_detection_info(frame, waste_objects)
+            if publish:
+                self.debug_stream.publish(frame_with_info)
+            if self.headless:
+                continue
             
             # Mostrar frame procesado
             cv2.imshow('Robot Recolector - Detección de Desechos', frame_with_info)
             
-            # Información en consola
-            if waste_objects:
-                print(f"Objetos detectados: {len(waste_objects)} | Comando: {command}")
-            
             # Salir con 'q'
             if cv2.waitKey(1) & 0xFF == ord('q'):
                 break
     
+    def _collect_metrics(self):
+        if not hasattr(self, 'grabber'):
+            return {}
+        frames = self.grabber.stats()
+        return {
+            'frames_captured_total': frames['captured'],
+            'frames_dropped_total': frames['dropped'],
+            'read_failures_total': frames['read_failures'],
+        }
+    
     def start_detection(self):
         """Inicia el sistema de detección"""
         print("Iniciando sistema de detección de desechos...")
         
-        if not self.connect_to_phone_stream():
+        with self.metrics.time("connect"):
+            connected = self.connect_to_phone_stream()
+        if not connected:
             return False
         
         self.is_running = True
+        if self.debug_stream is not None:
+            self.debug_stream.start()
+        if self.metrics_server is not None:
+            self.metrics_server.start()
+        if self.metrics_log is not None:
+            self.metrics_log.start()
+        install_signal_trigger(self.profiler)
         
         try:
             self.process_video_stream()
@@ -258,13 +313,33 @@ class WasteDetectionSystem:
     def stop_detection(self):
         """Detiene el sistema de detección"""
         self.is_running = False
-        if hasattr(self, 'cap'):
+        if hasattr(self, 'grabber'):
+            self.grabber.stop()
+            print(f"Frames: {self.grabber.stats()}")
+            print(f"Comandos viejos: {self.deadline.stats()}")
+            if hasattr(self.cap, "stats"):
+                print(f"Stream: {self.cap.stats()}")
+        elif hasattr(self, 'cap'):
             self.cap.release()
-        cv2.destroyAllWindows()
+        if self.debug_stream is not None:
+            self.debug_stream.stop()
+        if self.metrics_log is not None:
+            self.metrics_log.stop()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+        if not self.headless:
+            cv2.destroyAllWindows()
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.profiler.active:
+            # El perfil en curso igual se escribe
+            self.profiler.stop()
+            self.profiler.wait(2.0)
         print("Sistema detenido")
 
 # Función principal
 def main():
+    configure_logging()  # ECOBOT_LOG_LEVEL=DEBUG muestra el detalle de cada frame
     # Configurar IPs de dispositivos
     PHONE_IP = "192.168.1.13"  # Cambiar por la IP de tu teléfono
     ESP32_IP = "192.168.1.101"  # Cambiar por la IP de tu ESP32
@@ -1,16 +1,36 @@
 import cv2
 import numpy as np
-from ultralytics import YOLO
 import requests
 import socket
 import json
-import time
+import logging
 import threading
-from collections import deque
 import math
 
+from buffer_pool import BufferPool
+from command_sender import FrameDeadline
+from debug_stream import MjpegDebugServer
+from frame_grabber import LatestFrameGrabber
+from inference_backend import load_backend
+from metrics import Metrics, MetricsServer, PeriodicMetricsLog, configure_logging
+from mjpeg_stream import open_stream
+from motion_gate import GatedDetector, SceneChangeGate
+from profiler import SamplingProfiler, install_signal_trigger
+from recording import FrameRecorder, detections_to_json, open_replay
+from smoothing import TemporalSmoother
+from startup import StartupTimer
+from telemetry import TelemetryWriter
+
+logger = logging.getLogger("ecobot.serverIA")
+
 class WasteDetectionSystem:
-    def __init__(self, phone_ip="192.168.0.101", phone_port=8080, esp32_ip="192.168.1.101", esp32_port=80):
+    def __init__(self, phone_ip="192.168.0.101", phone_port=8080, esp32_ip="192.168.1.101", esp32_port=80,
+                 runtime="auto", precision="fp32", warmup_passes=2,
+                 scene_change_threshold=6.0, headless=False, debug_port=None,
+                 record_path=None, replay_path=None, replay_speed=1.0,
+                 metrics_port=None, metrics_log_interval=10.0, stream_client="mjpeg",
+                 latency_budget=0.5, stale_policy="stop", telemetry_dir=None,
+                 profile_dir="perfiles"):
         """
         Sistema de detección de desechos para robot recolector
         
@@ -19,6 +39,22 @@ class WasteDetectionSystem:
             phone_port: Puerto de IP Webcam (por defecto 8080)
             esp32_ip: IP del ESP32
             esp32_port: Puerto del ESP32 (por defecto 80)
+            runtime: backend de inferencia ('auto', 'openvino', 'onnx' o 'torch')
+            precision: precisión del modelo exportado ('fp32', 'fp16' o 'int8')
+            warmup_passes: inferencias de calentamiento antes de conectar al stream
+            scene_change_threshold: diferencia media (0-255) entre frames para volver a detectar
+            headless: no abrir ventana ni dibujar (modo producción)
+            debug_port: puerto del stream MJPEG de depuración (None lo desactiva)
+            record_path: archivo .ecorec donde grabar frames, detecciones y comandos
+            replay_path: grabación .ecorec (o archivo de video) a reproducir en lugar del stream del teléfono
+            replay_speed: velocidad de reproducción (1.0 = tiempo real, None = lo más rápido posible)
+            metrics_port: puerto del endpoint /metrics estilo Prometheus (None lo desactiva)
+            metrics_log_interval: segundos entre líneas de log con el resumen de métricas (None lo desactiva)
+            stream_client: "mjpeg" (cliente propio: reconexión, decodificación reducida) u "opencv" (FFmpeg)
+            latency_budget: antigüedad máxima (s) del frame al emitir su comando (None sólo la mide)
+            stale_policy: "stop" reemplaza por "stop" los comandos de frames viejos, "drop" los descarta
+            telemetry_dir: carpeta de la telemetría binaria .ecotlm (None la desactiva)
+            profile_dir: carpeta de los perfiles por muestreo (ver profiler.SamplingProfiler)
         """
         self.phone_ip = phone_ip
         self.phone_port = phone_port
@@ -27,12 +63,41 @@ class WasteDetectionSystem:
         
         # URL del stream de video del teléfono
         self.video_url = f"http://{phone_ip}:{phone_port}/video"
+        self.stream_client = stream_client
+        
+        # Grabación / reproducción
+        self.record_path = record_path
+        self.replay_path = replay_path
+        self.replay_speed = replay_speed
+        self.recorder = None
+        self._frame_index = None
+        # Telemetría por frame (detecciones, objetivo y comando) para análisis posterior
+        self.telemetry = TelemetryWriter(telemetry_dir) if telemetry_dir else None
+        
+        self.startup = StartupTimer()
         
-        # Cargar modelo YOLO pre-entrenado
+        # Instrumentación: latencia por etapa, frames descartados y FPS de inferencia
+        self.metrics = Metrics()
+        # Perfil por muestreo a pedido (kill -USR2 <pid> o /profile?seconds=N en el puerto de métricas)
+        self.profiler = SamplingProfiler(profile_dir)
+        self.metrics_server = (MetricsServer(self.metrics, port=metrics_port, profiler=self.profiler)
+                               if metrics_port else None)
+        self.metrics_log = PeriodicMetricsLog(self.metrics, metrics_log_interval) if metrics_log_interval else None
+        self.frames_processed = self.metrics.counter("frames_processed_total")
+        self.metrics.add_collector(self._collect_metrics)
+        # Presupuesto de antigüedad del frame al emitir su comando (al reproducir lo más rápido posible sólo se mide)
+        as_fast_replay = replay_path is not None and replay_speed is None
+        # Vocabulario de ecobot_ia en minúsculas: un comando viejo se cambia por "stop"
+        self.deadline = FrameDeadline(None if as_fast_replay else latency_budget, stale_policy, self.metrics,
+                                      stop_command="stop")
+        
+        # Cargar modelo YOLO pre-entrenado (ultralytics se importa recién aquí)
         print("Cargando modelo YOLO...")
         try:
-            self.model = YOLO('last.pt')
-            print(self.model.names)
+            with self.startup.phase("modelo"):
+                self.backend = load_backend('last.pt', runtime=runtime, precision=precision)
+            self.class_names = self.backend.names
+            print(self.class_names)
         except Exception as e:
             print(f"Error cargando el modelo YOLO: {e}")
             raise
@@ -53,39 +118,75 @@ class WasteDetectionSystem:
         self.frame_width = 640
         self.frame_height = 480
         
-        # Cola para suavizar las detecciones
-        self.detection_history = deque(maxlen=5)
+        # Warm-up: la primera inferencia paga la inicialización perezosa del runtime
+        with self.startup.phase("warm-up"):
+            self.backend.warmup(warmup_passes, (self.frame_height, self.frame_width, 3))
+        
+        # Si la escena no cambió (robot detenido) se reutilizan las detecciones anteriores
+        self.gated_detector = GatedDetector(self.detect_waste, SceneChangeGate(scene_change_threshold))
+        
+        # Suavizado temporal incremental: historial de 5 frames, clase dominante en los últimos 3
+        self.smoother = TemporalSmoother(k=3, history_size=5)
         
         # Variables de control
         self.running = False
         self.current_target = None
         self._last_command = None  # Para evitar comandos redundantes
         
+        # Buffers reutilizados entre frames (redimensionado y copia para dibujar)
+        self.buffers = BufferPool()
+        
+        # Visualización: ventana local y/o stream MJPEG que sólo codifica con clientes conectados
+        self.headless = headless
+        self.debug_stream = MjpegDebugServer(port=debug_port) if debug_port else None
+        
         print("Sistema inicializado correctamente")
     
     def connect_to_video_stream(self):
         """Conecta al stream de video del teléfono"""
         try:
-            self.cap = cv2.VideoCapture(self.video_url)
+            if self.replay_path:
+                self.cap = open_replay(self.replay_path, self.replay_speed)
+            else:
+                self.cap = open_stream(self.video_url, self.stream_client)
             if not self.cap.isOpened():
                 raise Exception("No se pudo conectar al stream de video")
             
             # Configurar resolución
             self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.frame_width)
             self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.frame_height)
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
             
-            print(f"Conectado al stream de video: {self.video_url}")
+            if self.record_path:
+                self.recorder = FrameRecorder(self.record_path)
+            
+            # Captura en segundo plano: siempre procesamos el frame más reciente
+            # (salvo al reproducir lo más rápido posible, donde no se descarta ninguno)
+            drop_frames = not (self.replay_path and self.replay_speed is None)
+            self.grabber = LatestFrameGrabber(self.cap, drop_frames=drop_frames, recorder=self.recorder,
+                                              metrics=self.metrics).start()
+            
+            print(f"Conectado al stream de video: {self.replay_path or self.video_url}")
             return True
         except Exception as e:
             print(f"Error conectando al video: {e}")
             return False
     
-    def send_command_to_esp32(self, command):
-        """Envía comando al ESP32 (optimizado para no repetir comandos consecutivos)"""
+    def send_command_to_esp32(self, command, captured_at=None):
+        """
+        Envía comando al ESP32 (optimizado para no repetir comandos consecutivos).
+        Devuelve False si no se envió: repetido o descartado por antigüedad del frame.
+        """
+        command = self.deadline.check(command, captured_at)
+        if command is None:
+            return False  # el frame ya es demasiado viejo
         if self._last_command == command:
-            return  # No reenvíes el mismo comando
+            return False  # No reenvíes el mismo comando
         self._last_command = command
-        print(f"Comando enviado: {command}")
+        logger.info("Comando enviado: %s", command)
+        if self.recorder is not None:
+            self.recorder.write_event("command", self._frame_index, command=command)
+        return True
         # try:
         #     url = f"http://{self.esp32_ip}:{self.esp32_port}/{command}"
         #     response = requests.get(url, timeout=2)
@@ -101,84 +202,34 @@ class WasteDetectionSystem:
     
     def detect_waste(self, frame):
         """Detecta desechos en el frame"""
-        # Redimensionar el frame para asegurar tamaño consistente
-        if frame.shape[1] != self.frame_width or frame.shape[0] != self.frame_height:
-            frame = cv2.resize(frame, (self.frame_width, self.frame_height))
-        # Ejecutar detección YOLO
-        results = self.model(frame, conf=self.confidence_threshold)
-        
-        detections = []
-        
-        for result in results:
-            boxes = result.boxes
-            if boxes is not None:
-                for box in boxes:
-                    # Obtener coordenadas y confianza
-                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                    confidence = box.conf[0].cpu().numpy()
-                    class_id = int(box.cls[0].cpu().numpy())
-                    
-                    # Verificar si es una clase objetivo
-                    class_name = self.model.names[class_id]
-                    
-                    # Para este ejemplo, detectamos cualquier objeto como potencial desecho
-                    # En una implementación real, podrías entrenar un modelo específico
-                    if confidence > self.confidence_threshold:
-                        center_x = int((x1 + x2) / 2)
-                        center_y = int((y1 + y2) / 2)
-                        width = int(x2 - x1)
-                        height = int(y2 - y1)
-                        area = width * height
-                        
-                        detection = {
-                            'class_name': class_name,
-                            'confidence': confidence,
-                            'center_x': center_x,
-                            'center_y': center_y,
-                            'width': width,
-                            'height': height,
-                            'area': area,
-                            'bbox': (int(x1), int(y1), int(x2), int(y2))
-                        }
-                        detections.append(detection)
-        
-        return detections
+        with self.metrics.time("detect"):
+            # Redimensionar el frame para asegurar tamaño consistente
+            if frame.shape[1] != self.frame_width or frame.shape[0] != self.frame_height:
+                frame = self.buffers.resize("entrada", frame, (self.frame_width, self.frame_height))
+            # Ejecutar detección YOLO (PyTorch, ONNX u OpenVINO según el backend)
+            # Para este ejemplo, detectamos cualquier objeto como potencial desecho
+            # En una implementación real, podrías entrenar un modelo específico
+            # Se obtiene un arreglo estructurado (ver detections.DETECTION_DTYPE), una fila por objeto
+            return self.backend.detect(frame, self.confidence_threshold)
     
-    def get_smoothed_detections(self, k=3):
-        """Devuelve una lista de detecciones suavizadas usando los últimos k frames."""
-        if len(self.detection_history) < k:
-            return []
-        # Aplanar y contar ocurrencias de clases detectadas
-        recent = list(self.detection_history)[-k:]
-        class_counter = {}
-        for det_list in recent:
-            for d in det_list:
-                key = d['class_name']
-                if key not in class_counter:
-                    class_counter[key] = 0
-                class_counter[key] += 1
-        # Selecciona detecciones cuya clase aparece en la mayoría de los frames recientes
-        most_common_classes = {k for k, v in class_counter.items() if v == max(class_counter.values(), default=0)}
-        # Devuelve sólo las detecciones de la clase más común en el último frame
-        if recent:
-            filtered = [d for d in recent[-1] if d['class_name'] in most_common_classes]
-            return filtered if filtered else recent[-1]
-        return []
+    def get_smoothed_detections(self):
+        """Devuelve las detecciones del último frame de la clase dominante en los últimos frames."""
+        # Los conteos de clases se actualizan en cada push(), aquí no se recorre el historial
+        return self.smoother.smoothed()
     
     def calculate_movement_direction(self, detections):
         """Calcula la dirección de movimiento hacia el desecho más cercano"""
-        if not detections:
+        # Encontrar el desecho más grande (más cercano probablemente), con el centro filtrado
+        target = self.smoother.stable_target(detections)
+        if target is None:
             return None
         
-        # Encontrar el desecho más grande (más cercano probablemente)
-        largest_detection = max(detections, key=lambda x: x['area'])
-        
         # Calcular posición relativa respecto al centro del frame
         frame_center_x = self.frame_width // 2
         frame_center_y = self.frame_height // 2
         
-        target_x = largest_detection['center_x']
-        target_y = largest_detection['center_y']
+        target_x = int(target['center_x'])
+        target_y = int(target['center_y'])
         
         # Calcular diferencias
         dx = target_x - frame_center_x
@@ -195,30 +246,40 @@ class WasteDetectionSystem:
                 command = "turn_right"
             else:
                 command = "turn_left"
-        elif largest_detection['area'] < 10000:  # Si el objeto es pequeño (lejano)
+        elif target['area'] < 10000:  # Si el objeto es pequeño (lejano)
             command = "move_forward"
         else:
             command = "stop"  # Objeto cerca, detener para recolectar
         
         return {
             'command': command,
-            'target_info': largest_detection
+            'target_info': target
         }
     
+    def _collect_metrics(self):
+        values = {'scene_skip_ratio': self.gated_detector.stats()['skip_ratio']}
+        if hasattr(self, 'grabber'):
+            frames = self.grabber.stats()
+            values.update(frames_captured_total=frames['captured'], frames_dropped_total=frames['dropped'],
+                          read_failures_total=frames['read_failures'])
+        return values
+    
     def draw_detections(self, frame, detections):
         """Dibuja las detecciones en el frame"""
-        for detection in detections:
-            x1, y1, x2, y2 = detection['bbox']
-            
+        for x1, y1, x2, y2, cx, cy, conf, class_id in zip(
+                detections['x1'].tolist(), detections['y1'].tolist(),
+                detections['x2'].tolist(), detections['y2'].tolist(),
+                detections['center_x'].tolist(), detections['center_y'].tolist(),
+                detections['confidence'].tolist(), detections['class_id'].tolist()):
             # Dibujar rectángulo
             cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
             
             # Dibujar etiqueta
-            label = f"{detection['class_name']}: {detection['confidence']:.2f}"
+            label = f"{self.class_names[class_id]}: {conf:.2f}"
             cv2.putText(frame, label, (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
             
             # Dibujar punto central
-            cv2.circle(frame, (detection['center_x'], detection['center_y']), 5, (0, 0, 255), -1)
+            cv2.circle(frame, (cx, cy), 5, (0, 0, 255), -1)
         
         # Dibujar líneas de referencia
         cv2.line(frame, (self.frame_width//2, 0), (self.frame_width//2, self.frame_height), (255, 0, 0), 1)
@@ -226,58 +287,100 @@ class WasteDetectionSystem:
         
         return frame
     
+    def render(self, frame, detections):
+        """Dibuja y muestra el frame; devuelve False si se pidió salir con 'q'"""
+        publish = self.debug_stream is not None and self.debug_stream.wants_frame()
+        if self.headless and not publish:
+            return True  # Nadie mira: no se dibuja ni se copia el frame
+        
+        # Dibujar detecciones en el frame
+        frame_with_detections = self.draw_detections(self.buffers.copy("dibujo", frame), detections)
+        if publish:
+            self.debug_stream.publish(frame_with_detections)
+        if self.headless:
+            return True
+        
+        # Mostrar video con detecciones
+        cv2.imshow('Robot Waste Detection', frame_with_detections)
+        
+        # Control de salida
+        return cv2.waitKey(1) & 0xFF != ord('q')
+    
     def run(self):
         """Ejecuta el sistema principal"""
-        if not self.connect_to_video_stream():
+        with self.startup.phase("stream"), self.metrics.time("connect"):
+            connected = self.connect_to_video_stream()
+        if not connected:
             return
+        print(self.startup.report())
         
         self.running = True
         print("Iniciando detección de desechos...")
+        if self.debug_stream is not None:
+            self.debug_stream.start()
+        if self.metrics_server is not None:
+            self.metrics_server.start()
+        if self.metrics_log is not None:
+            self.metrics_log.start()
+        install_signal_trigger(self.profiler)
         
         try:
             while self.running:
-                ret, frame = self.cap.read()
+                ret, frame = self.grabber.read()
                 if not ret:
+                    if self.grabber.running:
+                        continue  # aún no llega un frame nuevo
                     print("Error leyendo frame")
                     break
                 
-                # Detectar desechos
-                detections = self.detect_waste(frame)
+                # Detectar desechos (se salta YOLO si la escena no cambió)
+                detections = self.gated_detector(frame)
+                self.frames_processed.inc()
+                self._frame_index = self.grabber.frame_index
+                if self.recorder is not None:
+                    self.recorder.write_event("detections", self._frame_index,
+                                              detections=detections_to_json(detections, self.class_names))
                 
-                # Agregar a historial para suavizar
-                self.detection_history.append(detections)
+                # Agregar a historial para suavizar y calcular el movimiento
+                with self.metrics.time("smoothing"):
+                    self.smoother.push(detections)
+                    movement = None
+                    smoothed_detections = None
+                    # Calcular movimiento sólo si tenemos suficiente historial
+                    if self.smoother.ready():
+                        # Usar las detecciones suavizadas
+                        smoothed_detections = self.get_smoothed_detections()
+                        if len(smoothed_detections):
+                            movement = self.calculate_movement_direction(smoothed_detections)
                 
-                # Calcular movimiento sólo si tenemos suficiente historial
-                if len(self.detection_history) >= 3:
-                    # Usar las detecciones suavizadas
-                    smoothed_detections = self.get_smoothed_detections(k=3)
-                    
-                    if smoothed_detections:
-                        movement = self.calculate_movement_direction(smoothed_detections)
-                        
+                command = None
+                sent = False
+                if smoothed_detections is not None:
+                    with self.metrics.time("command"):
                         if movement:
                             # Enviar comando al ESP32
-                            self.send_command_to_esp32(movement['command'])
+                            command = movement['command']
+                            sent = self.send_command_to_esp32(command, self.grabber.frame_time)
                             
-                            # Mostrar información
+                            # Mostrar información (nivel DEBUG: una línea por frame)
                             target = movement['target_info']
-                            print(f"Objetivo: {target['class_name']} - Comando: {movement['command']}")
-                    else:
-                        # No hay detecciones, buscar
-                        self.send_command_to_esp32("search")
-                
-                # Dibujar detecciones en el frame
-                frame_with_detections = self.draw_detections(frame.copy(), detections)
+                            logger.debug("Objetivo: %s - Comando: %s",
+                                         self.class_names[int(target['class_id'])], movement['command'])
+                        elif not len(smoothed_detections):
+                            # No hay detecciones, buscar
+                            command = "search"
+                            sent = self.send_command_to_esp32(command, self.grabber.frame_time)
                 
-                # Mostrar video con detecciones
-                cv2.imshow('Robot Waste Detection', frame_with_detections)
+                if self.telemetry is not None:
+                    with self.metrics.time("telemetry"):
+                        self.telemetry.log(self._frame_index, detections,
+                                           target=movement['target_info'] if movement else None,
+                                           command=command, sent=sent,
+                                           captured_at=self.grabber.frame_time)
                 
-                # Control de salida
-                if cv2.waitKey(1) & 0xFF == ord('q'):
+                # Dibujar y mostrar (o publicar en el stream de depuración)
+                if not self.render(frame, detections):
                     break
-                
-                # Pequeña pausa para no sobrecargar
-                time.sleep(0.1)
         
         except KeyboardInterrupt:
             print("Deteniendo sistema...")
@@ -288,20 +391,44 @@ class WasteDetectionSystem:
     def stop(self):
         """Detiene el sistema"""
         self.running = False
-        if hasattr(self, 'cap'):
+        if hasattr(self, 'grabber'):
+            self.grabber.stop()
+            print(f"Frames: {self.grabber.stats()}")
+            print(f"Comandos viejos: {self.deadline.stats()}")
+            if hasattr(self.cap, "stats"):
+                print(f"Stream: {self.cap.stats()}")
+        elif hasattr(self, 'cap'):
             self.cap.release()
+        print(f"Escena estática: {self.gated_detector.stats()}")
+        if self.debug_stream is not None:
+            self.debug_stream.stop()
+        if self.metrics_log is not None:
+            self.metrics_log.stop()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
         # Asegura que sólo se destruya la ventana si fue abierta
-        try:
-            cv2.destroyAllWindows()
-        except Exception as e:
-            print(f"Error cerrando ventanas de OpenCV: {e}")
+        if not self.headless:
+            try:
+                cv2.destroyAllWindows()
+            except Exception as e:
+                print(f"Error cerrando ventanas de OpenCV: {e}")
         
         # Enviar comando de parar al robot
         self.send_command_to_esp32("stop")
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.telemetry is not None:
+            self.telemetry.close()
+            print(f"Telemetría: {self.telemetry.stats()}")
+        if self.profiler.active:
+            # El perfil en curso igual se escribe
+            self.profiler.stop()
+            self.profiler.wait(2.0)
         print("Sistema detenido")
 
 def main():
     """Función principal"""
+    configure_logging()  # ECOBOT_LOG_LEVEL=DEBUG muestra el detalle de cada frame
     print("=== Robot Recolector de Desechos ===")
     print("Configurando sistema...")
     
@@ -1,108 +1,221 @@
 import cv2
+import logging
 import numpy as np
-from ultralytics import YOLO
-import requests
 import time
 from collections import deque
-from datetime import datetime
+
+from buffer_pool import BufferPool
+from command_sender import CommandSender, FrameDeadline, HttpTransport, UdpTransport
+from debug_stream import MjpegDebugServer
+from detections import best_target
+from frame_grabber import LatestFrameGrabber
+from inference_backend import load_backend
+from metrics import Metrics, MetricsServer, PeriodicMetricsLog, configure_logging
+from mjpeg_stream import open_stream
+from motion_gate import GatedDetector, SceneChangeGate
+from pipeline import BoundedQueue, Pipeline, PipelineStage, QueueClosed, StopPipeline
+from process_pool import ProcessInferencePool
+from profiler import SamplingProfiler, install_signal_trigger
+from recording import FrameRecorder, detections_to_json, open_replay
+from roi import AdaptiveRoi
+from startup import StartupTimer
+from telemetry import TelemetryWriter
+from tracker import TrackedDetector
+
+logger = logging.getLogger("ecobot.serverIA2")
 
 class WasteDetectionSystem:
     VALID_COMMANDS = {"FORWARD", "LEFT", "RIGHT", "STOP", "COLLECT"}
 
-    def __init__(self, phone_ip="192.168.0.101", phone_port=8080, esp32_ip="192.168.1.101", esp32_port=80):
+    def __init__(self, phone_ip="192.168.0.101", phone_port=8080, esp32_ip="192.168.1.101", esp32_port=80,
+                 transport="http", udp_port=4210, runtime="auto", precision="fp32", warmup_passes=2,
+                 detect_every=3, scene_change_threshold=6.0, floor_roi=None, search_imgsz=320,
+                 headless=False, debug_port=None, record_path=None, replay_path=None, replay_speed=1.0,
+                 metrics_port=None, metrics_log_interval=10.0, backend=None, inference_workers=0,
+                 stream_client="mjpeg", latency_budget=0.5, stale_policy="stop",
+                 telemetry_dir=None, profile_dir="perfiles"):
         self.phone_ip = phone_ip
         self.phone_port = phone_port
         self.esp32_ip = esp32_ip
         self.esp32_port = esp32_port
 
         self.video_url = f"http://{phone_ip}:{phone_port}/video"
-        self.esp32_command_url = f"http://{esp32_ip}/command"
-
-        print("Cargando modelo YOLO...")
-        self.model = YOLO('last.pt')
-        print(self.model.names)
+        # Cliente MJPEG propio (reconexión, decodificación JPEG reducida); "opencv" usa cv2.VideoCapture
+        self.stream_client = stream_client
+        # Grabación (.ecorec) del stream en vivo, o reproducción de una grabación o video en su lugar.
+        # replay_speed=None reproduce tan rápido como se pueda, sin descartar frames.
+        self.record_path = record_path
+        self.replay_path = replay_path
+        self.replay_speed = replay_speed
+        self.recorder = None
+        # Telemetría binaria por frame (.ecotlm): detecciones, objetivo y comando, leída con telemetry.read_telemetry
+        self.telemetry = TelemetryWriter(telemetry_dir) if telemetry_dir else None
+        self.esp32_command_url = f"http://{esp32_ip}:{esp32_port}/command"
+        # Latencia por etapa, frames descartados y RTT de comandos: /metrics y una línea JSON periódica
+        self.metrics = Metrics()
+        # Perfil por muestreo a pedido (kill -USR2 <pid> o /profile?seconds=N en el puerto de métricas)
+        self.profiler = SamplingProfiler(profile_dir)
+        self.metrics_server = (MetricsServer(self.metrics, port=metrics_port, profiler=self.profiler)
+                               if metrics_port else None)
+        self.metrics_log = PeriodicMetricsLog(self.metrics, metrics_log_interval) if metrics_log_interval else None
+        self.frames_processed = self.metrics.counter("frames_processed_total")
+        self.metrics.add_collector(self._collect_metrics)
+        # Antigüedad máxima (s) del frame al enviar su comando: si se pasa, el comando se descarta
+        # (stale_policy="drop") o se cambia por STOP. Al reproducir lo más rápido posible sólo se mide.
+        as_fast_replay = replay_path is not None and replay_speed is None
+        self.deadline = FrameDeadline(None if as_fast_replay else latency_budget, stale_policy, self.metrics)
+        if transport == "udp":
+            # Datagramas con secuencia + heartbeat: se puede enviar a la tasa de frames
+            self.command_sender = CommandSender(UdpTransport(esp32_ip, udp_port), heartbeat_interval=0.2,
+                                                metrics=self.metrics, deadline=self.deadline).start()
+            command_interval = 0.0
+        else:
+            self.command_sender = CommandSender(HttpTransport(self.esp32_command_url, timeout=2),
+                                                metrics=self.metrics, deadline=self.deadline).start()
+            command_interval = 1.0
 
         self.confidence_threshold = 0.3
         self.frame_width = 640
         self.frame_height = 480
 
+        self.startup = StartupTimer()
+        self.inference_pool = None
+        if inference_workers:
+            # N procesos con su propio modelo (cada uno hace su warm-up); este proceso no carga ninguno
+            print(f"Iniciando {inference_workers} procesos de inferencia...")
+            with self.startup.phase("modelo"):
+                self.inference_pool = ProcessInferencePool(
+                    'last.pt', runtime=runtime, precision=precision, workers=inference_workers,
+                    frame_shape=(self.frame_height, self.frame_width, 3),
+                    confidence_threshold=self.confidence_threshold)
+            self.backend = None
+            self.class_names = self.inference_pool.names
+        elif backend is None:
+            print("Cargando modelo YOLO...")
+            with self.startup.phase("modelo"):
+                # Los modelos exportados tienen tamaño fijo: se exporta también uno a la resolución de búsqueda
+                self.backend = load_backend('last.pt', runtime=runtime, precision=precision,
+                                            extra_imgsz=(search_imgsz,))
+        else:
+            # Modelo compartido (p. ej. fleet.EngineClient): no se carga otra copia
+            self.backend = backend
+        if self.backend is not None:
+            self.class_names = self.backend.names
+        print(self.class_names)
+
+        # ROI del suelo a baja resolución al buscar; recorte alrededor del objetivo al acercarse
+        self.roi = AdaptiveRoi(floor_roi, search_imgsz=search_imgsz, approach_imgsz=self.frame_width)
+        # La primera inferencia paga la inicialización perezosa: se hace antes de conectar
+        if self.backend is not None:
+            with self.startup.phase("warm-up"):
+                self.backend.warmup(warmup_passes, (self.frame_height, self.frame_width, 3))
+
         self.detection_history = deque(maxlen=5)
+        # Si la escena no cambió (robot detenido o recolectando) se reutilizan las detecciones
+        self.gated_detector = GatedDetector(self.detect_waste, SceneChangeGate(scene_change_threshold))
+        # YOLO corre cada `detect_every` frames; entre medio el tracker predice las cajas
+        self.tracked_detector = TrackedDetector(self.gated_detector, detect_every=detect_every,
+                                                min_confidence=self.confidence_threshold)
+        self.target_track_id = None
+        self.current_target = None
         self.running = False
         self._last_command = None
+        self.command_interval = command_interval  # segundos entre comandos
+        # Buffers reutilizados entre frames: "entrada" (hilo de inferencia) y "dibujo" (hilo principal)
+        self.buffers = BufferPool()
+        # Sin ventana: no se dibuja nada salvo que haya un cliente en el stream de depuración
+        self.headless = headless
+        self.debug_stream = MjpegDebugServer(port=debug_port) if debug_port else None
+        self._last_command_time = 0
 
         print("Sistema inicializado correctamente")
 
     def connect_to_video_stream(self):
         try:
-            self.cap = cv2.VideoCapture(self.video_url)
+            source = self.replay_path or self.video_url
+            if self.replay_path:
+                self.cap = open_replay(self.replay_path, self.replay_speed)
+            else:
+                self.cap = open_stream(self.video_url, self.stream_client)
             if not self.cap.isOpened():
                 raise Exception("No se pudo conectar al stream de video")
             self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.frame_width)
             self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.frame_height)
-            print(f"Conectado al stream de video: {self.video_url}")
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            if self.record_path:
+                self.recorder = FrameRecorder(self.record_path)
+            drop_frames = not (self.replay_path and self.replay_speed is None)
+            self.grabber = LatestFrameGrabber(self.cap, drop_frames=drop_frames, recorder=self.recorder,
+                                              metrics=self.metrics).start()
+            print(f"Conectado al stream de video: {source}")
             return True
         except Exception as e:
             print(f"Error conectando al video: {e}")
             return False
 
-    def send_command_to_esp32(self, command):
-        if self._last_command == command:
-            return
+    def send_command_to_esp32(self, command, frame_index=None, captured_at=None):
+        """
+        Programa el envío del comando; devuelve False si no se envía por repetido. El presupuesto
+        de antigüedad se aplica después, al despacharlo (ver FrameDeadline y CommandSender.stats).
+        """
+        if self._last_command == command and self.command_sender.last_command == command:
+            # Ya enviado: sólo se renueva la antigüedad que controlan los heartbeats
+            self.command_sender.confirm(command, captured_at)
+            return False
         if command not in self.VALID_COMMANDS:
             command = "STOP"
         self._last_command = command
-        print(f"Comando enviado: {command}")
-        try:
-            payload = {"command": command, "timestamp": datetime.now().isoformat()}
-            response = requests.post(self.esp32_command_url, json=payload, timeout=2)
-            if response.status_code == 200:
-                print(f"Comando {command} enviado correctamente")
-            else:
-                print(f"Error enviando comando: {response.status_code}")
-        except Exception as e:
-            print(f"Error comunicando con ESP32: {e}")
+        logger.info("Comando enviado: %s", command)
+        if self.recorder is not None:
+            self.recorder.write_event("command", frame_index, command=command)
+        # No bloquea: el hilo de envío reutiliza la conexión y descarta comandos superados
+        with self.metrics.time("command"):
+            self.command_sender.send(command, captured_at)
+        return True
 
     def detect_waste(self, frame):
-        if frame.shape[1] != self.frame_width or frame.shape[0] != self.frame_height:
-            frame = cv2.resize(frame, (self.frame_width, self.frame_height))
-        results = self.model(frame, conf=self.confidence_threshold)
-        detections = []
-        for result in results:
-            boxes = result.boxes
-            if boxes is not None:
-                for box in boxes:
-                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                    confidence = box.conf[0].cpu().numpy()
-                    class_id = int(box.cls[0].cpu().numpy())
-                    class_name = self.model.names[class_id]
-                    if confidence > self.confidence_threshold:
-                        center_x = int((x1 + x2) / 2)
-                        center_y = int((y1 + y2) / 2)
-                        width = int(x2 - x1)
-                        height = int(y2 - y1)
-                        area = width * height
-                        detection = {
-                            'class_name': class_name,
-                            'confidence': confidence,
-                            'center_x': center_x,
-                            'center_y': center_y,
-                            'width': width,
-                            'height': height,
-                            'area': area,
-                            'bbox': (int(x1), int(y1), int(x2), int(y2))
-                        }
-                        detections.append(detection)
-        return detections
+        with self.metrics.time("detect"):
+            if frame.shape[1] != self.frame_width or frame.shape[0] != self.frame_height:
+                frame = self.buffers.resize("entrada", frame, (self.frame_width, self.frame_height))
+            # Arreglo estructurado (ver detections.DETECTION_DTYPE), una fila por objeto,
+            # con las cajas en coordenadas del frame aunque se infiera sobre un recorte
+            return self.roi.detect(self._detect_region, frame)
+
+    def _detect_region(self, crop, imgsz):
+        return self.backend.detect(crop, self.confidence_threshold, imgsz)
+
+    def select_target(self, detections):
+        # Mantiene el objetivo mientras su track siga vivo, para no saltar entre objetos:
+        # si el detector lo pierde en un frame se usa la caja predicha por el tracker, y
+        # sólo se suelta cuando el tracker elimina el track (más de max_missed frames)
+        if self.target_track_id is not None:
+            locked = detections[detections['track_id'] == self.target_track_id]
+            if len(locked):
+                return locked[0]
+            predicted = self.tracked_detector.tracker.get(self.target_track_id)
+            if predicted is not None:
+                return predicted
+        # Prioriza área y cercanía al fondo (más robusto)
+        best_detection = best_target(detections, self.frame_height)
+        if best_detection is None or best_detection['track_id'] < 0:
+            self.target_track_id = None
+        else:
+            self.target_track_id = int(best_detection['track_id'])
+        return best_detection
+
+    def update_roi(self, target):
+        if target is None:
+            self.roi.set_target(None)
+        else:
+            self.roi.set_target((int(target['x1']), int(target['y1']), int(target['x2']), int(target['y2'])))
 
     def calculate_movement_command(self, detections):
-        if not detections:
+        best_detection = self.select_target(detections)
+        self.current_target = best_detection
+        self.update_roi(best_detection)
+        if best_detection is None:
             return "STOP"
-        # Prioriza área y cercanía al fondo (más robusto)
-        best_detection = max(
-            detections,
-            key=lambda d: d['area'] * (1 + (self.frame_height - d['center_y']) / self.frame_height)
-        )
-        cx, cy = best_detection['center_x'], best_detection['center_y']
+        cx, cy = int(best_detection['center_x']), int(best_detection['center_y'])
         frame_center_x = self.frame_width // 2
         tolerance_x = 50
         tolerance_y = 100
@@ -116,44 +229,171 @@ class WasteDetectionSystem:
             return "FORWARD"
 
     def draw_detections(self, frame, detections):
-        for detection in detections:
-            x1, y1, x2, y2 = detection['bbox']
+        for x1, y1, x2, y2, cx, cy, conf, class_id in zip(
+                detections['x1'].tolist(), detections['y1'].tolist(),
+                detections['x2'].tolist(), detections['y2'].tolist(),
+                detections['center_x'].tolist(), detections['center_y'].tolist(),
+                detections['confidence'].tolist(), detections['class_id'].tolist()):
             cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-            label = f"{detection['class_name']}: {detection['confidence']:.2f}"
+            label = f"{self.class_names[class_id]}: {conf:.2f}"
             cv2.putText(frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-            cv2.circle(frame, (detection['center_x'], detection['center_y']), 5, (0, 0, 255), -1)
+            cv2.circle(frame, (cx, cy), 5, (0, 0, 255), -1)
         h, w = frame.shape[:2]
         cv2.line(frame, (w // 2, 0), (w // 2, h), (255, 0, 0), 1)
         cv2.line(frame, (0, h - 100), (w, h - 100), (255, 0, 0), 1)
         return frame
 
+    def render(self, frame, detections):
+        """Dibuja y muestra el frame; devuelve False si se pidió salir con 'q'"""
+        publish = self.debug_stream is not None and self.debug_stream.wants_frame()
+        if self.headless and not publish:
+            return True
+        frame_with_detections = self.draw_detections(self.buffers.copy("dibujo", frame), detections)
+        if publish:
+            self.debug_stream.publish(frame_with_detections)
+        if self.headless:
+            return True
+        cv2.imshow('Robot Waste Detection', frame_with_detections)
+        return cv2.waitKey(1) & 0xFF != ord('q')
+
+    def _inference_stage(self):
+        ret, frame = self.grabber.read()
+        if not ret:
+            if self.grabber.running:
+                return None  # aún no llega un frame nuevo
+            print("Error leyendo frame")
+            raise StopPipeline()
+        # Detección real o predicción del tracker, según el frame
+        with self.metrics.time("tracking"):
+            detections = self.tracked_detector(frame)
+        self.frames_processed.inc()
+        frame_index = self.grabber.frame_index
+        if self.recorder is not None:
+            self.recorder.write_event("detections", frame_index,
+                                      detections=detections_to_json(detections, self.class_names))
+        # El instante de captura viaja con el resultado hasta el envío del comando
+        return frame, detections, frame_index, self.grabber.frame_time
+
+    def _dispatch_stage(self):
+        # Modo multiproceso: la captura sólo copia el frame al anillo de memoria compartida
+        ret, frame = self.grabber.read()
+        if not ret:
+            if self.grabber.running:
+                return None
+            print("Error leyendo frame")
+            self.inference_pool.close_input()
+            raise StopPipeline()
+        if frame.shape[1] != self.frame_width or frame.shape[0] != self.frame_height:
+            # Sin BufferPool: el pool guarda este mismo arreglo para entregarlo con su resultado
+            # al hilo de visualización, así que no puede reutilizarse en el próximo frame
+            frame = cv2.resize(frame, (self.frame_width, self.frame_height))
+        seq = self.inference_pool.submit(frame, block=not self.grabber.drop_frames,
+                                         frame_index=self.grabber.frame_index,
+                                         captured_at=self.grabber.frame_time)
+        if seq is None:
+            print("El pool de inferencia no puede seguir")
+            raise StopPipeline()
+        return None
+
+    def _pool_result_stage(self):
+        item = self.inference_pool.get(timeout=0.5)
+        if item is None:
+            if self.inference_pool.finished() or self.inference_pool.broken:
+                raise StopPipeline()
+            return None
+        _, frame, detections, frame_index, captured_at = item
+        # Los procesos detectan sobre el frame completo; el tracker sólo asigna ids
+        # para que select_target mantenga el objetivo
+        with self.metrics.time("tracking"):
+            detections = self.tracked_detector.tracker.update(detections)
+        self.frames_processed.inc()
+        if self.recorder is not None:
+            self.recorder.write_event("detections", frame_index,
+                                      detections=detections_to_json(detections, self.class_names))
+        return frame, detections, frame_index, captured_at
+
+    def _control_stage(self, item):
+        _, detections, frame_index, captured_at = item
+        with self.metrics.time("control"):
+            command = self.calculate_movement_command(detections)
+        current_time = time.time()
+        sent = False
+        if current_time - self._last_command_time > self.command_interval:
+            sent = self.send_command_to_esp32(command, frame_index, captured_at)
+            self._last_command_time = current_time
+        if self.telemetry is not None:
+            with self.metrics.time("telemetry"):
+                self.telemetry.log(frame_index, detections, target=self.current_target, command=command,
+                                   sent=sent, captured_at=captured_at)
+
+    def _collect_metrics(self):
+        values = {}
+        if hasattr(self, 'grabber'):
+            frames = self.grabber.stats()
+            values.update(frames_captured_total=frames['captured'], frames_dropped_total=frames['dropped'],
+                          read_failures_total=frames['read_failures'])
+        if hasattr(self, 'pipeline'):
+            values['queue_dropped_total'] = self.control_queue.dropped + self.display_queue.dropped
+        values['commands_coalesced_total'] = self.command_sender.coalesced
+        if self.inference_pool is not None:
+            pool = self.inference_pool.stats()
+            values.update(pool_replaced_total=pool['replaced'], pool_stale_total=pool['stale'],
+                          pool_failed_total=pool['failed'], pool_workers_alive=pool['alive'])
+        values['scene_skip_ratio'] = self.gated_detector.stats()['skip_ratio']
+        return values
+
+    def build_pipeline(self):
+        # captura (LatestFrameGrabber) → inferencia → control / visualización
+        # Las colas guardan sólo el resultado más reciente: una etapa lenta descarta
+        # resultados viejos en lugar de frenar a la inferencia.
+        # Al reproducir sin descartar frames, el control tampoco descarta resultados (reproducible)
+        control_policy = 'drop_oldest' if self.grabber.drop_frames else 'block'
+        self.control_queue = BoundedQueue(maxsize=1, policy=control_policy, name="cola-control")
+        self.display_queue = BoundedQueue(maxsize=1, policy='drop_oldest', name="cola-display")
+        if self.inference_pool is None:
+            stages = [
+                PipelineStage("inferencia", self._inference_stage,
+                              outboxes=(self.control_queue, self.display_queue)),
+            ]
+        else:
+            # captura → anillo compartido → N procesos → resultados en orden de secuencia
+            stages = [
+                PipelineStage("despacho", self._dispatch_stage),
+                PipelineStage("inferencia", self._pool_result_stage,
+                              outboxes=(self.control_queue, self.display_queue)),
+            ]
+        stages.append(PipelineStage("control", self._control_stage, inbox=self.control_queue))
+        return Pipeline(stages, queues=(self.control_queue, self.display_queue))
+
     def run(self):
-        if not self.connect_to_video_stream():
+        with self.startup.phase("stream"), self.metrics.time("connect"):
+            connected = self.connect_to_video_stream()
+        if not connected:
             return
+        print(self.startup.report())
         self.running = True
         print("Iniciando detección de desechos...")
 
+        self._last_command_time = 0
+        if self.debug_stream is not None:
+            self.debug_stream.start()
+        if self.metrics_server is not None:
+            self.metrics_server.start()
+        if self.metrics_log is not None:
+            self.metrics_log.start()
+        install_signal_trigger(self.profiler)
+        self.pipeline = self.build_pipeline().start()
         try:
-            last_command_time = 0
-            command_interval = 1.0  # segundos entre comandos
+            # La visualización queda en el hilo principal (requisito de cv2.imshow)
             while self.running:
-                ret, frame = self.cap.read()
-                if not ret:
-                    print("Error leyendo frame")
+                item = self.display_queue.get(timeout=0.5)
+                if item is None:
+                    continue
+                frame, detections = item[:2]
+                if not self.render(frame, detections):
                     break
-                detections = self.detect_waste(frame)
-                command = self.calculate_movement_command(detections)
-                current_time = time.time()
-                if current_time - last_command_time > command_interval:
-                    self.send_command_to_esp32(command)
-                    last_command_time = current_time
-
-                frame_with_detections = self.draw_detections(frame.copy(), detections)
-                cv2.imshow('Robot Waste Detection', frame_with_detections)
-
-                if cv2.waitKey(1) & 0xFF == ord('q'):
-                    break
-                time.sleep(0.05)
+        except QueueClosed:
+            pass
         except KeyboardInterrupt:
             print("Deteniendo sistema...")
         finally:
@@ -161,23 +401,61 @@ class WasteDetectionSystem:
 
     def stop(self):
         self.running = False
-        if hasattr(self, 'cap'):
+        if hasattr(self, 'pipeline'):
+            self.pipeline.stop()
+            print(f"Pipeline: {self.pipeline.stats()}")
+            print(f"Tracker: {self.tracked_detector.stats()}")
+            print(f"Escena estática: {self.gated_detector.stats()}")
+            print(f"ROI: {self.roi.stats()}")
+        if self.inference_pool is not None:
+            print(f"Procesos de inferencia: {self.inference_pool.stats()}")
+            self.inference_pool.stop()
+        if hasattr(self, 'grabber'):
+            self.grabber.stop()
+            print(f"Frames: {self.grabber.stats()}")
+            if hasattr(self.cap, "stats"):
+                print(f"Stream: {self.cap.stats()}")
+        elif hasattr(self, 'cap'):
             self.cap.release()
-        try:
-            cv2.destroyAllWindows()
-        except Exception as e:
-            print(f"Error cerrando ventanas de OpenCV: {e}")
+        if self.debug_stream is not None:
+            self.debug_stream.stop()
+        if self.metrics_log is not None:
+            self.metrics_log.stop()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+        if not self.headless:
+            try:
+                cv2.destroyAllWindows()
+            except Exception as e:
+                print(f"Error cerrando ventanas de OpenCV: {e}")
         self.send_command_to_esp32("STOP")
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.telemetry is not None:
+            self.telemetry.close()
+            print(f"Telemetría: {self.telemetry.stats()}")
+        self.command_sender.stop()
+        print(f"Comandos: {self.command_sender.stats()}")
+        if self.profiler.active:
+            # El perfil en curso igual se escribe
+            self.profiler.stop()
+            self.profiler.wait(2.0)
         print("Sistema detenido")
 
 def main():
+    configure_logging()  # ECOBOT_LOG_LEVEL=DEBUG muestra el detalle de cada frame
     PHONE_IP = "192.168.0.101"
     ESP32_IP = "192.168.1.101"
     waste_detector = WasteDetectionSystem(
         phone_ip=PHONE_IP,
         phone_port=8080,
         esp32_ip=ESP32_IP,
-        esp32_port=80
+        esp32_port=80,
+        transport="http",  # "udp" para el canal de baja latencia (ecobot2.ino)
+        headless=False,  # True en producción; debug_port=8090 sirve el video anotado
+        debug_port=None,
+        metrics_port=None,  # 9100 expone /metrics para Prometheus
+        inference_workers=0  # >0: inferencia en N procesos con memoria compartida (CPU de muchos núcleos)
     )
     print("Presiona 'q' para salir")
     waste_detector.run()
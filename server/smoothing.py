@@ -0,0 +1,94 @@
+from collections import deque
+
+import numpy as np
+
+from detections import empty_detections, largest_detection
+
+
+class TemporalSmoother:
+    """
+    Suavizado temporal incremental de detecciones.
+
+    Mantiene el conteo de clases de los últimos `k` frames actualizándolo al agregar
+    un frame y al sacar el que queda fuera de la ventana (O(detecciones) por frame),
+    y un promedio exponencial del centro del objetivo para filtrar el jitter.
+    """
+
+    def __init__(self, k=3, history_size=5, alpha=0.5, max_jump=80):
+        """
+        Args:
+            k: frames que se consideran para elegir la clase dominante
+            history_size: frames que se guardan en el historial (deque(maxlen=history_size))
+            alpha: peso del centro nuevo en el promedio exponencial (0-1)
+            max_jump: distancia en píxeles a partir de la cual se considera otro objetivo
+        """
+        self.k = k
+        self.alpha = alpha
+        self.max_jump = max_jump
+        self.history = deque(maxlen=max(k, history_size))
+        self.class_counts = {}
+
+        # Objetivo estable
+        self._target_class = None
+        self._target_center = None
+
+    def __len__(self):
+        return len(self.history)
+
+    def ready(self):
+        return len(self.history) >= self.k
+
+    def _count(self, detections, delta):
+        for class_id in detections['class_id'].tolist():
+            count = self.class_counts.get(class_id, 0) + delta
+            if count:
+                self.class_counts[class_id] = count
+            else:
+                del self.class_counts[class_id]
+
+    def push(self, detections):
+        """Agrega las detecciones de un frame y actualiza los conteos de la ventana"""
+        if len(self.history) >= self.k:
+            # El frame que sale de la ventana de k frames
+            self._count(self.history[-self.k], -1)
+        self.history.append(detections)
+        self._count(detections, +1)
+
+    def smoothed(self):
+        """
+        Detecciones del último frame cuya clase es la más frecuente en los últimos k frames
+        (o todo el último frame si ninguna coincide), igual que el antiguo get_smoothed_detections.
+        """
+        if not self.ready():
+            return empty_detections()
+        last = self.history[-1]
+        if not self.class_counts or len(last) == 0:
+            return last
+        top = max(self.class_counts.values())
+        most_common = [c for c, v in self.class_counts.items() if v == top]
+        filtered = last[np.isin(last['class_id'], most_common)]
+        return filtered if len(filtered) else last
+
+    def stable_target(self, detections):
+        """
+        Devuelve la detección más grande con su centro filtrado por promedio exponencial.
+        Si cambia la clase o el centro salta más de `max_jump` píxeles, el filtro se reinicia.
+        """
+        target = largest_detection(detections)
+        if target is None:
+            self._target_class = None
+            self._target_center = None
+            return None
+        target = target.copy()
+        center = np.array([target['center_x'], target['center_y']], dtype=np.float32)
+        same_target = (
+            self._target_center is not None
+            and self._target_class == int(target['class_id'])
+            and np.hypot(*(center - self._target_center)) <= self.max_jump
+        )
+        if same_target:
+            center = self.alpha * center + (1 - self.alpha) * self._target_center
+        self._target_class = int(target['class_id'])
+        self._target_center = center
+        target['center_x'], target['center_y'] = int(round(center[0])), int(round(center[1]))
+        return target
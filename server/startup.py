@@ -0,0 +1,25 @@
+import time
+from contextlib import contextmanager
+
+
+class StartupTimer:
+    """Mide la duración de cada fase de arranque (carga del modelo, warm-up, conexión al stream)"""
+
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def total(self):
+        return time.perf_counter() - self.t0
+
+    def report(self):
+        parts = ", ".join(f"{name}: {1000.0 * dt:.0f} ms" for name, dt in self.phases)
+        return f"Arranque en {1000.0 * self.total():.0f} ms ({parts})"
@@ -0,0 +1,225 @@
+import argparse
+import glob
+import os
+import struct
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from detections import DETECTION_DTYPE
+
+# Formato .ecotlm: cabecera fija + registros de tamaño fijo (TELEMETRY_DTYPE), sin separadores,
+# para poder abrir el archivo con np.memmap sin parsear nada.
+#   cabecera: MAGIC (8) + tamaño del registro (uint32) + máximo de detecciones (uint32), completada a 64 bytes
+MAGIC = b"ECOTLM1\n"
+HEADER = struct.Struct("<8sII")
+HEADER_SIZE = 64
+MAX_DETECTIONS = 8
+
+
+def telemetry_dtype(max_detections=MAX_DETECTIONS):
+    """Un registro por frame; las detecciones que excedan `max_detections` se cuentan pero no se guardan"""
+    return np.dtype([
+        ('timestamp', np.float64),       # time.time() al registrar
+        ('frame_index', np.int64),
+        ('frame_age', np.float32),       # segundos desde la captura (NaN si se desconoce)
+        ('n_detections', np.uint16),     # total del frame, aunque supere max_detections
+        ('has_target', np.uint8),
+        ('sent', np.uint8),              # 1 si el comando se envió al ESP32 (no si era repetido o viejo)
+        ('command', 'S12'),
+        ('target', DETECTION_DTYPE),
+        ('detections', DETECTION_DTYPE, (max_detections,)),
+    ])
+
+
+TELEMETRY_DTYPE = telemetry_dtype()
+
+
+class TelemetryWriter:
+    """
+    Registro binario de telemetría, sólo agregado: log() copia el frame a un bloque de registros
+    preasignado (sin E/S ni asignaciones) y un hilo de fondo escribe los bloques llenos cada
+    `flush_interval` segundos. Al superar `max_bytes` se pasa a un archivo nuevo.
+
+    Si el disco no da abasto y se acaban los bloques libres, los registros se descartan
+    (dropped) en lugar de frenar el bucle de detección.
+    """
+
+    def __init__(self, directory, prefix="telemetria", max_bytes=64 * 1024 * 1024, flush_interval=0.5,
+                 block_records=256, max_blocks=16, max_detections=MAX_DETECTIONS):
+        """
+        Args:
+            directory: carpeta donde se crean los archivos .ecotlm
+            prefix: prefijo del nombre de los archivos
+            max_bytes: tamaño a partir del cual se rota a un archivo nuevo
+            flush_interval: segundos máximos entre escrituras a disco
+            block_records: registros por bloque
+            max_blocks: bloques preasignados (la memoria máxima es block_records * max_blocks registros)
+            max_detections: detecciones guardadas por frame
+        """
+        self.directory = directory
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.dtype = telemetry_dtype(max_detections)
+        self.max_detections = max_detections
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Condition()
+        self._free = deque(np.zeros(block_records, dtype=self.dtype) for _ in range(max_blocks - 1))
+        self._full = deque()          # (bloque, registros usados)
+        self._block = np.zeros(block_records, dtype=self.dtype)
+        self._count = 0
+        self._file = None
+        self._file_bytes = 0
+        self._file_number = 0
+        self.running = True
+        self.path = None
+
+        # Estadísticas
+        self.records = 0
+        self.dropped = 0
+        self.files = 0
+
+        self._open_file()
+        self._thread = threading.Thread(target=self._flush_loop, name="telemetria", daemon=True)
+        self._thread.start()
+
+    def _open_file(self):
+        if self._file is not None:
+            self._file.close()
+        self._file_number += 1
+        name = f"{self.prefix}-{time.strftime('%Y%m%d-%H%M%S')}-{self._file_number:04d}.ecotlm"
+        self.path = os.path.join(self.directory, name)
+        self._file = open(self.path, "wb")
+        header = HEADER.pack(MAGIC, self.dtype.itemsize, self.max_detections)
+        self._file.write(header.ljust(HEADER_SIZE, b"\0"))
+        self._file_bytes = HEADER_SIZE
+        self.files += 1
+
+    def log(self, frame_index, detections, target=None, command=None, sent=False, captured_at=None):
+        """Registra un frame; no bloquea en disco"""
+        with self._lock:
+            if self._count == len(self._block):
+                if not self._free:
+                    self.dropped += 1
+                    return
+                self._full.append((self._block, self._count))
+                self._block = self._free.popleft()
+                self._count = 0
+                self._lock.notify()
+            record = self._block[self._count]
+            record['timestamp'] = time.time()
+            record['frame_index'] = -1 if frame_index is None else frame_index
+            record['frame_age'] = np.nan if captured_at is None else time.monotonic() - captured_at
+            n = len(detections)
+            record['n_detections'] = n
+            kept = min(n, self.max_detections)
+            record['detections'][:kept] = detections[:kept]
+            record['detections'][kept:] = 0
+            if target is not None:
+                record['target'] = target
+                record['has_target'] = 1
+            else:
+                record['has_target'] = 0
+            record['command'] = (command or "").encode()
+            record['sent'] = sent
+            self._count += 1
+            self.records += 1
+
+    def _flush_loop(self):
+        while True:
+            with self._lock:
+                self._lock.wait_for(lambda: self._full or not self.running, self.flush_interval)
+                if self._count:
+                    # Lo acumulado en el bloque activo también sale, para no retrasar más de flush_interval
+                    if self._free:
+                        self._full.append((self._block, self._count))
+                        self._block = self._free.popleft()
+                        self._count = 0
+                pending = list(self._full)
+                self._full.clear()
+                running = self.running
+            for block, count in pending:
+                self._write(block[:count])
+                with self._lock:
+                    self._free.append(block)
+            if pending:
+                self._file.flush()
+            if not running:
+                break
+
+    def _write(self, records):
+        if self._file_bytes + records.nbytes > self.max_bytes and self._file_bytes > HEADER_SIZE:
+            self._open_file()
+        records.tofile(self._file)
+        self._file_bytes += records.nbytes
+
+    def stats(self):
+        return {'records': self.records, 'dropped': self.dropped, 'files': self.files, 'path': self.path}
+
+    def close(self):
+        with self._lock:
+            self.running = False
+            self._lock.notify_all()
+        self._thread.join(timeout=5.0)
+        with self._lock:
+            if self._count:
+                self._write(self._block[:self._count])
+                self._count = 0
+        self._file.close()
+
+
+def open_telemetry(path):
+    """Registros de un archivo .ecotlm como np.memmap de sólo lectura (un registro parcial al final se ignora)"""
+    with open(path, "rb") as f:
+        magic, itemsize, max_detections = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC:
+        raise ValueError(f"{path} no es un archivo de telemetría .ecotlm")
+    dtype = telemetry_dtype(max_detections)
+    if dtype.itemsize != itemsize:
+        raise ValueError(f"{path}: registro de {itemsize} bytes, se esperaban {dtype.itemsize}")
+    count = (os.path.getsize(path) - HEADER_SIZE) // itemsize
+    if count <= 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", offset=HEADER_SIZE, shape=(count,))
+
+
+def read_telemetry(path):
+    """
+    Telemetría de un archivo o de todos los .ecotlm de una carpeta (en orden de creación).
+    Con un solo archivo devuelve el memmap; con varios, los concatena en memoria.
+    """
+    paths = sorted(glob.glob(os.path.join(path, "*.ecotlm"))) if os.path.isdir(path) else [path]
+    parts = [open_telemetry(p) for p in paths]
+    if len(parts) == 1:
+        return parts[0]
+    return np.concatenate(parts) if parts else np.zeros(0, dtype=TELEMETRY_DTYPE)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resumen de la telemetría binaria (.ecotlm)")
+    parser.add_argument("path", help="archivo .ecotlm o carpeta")
+    args = parser.parse_args()
+
+    records = read_telemetry(args.path)
+    print(f"Frames: {len(records)}")
+    if not len(records):
+        return
+    duration = float(records['timestamp'][-1] - records['timestamp'][0])
+    print(f"Duración: {duration:.1f} s")
+    print(f"Con detecciones: {int(np.count_nonzero(records['n_detections']))}")
+    print(f"Con objetivo: {int(np.count_nonzero(records['has_target']))}")
+    ages = records['frame_age'][~np.isnan(records['frame_age'])]
+    if len(ages):
+        p50, p95 = np.percentile(ages, [50, 95])
+        print(f"Antigüedad del frame: p50 {1000 * p50:.1f} ms, p95 {1000 * p95:.1f} ms")
+    sent = records[records['sent'] == 1]
+    commands, counts = np.unique(sent['command'], return_counts=True)
+    print("Comandos enviados: " + ", ".join(f"{c.decode()}={n}" for c, n in zip(commands, counts)))
+
+
+if __name__ == "__main__":
+    main()
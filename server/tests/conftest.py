@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Los módulos del servidor se importan planos (from x import Y), como al correrlos desde server/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
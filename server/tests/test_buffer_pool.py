@@ -0,0 +1,114 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from detections import detections_from_arrays
+from serverIA2 import WasteDetectionSystem
+
+WARMUP_FRAMES = 5
+FRAMES = 200
+
+
+class StubBackend:
+    """Backend sin modelo: siempre devuelve las mismas dos detecciones"""
+
+    names = {0: "plastic_bag", 1: "scrap_paper"}
+    dynamic_input = True
+
+    def __init__(self):
+        self.frames = []
+
+    def detect(self, frame, confidence_threshold, imgsz=None):
+        self.frames.append(frame)
+        return detections_from_arrays(np.array([[100, 200, 180, 300], [400, 100, 450, 150]], dtype=np.float32),
+                                      np.array([0.9, 0.5], dtype=np.float32), np.array([0, 1], dtype=np.int16))
+
+    def warmup(self, passes=2, frame_shape=(480, 640, 3)):
+        pass
+
+
+class CapturingStream:
+    """Reemplaza al MjpegDebugServer: siempre hay un cliente y guarda los frames publicados"""
+
+    def __init__(self):
+        self.published = []
+
+    def wants_frame(self):
+        return True
+
+    def publish(self, frame):
+        self.published.append(frame)
+
+
+@pytest.fixture
+def system():
+    system = WasteDetectionSystem(esp32_ip="127.0.0.1", esp32_port=9, headless=True, metrics_log_interval=None,
+                                  backend=StubBackend())
+    system.debug_stream = CapturingStream()
+    yield system
+    system.command_sender.stop(timeout=0.5)
+
+
+def vision_loop(system, frames, count):
+    for i in range(count):
+        frame = frames[i % len(frames)]
+        detections = system.detect_waste(frame)
+        assert system.render(frame, detections)
+
+
+@pytest.fixture
+def frames():
+    # Más grandes que 640x480 para que detect_waste tenga que redimensionar
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 255, (720, 1280, 3), dtype=np.uint8) for _ in range(4)]
+
+
+def test_no_allocations_after_warmup(system, frames):
+    pool = system.buffers
+    vision_loop(system, frames, WARMUP_FRAMES)
+    allocations = pool.allocations
+    entrada = pool.get("entrada", (480, 640, 3))
+    dibujo = system.debug_stream.published[-1]
+    system.backend.frames.clear()
+    system.debug_stream.published.clear()
+
+    vision_loop(system, frames, FRAMES)
+
+    assert pool.allocations == allocations
+    assert pool.get("entrada", (480, 640, 3)) is entrada
+    # El modelo recibe siempre el buffer "entrada" (o un recorte de él)
+    assert all(np.shares_memory(frame, entrada) for frame in system.backend.frames)
+    # render dibuja siempre sobre el mismo buffer
+    assert len(system.debug_stream.published) == FRAMES
+    assert all(frame is dibujo for frame in system.debug_stream.published)
+
+
+def test_reports_bytes_saved_per_frame(system, frames):
+    pool = system.buffers
+    vision_loop(system, frames, WARMUP_FRAMES)
+    stats = pool.stats()
+    reuses = stats['reuses']
+
+    vision_loop(system, frames, FRAMES)
+
+    stats = pool.stats()
+    per_frame = (stats['reuses'] - reuses) / FRAMES
+    # Cada frame reutiliza una vez cada buffer: "entrada" (detect_waste) y "dibujo" (render)
+    assert per_frame == stats['buffers'] == 2
+    saved = stats['bytes']
+    # El frame redimensionado para el modelo y la copia del frame original para dibujar
+    assert saved == 480 * 640 * 3 + frames[0].nbytes
+
+
+def test_steady_state_memory_is_flat(system, frames):
+    vision_loop(system, frames, WARMUP_FRAMES)
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        vision_loop(system, frames, FRAMES)
+        growth = tracemalloc.get_traced_memory()[0] - start
+    finally:
+        tracemalloc.stop()
+    # Menos que un cuarto de frame: el resto son métricas y cachés internas de numpy/OpenCV
+    assert growth < 480 * 640 * 3 // 4
@@ -0,0 +1,172 @@
+import numpy as np
+
+from detections import detection_boxes, detections_from_arrays, empty_detections, iou_matrix
+
+
+class IouTracker:
+    """
+    Tracker liviano por IoU con predicción de velocidad constante.
+
+    Cada track guarda su caja, su velocidad (px/frame) y cuántos frames lleva sin
+    confirmarse con el detector. Entre llamadas al detector las cajas se extrapolan
+    con la velocidad y la confianza decae, así se puede saltar YOLO en varios frames.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_missed=10, confidence_decay=0.9, velocity_smoothing=0.5):
+        """
+        Args:
+            iou_threshold: IoU mínimo para asociar una detección a un track
+            max_missed: frames sin confirmación antes de eliminar un track
+            confidence_decay: factor por frame aplicado a la confianza de un track no confirmado
+            velocity_smoothing: ganancia con la que el error de predicción corrige la velocidad (0-1)
+        """
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.confidence_decay = confidence_decay
+        self.velocity_smoothing = velocity_smoothing
+
+        self.boxes = np.empty((0, 4), dtype=np.float32)
+        self.velocity = np.empty((0, 4), dtype=np.float32)
+        self.ids = np.empty(0, dtype=np.int32)
+        self.class_ids = np.empty(0, dtype=np.int16)
+        self.confidence = np.empty(0, dtype=np.float32)
+        self.missed = np.empty(0, dtype=np.int32)  # frames desde la última detección
+        self._next_id = 0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def predict(self, max_missed=None):
+        """Avanza todas las cajas un frame según su velocidad y devuelve las detecciones predichas"""
+        self.boxes += self.velocity
+        self.missed += 1
+        self._drop_lost()
+        return self.current(max_missed)
+
+    def update(self, detections):
+        """
+        Asocia las detecciones del frame actual a los tracks y devuelve las detecciones
+        con track_id. Los tracks no confirmados en este frame se siguen extrapolando
+        (para reasociarlos después) pero no se devuelven.
+        """
+        # Primero se predice dónde están los tracks en este frame
+        predicted = self.boxes + self.velocity
+        det_boxes = detection_boxes(detections)
+        matched_tracks = np.zeros(len(self.ids), dtype=bool)
+        matched_dets = np.zeros(len(detections), dtype=bool)
+
+        if len(self.ids) and len(detections):
+            iou = iou_matrix(predicted, det_boxes)
+            iou[self.class_ids[:, None] != detections['class_id'][None, :]] = 0
+            # Asociación greedy por IoU descendente
+            for flat in np.argsort(iou, axis=None)[::-1]:
+                t, d = divmod(int(flat), len(detections))
+                if iou[t, d] < self.iou_threshold:
+                    break
+                if matched_tracks[t] or matched_dets[d]:
+                    continue
+                matched_tracks[t] = True
+                matched_dets[d] = True
+                # Filtro alfa-beta: la velocidad se corrige con el error de predicción
+                residual = det_boxes[d] - predicted[t]
+                self.velocity[t] += self.velocity_smoothing * residual / (self.missed[t] + 1)
+                self.boxes[t] = det_boxes[d]
+                self.confidence[t] = detections['confidence'][d]
+                self.missed[t] = 0
+
+        # Tracks sin detección: se extrapolan
+        lost = ~matched_tracks
+        self.boxes[lost] = predicted[lost]
+        self.missed[lost] += 1
+
+        # Detecciones sin track: tracks nuevos
+        new = ~matched_dets
+        n_new = int(new.sum())
+        if n_new:
+            self.boxes = np.vstack([self.boxes, det_boxes[new]])
+            self.velocity = np.vstack([self.velocity, np.zeros((n_new, 4), dtype=np.float32)])
+            self.ids = np.concatenate([self.ids, np.arange(self._next_id, self._next_id + n_new, dtype=np.int32)])
+            self.class_ids = np.concatenate([self.class_ids, detections['class_id'][new]])
+            self.confidence = np.concatenate([self.confidence, detections['confidence'][new]])
+            self.missed = np.concatenate([self.missed, np.zeros(n_new, dtype=np.int32)])
+            self._next_id += n_new
+
+        self._drop_lost()
+        return self.current(max_missed=0)
+
+    def current(self, max_missed=None):
+        """
+        Detecciones de los tracks con a lo sumo `max_missed` frames sin confirmar (todos si es None),
+        con la confianza decaída según esos frames.
+        """
+        keep = slice(None) if max_missed is None else self.missed <= max_missed
+        ids = self.ids[keep]
+        if len(ids) == 0:
+            return empty_detections()
+        missed = self.missed[keep]
+        confidence = self.confidence[keep] * self.confidence_decay ** missed
+        detections = detections_from_arrays(self.boxes[keep], confidence, self.class_ids[keep])
+        detections['track_id'] = ids
+        return detections
+
+    def get(self, track_id):
+        """Detección del track `track_id` (su caja predicha si no se confirmó en este frame), o None si ya se eliminó"""
+        index = np.flatnonzero(self.ids == track_id)
+        if len(index) == 0:
+            return None
+        return self.current()[index[0]]
+
+    def predicted_min_confidence(self, max_missed=None):
+        """Menor confianza que tendrían en el próximo frame los tracks con a lo sumo `max_missed` frames sin confirmar"""
+        confidence = self.confidence * self.confidence_decay ** (self.missed + 1)
+        if max_missed is not None:
+            confidence = confidence[self.missed <= max_missed]
+        return float(confidence.min()) if len(confidence) else 0.0
+
+    def _drop_lost(self):
+        keep = self.missed <= self.max_missed
+        if keep.all():
+            return
+        self.boxes = self.boxes[keep]
+        self.velocity = self.velocity[keep]
+        self.ids = self.ids[keep]
+        self.class_ids = self.class_ids[keep]
+        self.confidence = self.confidence[keep]
+        self.missed = self.missed[keep]
+
+
+class TrackedDetector:
+    """
+    Llama al detector sólo cada `detect_every` frames, o antes si la confianza de los
+    tracks cae bajo `min_confidence` o no hay nada que seguir; en los demás frames usa
+    las cajas predichas por el tracker.
+    """
+
+    def __init__(self, detect_fn, tracker=None, detect_every=3, min_confidence=0.3):
+        self.detect_fn = detect_fn
+        self.tracker = tracker if tracker is not None else IouTracker()
+        self.detect_every = detect_every
+        self.min_confidence = min_confidence
+        self._frames_since_detect = 0
+        self._last = None
+
+        # Estadísticas
+        self.detector_calls = 0
+        self.tracked_frames = 0
+
+    def __call__(self, frame):
+        tracked = self._frames_since_detect
+        if (self._last is not None and len(self._last) and tracked + 1 < self.detect_every
+                and self.tracker.predicted_min_confidence(max_missed=tracked) >= self.min_confidence):
+            # Sólo se siguen los tracks confirmados en la última llamada al detector
+            self._last = self.tracker.predict(max_missed=tracked + 1)
+            self._frames_since_detect += 1
+            self.tracked_frames += 1
+            return self._last
+        self._frames_since_detect = 0
+        self.detector_calls += 1
+        self._last = self.tracker.update(self.detect_fn(frame))
+        return self._last
+
+    def stats(self):
+        return {'detector_calls': self.detector_calls, 'tracked_frames': self.tracked_frames}